@@ -0,0 +1,239 @@
+import argparse
+import math
+import random
+import sys
+from functools import lru_cache
+
+import pandas as pd
+
+from result_sink import summary_frames
+
+
+def load_latencies(run_dir):
+    """
+    Loads execution times from every latency summary (or unfinished results file) under a test_agent output directory
+
+    Args:
+        run_dir (str): output directory of one run
+
+    Returns:
+        pd.DataFrame: conversation, query_order, execution, execution_time, query
+    """
+    frames = []
+    for conversation, summary, _ in summary_frames(run_dir):
+        summary["conversation"] = conversation
+        frames.append(summary)
+    if not frames:
+        raise ValueError(f"No latency summaries found under {run_dir}")
+    data = pd.concat(frames, ignore_index=True)
+    if "query" not in data:
+        data["query"] = ""
+    return data[["conversation", "query_order", "execution", "execution_time", "query"]]
+
+
+def _quantile(ordered, q):
+    """Linear interpolation quantile of a sorted list, as pandas computes it."""
+    position = (len(ordered) - 1) * q
+    low = math.floor(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def bootstrap_ci(a, b, stat=0.5, n_boot=2000, confidence=0.95, seed=0):
+    """
+    Percentile bootstrap confidence interval of quantile(b) - quantile(a), each sample
+    resampled independently.
+
+    Returns:
+        tuple: (low, high)
+    """
+    rng = random.Random(seed)
+    deltas = sorted(
+        _quantile(sorted(rng.choices(b, k=len(b))), stat) - _quantile(sorted(rng.choices(a, k=len(a))), stat)
+        for _ in range(n_boot)
+    )
+    tail = (1 - confidence) / 2
+    return _quantile(deltas, tail), _quantile(deltas, 1 - tail)
+
+
+# largest sample sizes for which the exact U distribution is computed
+EXACT_MAX_N = 25
+
+
+@lru_cache(maxsize=None)
+def _u_counts(n1, n2):
+    """Number of orderings of n1 + n2 distinct values giving each U (index) of the second sample."""
+    if n1 == 0 or n2 == 0:
+        return (1,)
+    # the largest value comes from the second sample (adds n1 to its U) or from the first
+    with_b = _u_counts(n1, n2 - 1)
+    with_a = _u_counts(n1 - 1, n2)
+    counts = [0] * (n1 * n2 + 1)
+    for u, count in enumerate(with_b):
+        counts[u + n1] += count
+    for u, count in enumerate(with_a):
+        counts[u] += count
+    return tuple(counts)
+
+
+def min_p_value(n1, n2):
+    """Smallest two-sided p-value the exact rank test can reach with these sample sizes."""
+    return min(1.0, 2 / math.comb(n1 + n2, n1))
+
+
+def mann_whitney_u(a, b):
+    """
+    Two-sided Mann-Whitney U test. Exact for samples without ties of at most EXACT_MAX_N
+    values each (the usual 3-10 trials per query), otherwise the normal approximation with
+    tie correction and continuity correction.
+
+    Returns:
+        tuple: (U statistic of b, p-value)
+    """
+    n1, n2 = len(a), len(b)
+    if 0 < n1 <= EXACT_MAX_N and 0 < n2 <= EXACT_MAX_N and len(set(a) | set(b)) == n1 + n2:
+        u_b = sum(1 for y in b for x in a if y > x)
+        counts = _u_counts(n1, n2)
+        total = math.comb(n1 + n2, n1)
+        lower = sum(counts[:u_b + 1]) / total
+        upper = sum(counts[u_b:]) / total
+        return u_b, min(1.0, 2 * min(lower, upper))
+    combined = sorted([(value, 0) for value in a] + [(value, 1) for value in b])
+    ranks = [0.0] * len(combined)
+    tie_term = 0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        average_rank = (i + j) / 2 + 1
+        for k in range(i, j + 1):
+            ranks[k] = average_rank
+        tied = j - i + 1
+        tie_term += tied ** 3 - tied
+        i = j + 1
+    rank_sum_b = sum(rank for rank, (_, group) in zip(ranks, combined) if group == 1)
+    u_b = rank_sum_b - n2 * (n2 + 1) / 2
+    mean_u = n1 * n2 / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1))) if n > 1 else 0
+    if variance <= 0:
+        return u_b, 1.0
+    z = (abs(u_b - mean_u) - 0.5) / math.sqrt(variance)
+    p_value = math.erfc(max(z, 0) / math.sqrt(2))
+    return u_b, min(1.0, p_value)
+
+
+def holm(p_values):
+    """Holm-Bonferroni adjusted p-values, in input order."""
+    order = sorted(range(len(p_values)), key=lambda i: p_values[i])
+    adjusted = [1.0] * len(p_values)
+    running = 0.0
+    for rank, i in enumerate(order):
+        running = max(running, min(1.0, (len(p_values) - rank) * p_values[i]))
+        adjusted[i] = running
+    return adjusted
+
+
+def compare_runs(baseline_dir, candidate_dir, alpha=0.05, min_delta=0.05, n_boot=2000, seed=0):
+    """
+    Compares execution times of matching queries (conversation, query_order) of two runs
+
+    Args:
+        baseline_dir (str): output directory of the reference run
+        candidate_dir (str): output directory of the run under test
+        alpha (float): significance level after Holm correction across queries, and of the
+            pooled test over every matched trial
+        min_delta (float): relative median slowdown below which a difference is not a regression
+        n_boot (int): bootstrap resamples
+        seed (int): bootstrap seed
+
+    Returns:
+        tuple: (per-query DataFrame, overall dict)
+    """
+    baseline = load_latencies(baseline_dir)
+    candidate = load_latencies(candidate_dir)
+    keys = ["conversation", "query_order"]
+    base_groups = {key: group["execution_time"].dropna().tolist() for key, group in baseline.groupby(keys)}
+    cand_groups = {key: group["execution_time"].dropna().tolist() for key, group in candidate.groupby(keys)}
+    queries = baseline.drop_duplicates(keys).set_index(keys)["query"].to_dict()
+
+    rows = []
+    for key in sorted(set(base_groups) & set(cand_groups)):
+        a, b = base_groups[key], cand_groups[key]
+        if len(a) < 2 or len(b) < 2:
+            continue
+        sa, sb = sorted(a), sorted(b)
+        median_a, median_b = _quantile(sa, 0.5), _quantile(sb, 0.5)
+        ci_low, ci_high = bootstrap_ci(a, b, 0.5, n_boot, seed=seed)
+        _, p_value = mann_whitney_u(a, b)
+        rows.append({
+            "conversation": key[0], "query_order": key[1], "query": str(queries.get(key, ""))[:60],
+            "n_base": len(a), "n_cand": len(b),
+            "median_base": median_a, "median_cand": median_b,
+            "median_delta": median_b - median_a,
+            "median_delta_pct": (median_b - median_a) / median_a if median_a else float("nan"),
+            "ci_low": ci_low, "ci_high": ci_high,
+            "p95_base": _quantile(sa, 0.95), "p95_cand": _quantile(sb, 0.95),
+            "p95_delta": _quantile(sb, 0.95) - _quantile(sa, 0.95),
+            "p_value": p_value,
+            "min_p": min_p_value(len(a), len(b)),
+        })
+    table = pd.DataFrame(rows)
+    if table.empty:
+        raise ValueError("No matching queries with at least two trials in both runs")
+
+    table["p_adjusted"] = holm(table["p_value"].tolist())
+    table["regression"] = (table["p_adjusted"] < alpha) & (table["ci_low"] > 0) & (table["median_delta_pct"] > min_delta)
+    table["improvement"] = (table["p_adjusted"] < alpha) & (table["ci_high"] < 0) & (table["median_delta_pct"] < -min_delta)
+
+    all_a = [t for key in table[keys].itertuples(index=False) for t in base_groups[tuple(key)]]
+    all_b = [t for key in table[keys].itertuples(index=False) for t in cand_groups[tuple(key)]]
+    overall_ci = bootstrap_ci(all_a, all_b, 0.5, n_boot, seed=seed)
+    overall_p = mann_whitney_u(all_a, all_b)[1]
+    median_a, median_b = _quantile(sorted(all_a), 0.5), _quantile(sorted(all_b), 0.5)
+    overall = {
+        "queries": len(table),
+        "median_base": median_a,
+        "median_cand": median_b,
+        "p95_base": _quantile(sorted(all_a), 0.95),
+        "p95_cand": _quantile(sorted(all_b), 0.95),
+        "median_ci": overall_ci,
+        "p_value": overall_p,
+        # pooled over every matched trial: fires even when no single query has enough trials
+        "regression": bool(overall_p < alpha and overall_ci[0] > 0 and median_a and (median_b - median_a) / median_a > min_delta),
+        "regressions": int(table["regression"].sum()),
+        "improvements": int(table["improvement"].sum()),
+        # queries that cannot reach alpha after Holm correction, whatever their latencies
+        "underpowered": int((table["min_p"] * len(table) >= alpha).sum()),
+    }
+    return table, overall
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Compare latencies of two test_agent runs; exits 1 on a significant regression.')
+    parser.add_argument('baseline', type=str, help='output directory of the reference run')
+    parser.add_argument('candidate', type=str, help='output directory of the run under test')
+    parser.add_argument('--alpha', type=float, default=0.05, help='significance level (Holm corrected)')
+    parser.add_argument('--min_delta', type=float, default=0.05, help='relative median slowdown that counts')
+    parser.add_argument('--n_boot', type=int, default=2000, help='bootstrap resamples')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=str, default=None, help='write the per-query table to this xlsx')
+    args = parser.parse_args()
+
+    table, overall = compare_runs(args.baseline, args.candidate, args.alpha, args.min_delta, args.n_boot, args.seed)
+    pd.set_option("display.width", 250)
+    print(table.drop(columns=["query"]).round(3).to_string(index=False))
+    print(f"\nOverall over {overall['queries']} queries: median {overall['median_base']:.2f}s -> "
+          f"{overall['median_cand']:.2f}s (95% CI of delta {overall['median_ci'][0]:+.2f}..{overall['median_ci'][1]:+.2f}s), "
+          f"p95 {overall['p95_base']:.2f}s -> {overall['p95_cand']:.2f}s, rank test p={overall['p_value']:.4f}")
+    print(f"{overall['regressions']} significant regression(s), {overall['improvements']} improvement(s)"
+          + (", overall regression" if overall["regression"] else ""))
+    if overall["underpowered"]:
+        print(f"warning: {overall['underpowered']} of {overall['queries']} queries have too few trials to be "
+              f"significant on their own at alpha={args.alpha} (Holm over {overall['queries']}); "
+              f"only the overall test can flag them, run more trials for per-query results")
+    if args.output:
+        table.to_excel(args.output, index=False)
+    sys.exit(1 if overall["regressions"] or overall["regression"] else 0)
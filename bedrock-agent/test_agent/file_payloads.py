@@ -0,0 +1,117 @@
+"""
+Content-addressed cache of the local files test_agent attaches to sessionState.
+
+Each file is read once per (path, size, mtime) and its bytes are stored once per sha256, so
+every trial and every query sharing an attachment (or two paths with identical content) send
+the same object. Files of at least PAYLOAD_MMAP_BYTES are memory-mapped read-only instead of
+read: the OS pages them in and out, and botocore base64-encodes an mmap like bytes. File
+handles are closed as soon as the bytes are read or mapped.
+"""
+import hashlib
+import mmap
+import os
+import threading
+
+# files this large or larger are memory-mapped; 0 disables mmap
+PAYLOAD_MMAP_BYTES = int(os.environ.get('PAYLOAD_MMAP_BYTES', 8 * 1024 * 1024))
+
+
+class PayloadCache:
+    """
+    Args:
+        mmap_threshold (int): size in bytes from which files are memory-mapped, 0 to always read
+    """
+
+    def __init__(self, mmap_threshold=PAYLOAD_MMAP_BYTES):
+        self.mmap_threshold = mmap_threshold
+        self.payloads = {}
+        self.digests = {}
+        self.reads = 0
+        self.hits = 0
+        self._lock = threading.Lock()
+
+    def _load(self, path, size):
+        with open(path, 'rb') as f:
+            if self.mmap_threshold and size >= self.mmap_threshold:
+                # the mapping stays valid after the file is closed
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return f.read()
+
+    def get(self, path):
+        """Bytes (or read-only mmap) of a local file, shared with every earlier request for the same content."""
+        stat = os.stat(path)
+        key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            digest = self.digests.get(key)
+            if digest is not None:
+                self.hits += 1
+                return self.payloads[digest]
+
+        payload = self._load(path, stat.st_size)
+        digest = hashlib.sha256(payload).hexdigest()
+        with self._lock:
+            self.reads += 1
+            if digest in self.payloads:
+                if isinstance(payload, mmap.mmap):
+                    payload.close()
+                payload = self.payloads[digest]
+            else:
+                self.payloads[digest] = payload
+            self.digests[key] = digest
+        return payload
+
+    def digest_of(self, payload):
+        """sha256 of a payload this cache handed out, or None."""
+        with self._lock:
+            return next((digest for digest, cached in self.payloads.items() if cached is payload), None)
+
+    def stats(self):
+        with self._lock:
+            read = sum(len(p) for p in self.payloads.values() if not isinstance(p, mmap.mmap))
+            mapped = sum(len(p) for p in self.payloads.values() if isinstance(p, mmap.mmap))
+            return {
+                "entries": len(self.payloads),
+                "paths": len(self.digests),
+                "bytes_resident": read,
+                "bytes_mapped": mapped,
+                "file_reads": self.reads,
+                "hits": self.hits,
+            }
+
+    def summary(self):
+        stats = self.stats()
+        return (f"File payloads: {stats['entries']} entries for {stats['paths']} paths, "
+                f"{stats['bytes_resident'] / 1024:.1f} KiB resident, {stats['bytes_mapped'] / 1024:.1f} KiB mapped, "
+                f"{stats['file_reads']} reads, {stats['hits']} hits")
+
+    def close(self):
+        with self._lock:
+            for payload in self.payloads.values():
+                if isinstance(payload, mmap.mmap):
+                    payload.close()
+            self.payloads.clear()
+            self.digests.clear()
+
+
+def redact_payloads(session_state, cache=None):
+    """
+    Copy of a session state for logs and result files, with each file's bytes replaced by
+    their size and digest instead of a repr of the whole payload.
+    """
+    if not session_state or not session_state.get('files'):
+        return session_state
+    files = []
+    for named_file in session_state['files']:
+        content = named_file.get('source', {}).get('byteContent')
+        if content is not None:
+            data = content['data']
+            digest = cache.digest_of(data) if cache is not None else None
+            digest = digest or hashlib.sha256(data).hexdigest()
+            content = {**content, 'data': f'<{len(data)} bytes sha256:{digest[:12]}>'}
+            named_file = {**named_file, 'source': {**named_file['source'], 'byteContent': content}}
+        files.append(named_file)
+    return {**session_state, 'files': files}
+
+
+# shared by every trial and worker thread of the process
+payloads = PayloadCache()
@@ -0,0 +1,230 @@
+"""
+Seeded generator of guest conversations in the test_agent JSON format.
+
+Conversations are built from a hotel's `<hotel>serviceInfo.json` catalog and its
+`hotel_number.json` entry. Every turn carries the sessionAttributes and
+promptSessionAttributes the fulfillment handler would send. Utterances follow an intent mix:
+- item requests, with quantities and a time follow-up
+- asks for unavailable items
+- front desk transfers
+- local area questions
+- small talk
+
+Items are drawn with Zipfian skew, so a few items take most requests, as in production
+traffic. The same seed always gives the same workload.
+
+Usage:
+    python generate_workload.py --conversations 10000 --seed 7 --out workload.json
+    python test_agent.py --test_file workload.json --agent_id <id>
+    python load_test.py --test_file workload.json --agent_id <id> --concurrency 20
+"""
+import argparse
+import itertools
+import json
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+
+CONFIG_DIR = Path(__file__).resolve().parents[2] / 'benchmarks' / 'fixtures'
+
+# share of the requests of a conversation that go to each intent
+INTENT_MIX = {
+    'item_request': 0.55,
+    'unavailable_item': 0.10,
+    'front_desk': 0.08,
+    'local_area': 0.12,
+    'small_talk': 0.15,
+}
+# spoken quantity -> weight; None asks without a quantity
+QUANTITIES = {None: 0.55, 'one': 0.1, 'two': 0.2, 'three': 0.08, 'four': 0.04, 'a couple of': 0.03}
+
+REQUEST_TEMPLATES = {
+    'Delivery': ["I need {quantity} {item}", "can I get {quantity} {item} please", "could you send {quantity} {item} to my room",
+                 "is it possible to get {quantity} {item}", "please bring {quantity} {item}"],
+    'Request': ["I need {quantity} {item}", "can I get {quantity} {item}", "I would like {quantity} {item} please"],
+    'Maintenance': ["the {item} in my room is not working", "{item} is broken", "there is a problem with the {item}",
+                    "can someone fix the {item}"],
+    'Information': ["what about the {item}", "can you tell me about the {item}", "I have a question about the {item}"],
+}
+UNAVAILABLE_TEMPLATES = ["do you have {item}", "I need {quantity} {item}", "can I get {item} please", "is there a {item} I can use"]
+FOLLOW_UPS = ["now", "as soon as possible", "10 am tomorrow", "tomorrow 9 am", "6 am", "in an hour", "same time", "tonight"]
+FRONT_DESK = ["can I talk to the front desk", "connect me to the front desk please", "I want to speak to a person",
+              "transfer me to reception", "I need to talk to someone about my bill"]
+LOCAL_AREA = ["can you recommend a good {cuisine} restaurant nearby?", "where can I get {cuisine} food around here",
+              "is there a pharmacy close to the hotel", "what is there to do nearby", "how far is the nearest grocery store",
+              "where is the closest gas station"]
+CUISINES = ["chinese", "italian", "mexican", "thai", "indian", "japanese", "steak", "pizza", "vegan", "breakfast"]
+SMALL_TALK = ["hello", "hi there", "thank you", "how are you today", "what is your name", "good morning", "thanks a lot"]
+CLOSINGS = ["that is all", "no", "no thank you", "nothing else", "that's it, thanks"]
+
+
+def load_hotel(hotel_number, config_dir=CONFIG_DIR):
+    """(hotel_info, serviceInfo catalog) of a hotel from the bot configuration files."""
+    config_dir = Path(config_dir)
+    hotel_info = json.loads((config_dir / 'hotel_number.json').read_text())[hotel_number]
+    catalog = json.loads((config_dir / f'{hotel_number}serviceInfo.json').read_text())
+    return hotel_info, catalog
+
+
+def session_attributes(hotel_number, hotel_info, catalog):
+    """sessionAttributes and promptSessionAttributes as in the hand-written test files."""
+    if hotel_info['class'] == '0':
+        hotel_tone = "Luxury & Upper Upscale"
+    elif hotel_info['class'] == '1':
+        hotel_tone = "Upscale & Upper Midscale"
+    else:
+        hotel_tone = "Midscale & Economy"
+    dept_items = {}
+    for item, details in catalog.items():
+        if details['Avaliable'] == 'Yes':
+            dept_items.setdefault(details['Department'], []).append(item)
+    prompt_attributes = {
+        'hotel_tone': hotel_tone,
+        'current_datetime': '',
+        'fd_start_time': hotel_info['fd_start_time'],
+        'fd_end_time': hotel_info['fd_end_time'],
+        'eng_start_time': hotel_info['eng_start_time'],
+        'eng_end_time': hotel_info['eng_end_time'],
+        'unavailable_items': ', '.join(k for k, v in catalog.items() if v['Avaliable'] == 'No'),
+        'available_items': ', '.join(k for k, v in catalog.items() if v['Avaliable'] == 'Yes'),
+        'dept_items': ', '.join(dept_items),
+        **{department: ', '.join(items) for department, items in dept_items.items()},
+    }
+    return {'hotel_phone_number': hotel_number, 'room_number': '', **hotel_info}, prompt_attributes
+
+
+def zipf_weights(n, s):
+    """Cumulative Zipf weights of ranks 1..n, for random.choices(cum_weights=...)."""
+    return list(itertools.accumulate(1 / rank ** s for rank in range(1, n + 1)))
+
+
+class WorkloadGenerator:
+    """
+    Draws conversations for one hotel.
+
+    Args:
+        catalog (dict): serviceInfo.json of the hotel
+        seed (int): seed of every random choice
+        zipf_s (float): Zipf exponent of item popularity, 0 for uniform
+        intent_mix (dict): intent -> weight, see INTENT_MIX
+        max_requests (int): most requests in one conversation
+        follow_up_rate (float): share of item requests followed by a time answer
+    """
+
+    def __init__(self, catalog, seed=0, zipf_s=1.1, intent_mix=None, max_requests=3, follow_up_rate=0.5):
+        self.random = random.Random(seed)
+        self.max_requests = max_requests
+        self.follow_up_rate = follow_up_rate
+        mix = intent_mix or INTENT_MIX
+        self.intents, self.intent_weights = list(mix), list(itertools.accumulate(mix.values()))
+        self.quantities, self.quantity_weights = list(QUANTITIES), list(itertools.accumulate(QUANTITIES.values()))
+        # popularity order is a seeded shuffle of the catalog, not its alphabetical order
+        available = [item for item, details in catalog.items() if details['Avaliable'] == 'Yes']
+        unavailable = [item for item, details in catalog.items() if details['Avaliable'] == 'No']
+        self.random.shuffle(available)
+        self.random.shuffle(unavailable)
+        self.available, self.available_weights = available, zipf_weights(len(available), zipf_s)
+        self.unavailable, self.unavailable_weights = unavailable, zipf_weights(len(unavailable), zipf_s)
+        self.service_types = {item: details['Service Type'] for item, details in catalog.items()}
+
+    def _item(self, items, weights):
+        return self.random.choices(items, cum_weights=weights)[0]
+
+    def _quantity(self):
+        return self.random.choices(self.quantities, cum_weights=self.quantity_weights)[0]
+
+    @staticmethod
+    def _phrase(template, item, quantity):
+        item = item.lower()
+        if quantity is None:
+            quantity = 'an' if item[0] in 'aeiou' else 'a'
+        elif quantity != 'one' and not item.endswith('s'):
+            item += 's'
+        return template.format(item=item, quantity=quantity)
+
+    def request(self, intent):
+        """Turns of one request, as dicts with intent, query and the item asked for."""
+        if intent == 'item_request' and self.available:
+            item = self._item(self.available, self.available_weights)
+            templates = REQUEST_TEMPLATES.get(self.service_types[item], REQUEST_TEMPLATES['Request'])
+            turns = [{'intent': intent, 'item': item,
+                      'query': self._phrase(self.random.choice(templates), item, self._quantity())}]
+            if self.random.random() < self.follow_up_rate:
+                turns.append({'intent': 'follow_up', 'query': self.random.choice(FOLLOW_UPS)})
+            return turns
+        if intent == 'unavailable_item' and self.unavailable:
+            item = self._item(self.unavailable, self.unavailable_weights)
+            return [{'intent': intent, 'item': item,
+                     'query': self._phrase(self.random.choice(UNAVAILABLE_TEMPLATES), item, self._quantity())}]
+        if intent == 'front_desk':
+            return [{'intent': intent, 'query': self.random.choice(FRONT_DESK)}]
+        if intent == 'local_area':
+            return [{'intent': intent, 'query': self.random.choice(LOCAL_AREA).format(cuisine=self.random.choice(CUISINES))}]
+        return [{'intent': 'small_talk', 'query': self.random.choice(SMALL_TALK)}]
+
+    def conversation(self):
+        """Turns of one conversation, ending with a closing most of the time."""
+        turns = []
+        for _ in range(self.random.randint(1, self.max_requests)):
+            turns.extend(self.request(self.random.choices(self.intents, cum_weights=self.intent_weights)[0]))
+        if self.random.random() < 0.8:
+            turns.append({'intent': 'closing', 'query': self.random.choice(CLOSINGS)})
+        return turns
+
+
+def generate(hotel_number, conversations, seed=0, config_dir=CONFIG_DIR, start=None, with_session_state=True,
+             **options):
+    """
+    Workload in the test_agent JSON format: {conversation name: [turn, ...]}, where every turn
+    has query, intent (and item), and unless with_session_state is False sessionAttributes
+    and promptSessionAttributes. test_agent and load_test ignore intent and item.
+    """
+    hotel_info, catalog = load_hotel(hotel_number, config_dir)
+    attributes, prompt_attributes = session_attributes(hotel_number, hotel_info, catalog)
+    generator = WorkloadGenerator(catalog, seed=seed, **options)
+    start = start or datetime(2025, 2, 13, 7, 0, 0)
+    workload = {}
+    for i in range(conversations):
+        room = str(generator.random.randint(1, 12) * 100 + generator.random.randint(1, 40))
+        at = start + timedelta(seconds=generator.random.randint(0, 14 * 3600))
+        turn_attributes = {**attributes, 'room_number': room}
+        turns = []
+        for turn in generator.conversation():
+            if with_session_state:
+                turn = {
+                    'promptSessionAttributes': {**prompt_attributes, 'current_datetime': at.strftime("%Y_%m_%d_%H_%M_%S")},
+                    'sessionAttributes': turn_attributes,
+                    **turn,
+                }
+            turns.append(turn)
+            at += timedelta(seconds=generator.random.randint(5, 40))
+        workload[f'conversation_{i:06d}'] = turns
+    return workload
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate a seeded guest workload in the test_agent JSON format.')
+    parser.add_argument('--hotel', type=str, default='+16782030501')  # hotel phone number, key of hotel_number.json
+    parser.add_argument('--config_dir', type=str, default=str(CONFIG_DIR))  # holds hotel_number.json and serviceInfo files
+    parser.add_argument('--conversations', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--zipf', type=float, default=1.1)  # Zipf exponent of item popularity, 0 for uniform
+    parser.add_argument('--max_requests', type=int, default=3)  # most requests per conversation
+    parser.add_argument('--intent_mix', type=json.loads, default=None)  # JSON {intent: weight}, see INTENT_MIX
+    parser.add_argument('--no_session_state', action='store_true')  # queries only, without the ~8 KB of attributes per turn
+    parser.add_argument('--out', type=str, default='workload.json')
+    args = parser.parse_args()
+
+    workload = generate(args.hotel, args.conversations, seed=args.seed, config_dir=args.config_dir,
+                        with_session_state=not args.no_session_state, zipf_s=args.zipf, intent_mix=args.intent_mix,
+                        max_requests=args.max_requests)
+    with open(args.out, 'w') as f:
+        json.dump(workload, f)
+    intents = Counter(turn['intent'] for turns in workload.values() for turn in turns)
+    items = Counter(turn['item'] for turns in workload.values() for turn in turns if turn['intent'] == 'item_request')
+    print(f"{args.out}: {len(workload)} conversations, {sum(intents.values())} turns")
+    print("intents: " + ", ".join(f"{intent} {count}" for intent, count in intents.most_common()))
+    top = sum(count for _, count in items.most_common(10))
+    print(f"{len(items)} distinct items requested, top 10 take {top / max(1, sum(items.values())):.0%}: "
+          + ", ".join(f"{item} {count}" for item, count in items.most_common(10)))
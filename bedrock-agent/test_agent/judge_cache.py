@@ -0,0 +1,79 @@
+"""
+Content-addressed cache of llm_judge results.
+
+An entry is keyed by the sha256 of the judge rubric (the guidelines shared by every judge
+mode), the judge model (the pinned model ID, or the models of the 'judge' route) and the
+conversation transcript, so editing the guidelines, switching models or changing a single
+answer all miss the cache, while the same trial scored in any mode hits it. Entries
+are JSON files sharded by the first two hex digits of their key under the cache directory,
+written atomically so concurrent workers and runs can share it.
+"""
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+JUDGE_CACHE_DIR = os.environ.get('JUDGE_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'llm_judge'))
+# 2: keyed by the rubric instead of the mode's full system prompt
+CACHE_VERSION = 2
+
+
+def cache_key(rubric, model, trial):
+    digest = hashlib.sha256()
+    for part in (str(CACHE_VERSION), rubric, model, trial):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class JudgeCache:
+    """
+    On-disk judge result cache with hit/miss counters.
+
+    Args:
+        directory (str): cache directory, created on first write
+    """
+
+    def __init__(self, directory=JUDGE_CACHE_DIR):
+        self.directory = Path(directory)
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return self.directory / key[:2] / f'{key}.json'
+
+    def get(self, key, need_rationale=False):
+        """Cached entry for key, or None. An entry without a rationale misses when one is needed."""
+        try:
+            entry = json.loads(self._path(key).read_text())
+        except (OSError, ValueError):
+            entry = None
+        if entry is not None and need_rationale and entry.get('rationale') is None:
+            entry = None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def put(self, key, scores, rationale=None, model_id=None):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        tmp_path.write_text(json.dumps({'scores': scores, 'rationale': rationale, 'model_id': model_id}))
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.writes += 1
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def summary(self):
+        return (f"Judge cache {self.directory}: {self.hits} hits, {self.misses} misses "
+                f"({self.hit_rate:.1%} hit rate), {self.writes} new entries")
@@ -0,0 +1,173 @@
+"""
+Input and output of llm_judge in Excel, JSONL or Parquet.
+
+Inputs are the latency summaries test_agent writes: `*latency_summary_*.xlsx`, the
+`*results_*.idx.jsonl` index of a results file (see result_sink.py), its `*results_*.parquet`
+rollup, or a `*latency_summary_*` export as JSONL or Parquet. A file given by path may have any
+name with the same columns. JSONL and Parquet are read in chunks of whole trials, which needs the
+rows of one execution to be contiguous, as test_agent writes them. Excel and results
+indexes are read at once.
+
+Scores go to `<input>_eval.<format>` and rationales, when requested, to
+`<input>_eval_rationale.<format>`. JSONL and Parquet are appended chunk by chunk; Excel keeps
+its two sheets (Trials, Rationale) and is only written once the whole input is scored.
+"""
+import os
+import re
+from pathlib import Path
+
+import pandas as pd
+
+from result_sink import summary_frame
+
+INPUT_SUFFIXES = ('.xlsx', '.idx.jsonl', '.jsonl', '.jsonl.gz', '.parquet')
+OUTPUT_FORMATS = ('jsonl', 'parquet', 'xlsx')
+JUDGE_CHUNK_ROWS = int(os.environ.get('JUDGE_CHUNK_ROWS', 5000))
+# a run may have an Excel summary, a results index and a Parquet rollup: judge only the first found of
+PREFERENCE = ('.parquet', '.idx.jsonl', '.xlsx')
+# names test_agent gives its summaries, `<prefix>_` optional; other outputs in the tree
+# (load_test, trace_analytics, compare_runs, the judge's own) are not results
+SUMMARY_FILE_PATTERN = re.compile(
+    r"(?:^|_)(?:latency_summary_.+?(?:\.xlsx|\.jsonl|\.jsonl\.gz|\.parquet)|results_.+?(?:\.idx\.jsonl|\.parquet))$")
+
+
+def input_suffix(name):
+    return next((suffix for suffix in INPUT_SUFFIXES if name.endswith(suffix)), None)
+
+
+def run_key(path):
+    """Files of one test_agent run share this key (folder, prefix and date of the run)."""
+    name = path.name[:-len(input_suffix(path.name))]
+    return path.parent, name.replace('latency_summary_', 'results_')
+
+
+def find_summary_files(directory):
+    """
+    Latency summaries under directory, matched by the names test_agent writes
+    (SUMMARY_FILE_PATTERN), skipping judge outputs and Excel lock files. When a run has several summaries, only
+    one is returned.
+    """
+    found = {}
+    for root, dirs, files in os.walk(directory):
+        for file in sorted(files):
+            if not SUMMARY_FILE_PATTERN.search(file) or '_eval' in file or file.startswith('~$'):
+                continue
+            path = Path(root) / file
+            found.setdefault(run_key(path), []).append(path)
+    for paths in found.values():
+        rank = {suffix: i for i, suffix in enumerate(PREFERENCE)}
+        yield min(paths, key=lambda path: rank.get(input_suffix(path.name), len(rank)))
+
+
+def whole_trials(chunks):
+    """
+    Re-cuts chunks of rows so that no execution is split between two of them.
+
+    Raises:
+        ValueError: when the rows of an execution are not contiguous
+    """
+    carry, done = None, set()
+    for chunk in chunks:
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        if chunk.empty:
+            continue
+        tail = chunk['execution'] == chunk['execution'].iloc[-1]
+        ready, carry = chunk[~tail], chunk[tail]
+        executions = set(ready['execution'].unique())
+        if executions & done:
+            raise ValueError('rows of an execution are not contiguous, convert the file to xlsx or sort it')
+        done |= executions
+        if not ready.empty:
+            yield ready
+    if carry is not None and not carry.empty:
+        if carry['execution'].iloc[0] in done:
+            raise ValueError('rows of an execution are not contiguous, convert the file to xlsx or sort it')
+        yield carry
+
+
+def read_summary(path, chunk_rows=JUDGE_CHUNK_ROWS):
+    """Yields a latency summary as DataFrames of whole trials."""
+    path = Path(path)
+    suffix = input_suffix(path.name)
+    if suffix == '.xlsx':
+        yield pd.read_excel(path)
+    elif suffix == '.idx.jsonl':
+        # resumed runs rewrite turns further down the index, summary_frame keeps the last write
+        yield summary_frame(str(path).replace('.idx.jsonl', '.jsonl.gz'))
+    elif suffix == '.parquet':
+        import pyarrow.parquet as pq
+        batches = pq.ParquetFile(path).iter_batches(batch_size=chunk_rows)
+        yield from whole_trials(batch.to_pandas() for batch in batches)
+    else:
+        with pd.read_json(path, lines=True, chunksize=chunk_rows, dtype=False) as reader:
+            yield from whole_trials(reader)
+
+
+class EvalWriter:
+    """
+    Writes the scored trials of one input file, chunk by chunk.
+
+    Args:
+        input_path (str): latency summary the scores belong to
+        output_format (str): one of OUTPUT_FORMATS
+        eval_rationale (bool): also write the rationale of every trial
+    """
+
+    def __init__(self, input_path, output_format='jsonl', eval_rationale=False):
+        input_path = Path(input_path)
+        stem = input_path.name[:-len(input_suffix(input_path.name))]
+        self.path = input_path.parent / f'{stem}_eval.{output_format}'
+        self.rationale_path = input_path.parent / f'{stem}_eval_rationale.{output_format}'
+        self.output_format = output_format
+        self.eval_rationale = eval_rationale
+        self.trials = 0
+        self._frames, self._rationales = [], []
+        self._writers = {}
+        for path in (self.path, self.rationale_path):
+            if output_format != 'xlsx' and path.exists():
+                path.unlink()
+
+    def write(self, df, scores, rationales):
+        """Appends a chunk: its rows with an Eval column, and one rationale per trial."""
+        df = df.assign(Eval=scores)
+        rationale = pd.DataFrame({'Trial': range(self.trials, self.trials + len(rationales)), 'rationale': rationales})
+        self.trials += len(rationales)
+        if self.output_format == 'xlsx':
+            self._frames.append(df)
+            self._rationales.append(rationale)
+            return
+        self._append(self.path, df)
+        if self.eval_rationale:
+            self._append(self.rationale_path, rationale)
+
+    def _append(self, path, df):
+        if self.output_format == 'jsonl':
+            text = df.to_json(orient='records', lines=True, date_format='iso', default_handler=str)
+            with open(path, 'a') as f:
+                f.write(text if text.endswith('\n') else text + '\n')
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        # Eval mixes integer ratings with eval issue text, and other object columns may mix
+        # types between chunks: store them as strings so every chunk has the same schema
+        df = df.astype({column: 'string' for column in df.columns if df[column].dtype == object or column == 'Eval'})
+        if path not in self._writers:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            self._writers[path] = pq.ParquetWriter(path, table.schema)
+        else:
+            table = pa.Table.from_pandas(df, schema=self._writers[path].schema, preserve_index=False)
+        self._writers[path].write_table(table)
+
+    def close(self):
+        for writer in self._writers.values():
+            writer.close()
+        if self.output_format != 'xlsx' or not self._frames:
+            return
+        df = pd.concat(self._frames, ignore_index=True)
+        if self.eval_rationale:
+            with pd.ExcelWriter(self.path) as writer:
+                df.to_excel(writer, index=False, sheet_name='Trials')
+                pd.concat(self._rationales, ignore_index=True).to_excel(writer, index=False, sheet_name='Rationale')
+        else:
+            df.to_excel(self.path, index=False, sheet_name='Trials')
@@ -1,4 +1,4 @@
-judge_prompt=f'''You are a chatbot conversation evaluator. You will be given a conversation between a user and the chatbot in <conv> tags where the user query will be in <user> tags and the chatbot responses are in <chatbot> tags. Each user/chatbot interaction is labeled with a turn number. 
+judge_guidelines='''You are a chatbot conversation evaluator. You will be given a conversation between a user and the chatbot in <conv> tags where the user query will be in <user> tags and the chatbot responses are in <chatbot> tags. Each user/chatbot interaction is labeled with a turn number. 
 
 You will judge the response of the chatbot to the user query in each turn using the following <guidelines>:
 
@@ -9,6 +9,16 @@ The chatbot will retrieve info from knowledge bases but it should not include an
 "I found results in a knowledge base" or "According to my Search results" or "I have found some answers from my data source" or "based on the information in the knowledge base". It should only state the results not where it got the info from and never mention "knowledge base"
 </guidelines>
 
-You will assign a rating that is an integer in the range of [1,5] where 1 is worst and 5 is best according to the guidelines above. Please rank each turn. Output the ratings only as a JSON with key tha says turn and the turn number and value the rating for that turn . Do not output any other text.
+You will assign a rating that is an integer in the range of [1,5] where 1 is worst and 5 is best according to the guidelines above. Please rank each turn.'''
 
-Do not under any circumstances ouput any text only output the JSON object with the ratings unless you are asked to provide a rationale for your decisions'''
\ No newline at end of file
+judge_prompt = judge_guidelines + ''' Output the ratings only as a JSON with key tha says turn and the turn number and value the rating for that turn . Do not output any other text.
+
+Do not under any circumstances ouput any text only output the JSON object with the ratings unless you are asked to provide a rationale for your decisions'''
+
+# one call returns both the ratings and the rationale
+judge_prompt_structured = judge_guidelines + ''' Output only a JSON object of the form {"ratings": {"Turn 1": 4, "Turn 2": 5}, "rationale": "why you rated each turn the way you did"} with one rating per turn. Do not output any other text.'''
+
+# several conversations per call, each in <conv id="..."> tags and judged on its own
+judge_prompt_batch = judge_guidelines + '''
+
+You will be given several conversations, each in <conv id="..."> tags. Judge every conversation on its own, without letting the others influence its ratings. Output only a JSON object with one key per conversation id, each value of the form {"ratings": {"Turn 1": 4, "Turn 2": 5}, "rationale": "why you rated each turn the way you did"} with one rating per turn of that conversation. Do not output any other text.'''
@@ -4,146 +4,442 @@ import pandas as pd
 import json
 import os
 import path as p
-from judge_prompt import judge_prompt
+import sys
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from judge_prompt import judge_guidelines, judge_prompt, judge_prompt_batch, judge_prompt_structured
+from judge_cache import JUDGE_CACHE_DIR, JudgeCache, cache_key
+from judge_io import JUDGE_CHUNK_ROWS, OUTPUT_FORMATS, EvalWriter, find_summary_files, read_summary
 import argparse
+from botocore.config import Config
 
-bedrock_runtime = boto3.client('bedrock-runtime')
+# shared Bedrock helpers live next to the Lambda handlers
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'lambda'))
+# EMF latency lines are meant for CloudWatch, keep them out of the judge's console output
+os.environ.setdefault('METRICS_ENABLED', '0')
+from model_router import ModelRouter
+from rate_limiter import client_config, get_limiter
+from usage_accounting import rollups, set_attribution
 
+# judge calls in flight at once; all of them share the process-wide rate limiter, so
+# BEDROCK_RATE_PER_SEC still caps the request rate whatever the pool size
+JUDGE_WORKERS = int(os.environ.get('JUDGE_WORKERS', 8))
+# whole-trial retries for failures the limiter does not retry itself (timeouts, exhausted failover)
+JUDGE_RETRIES = int(os.environ.get('JUDGE_RETRIES', 2))
+# two_call: ratings, then a second call for the rationale (the original judge)
+# structured: one call returning {"ratings": ..., "rationale": ...}
+# batch: several short conversations per structured call, falling back to structured per conversation
+JUDGE_MODES = {
+    'two_call': judge_prompt,
+    'structured': judge_prompt_structured,
+    'batch': judge_prompt_batch,
+}
+JUDGE_MODE = os.environ.get('JUDGE_MODE', 'two_call')
+# conversations per batch call, and a cap on their combined transcript length
+JUDGE_BATCH_SIZE = int(os.environ.get('JUDGE_BATCH_SIZE', 8))
+JUDGE_BATCH_CHARS = int(os.environ.get('JUDGE_BATCH_CHARS', 12000))
+EVAL_ISSUE = 'Eval Issue see rationale for detail'
+# format of the <input>_eval files: jsonl, parquet or xlsx
+JUDGE_OUTPUT_FORMAT = os.environ.get('JUDGE_OUTPUT_FORMAT', 'jsonl')
 
-# Search Through directory provides for xlsx outputs files
-def find_xlsx_files(directory):
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if file.endswith('.xlsx'):
-                yield os.path.join(root, file)
+bedrock_runtime = boto3.client('bedrock-runtime',
+                               config=client_config.merge(Config(max_pool_connections=max(10, JUDGE_WORKERS))))
+router = ModelRouter(bedrock_runtime)
+RATIONALE_QUESTION = ('\n\nCan you explain your rationale for evaluating the conversation turns the way you did? '
+                      'Dont output anything else except for the rationale.')
+
+
+class Progress:
+    """Thread-safe count of scored trials, printed at most every `interval` seconds."""
+
+    def __init__(self, total=0, interval=5.0):
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.retries = 0
+        self.failures = 0
+        self.fallbacks = 0
+        self.start = time.monotonic()
+        self._printed = self.start
+        self._lock = threading.Lock()
+
+    def update(self, retries=0, failed=False, fallback=False, force=False):
+        with self._lock:
+            self.done += 1
+            self.retries += retries
+            self.failures += failed
+            self.fallbacks += fallback
+            now = time.monotonic()
+            if force or now - self._printed >= self.interval:
+                self._printed = now
+                self.print_line(now)
+
+    def print_line(self, now=None):
+        elapsed = (now or time.monotonic()) - self.start
+        rate = self.done / elapsed if elapsed else 0.0
+        print(f"Scored {self.done}/{self.total} trials in {elapsed:.1f}s ({rate:.2f} trials/s, "
+              f"{self.retries} retries, {self.failures} failed, {self.fallbacks} batch fallbacks)", flush=True)
+
+
+def build_conversations(df):
+    """
+    Builds one `<conv>` transcript per trial of a latency summary.
+
+    Rows are grouped by `execution` and ordered by `query_order`, so trials may have different
+    numbers of turns and rows may come in any order.
+
+    Args:
+        df (pd.DataFrame): latency summary with execution, query_order, query and final_response columns
+
+    Returns:
+        tuple: (df sorted by execution and query_order, list of transcripts, list of turns per trial)
+    """
+    df = df.sort_values(['execution', 'query_order'], kind='stable').reset_index(drop=True)
+    executions = df['execution']
+    turns = executions.groupby(executions).cumcount() + 1
+    blocks = [f'\nTurn {turn}\n<user>\n{query}\n</user>\n<chatbot>\n{answer}\n</chatbot>\n'
+              for turn, query, answer in zip(turns.tolist(), df['query'].tolist(), df['final_response'].tolist())]
+    # rows are sorted by execution, so each trial is one contiguous slice of the turn blocks
+    sizes = executions.groupby(executions, sort=True).size().tolist()
+    trials, start = [], 0
+    for size in sizes:
+        trials.append('\n<conv>\n' + ''.join(blocks[start:start + size]) + '\n</conv>')
+        start += size
+    return df, trials, sizes
 
 
 def prepare_conversation(output_path=None):
-    turn = 1
-    test = '\n<conv>\n'
-    trials = []
-    trial = 1
-
-    df = pd.read_excel(output_path)
-    num_turns = int(len(df)/df['execution'].nunique())
-    
-    for i in range(len(df)):
-        if num_turns != 1:
-            if not (i % num_turns == 0) or i == 0:
-                test += f'\nTurn {turn}\n<user>\n{df.iloc[i, 5]}\n</user>\n<chatbot>\n{df.iloc[i, 7]}\n</chatbot>\n'
-                if i == len(df) - 1:
-                    test += '\n</conv>'
-                    trials.append(test)
-                turn += 1
-            else:
-                test += '\n</conv>'
-                trials.append(test)
-                test = '\n<conv>\n'
-                trial += 1
-                turn = 1
-                test += f'\nTurn {turn}\n<user>\n{df.iloc[i, 5]}\n</user>\n<chatbot>\n{df.iloc[i, 7]}\n</chatbot>\n'
-                turn += 1
-        else:
-            test = '\n<conv>\n'
-            test += f'\nTurn {turn}\n<user>\n{df.iloc[i, 5]}\n</user>\n<chatbot>\n{df.iloc[i, 7]}\n</chatbot>\n'
-            test += '\n</conv>'
-            trials.append(test)
-                
-    return df, trials, num_turns
-
-
-def evaluate_response(system_prompts, df=None, trials=None, model_id='anthropic.claude-3-sonnet-20240229-v1:0',
-                      eval_rationale=False, file_path=None, num_turns=None):
-    
-    correct = []
-    eval_justification = []
-    
-    for trial in trials:
-        # print(trial)
-        messages = [{
-            "role": "user",
-            "content": [{"text": trial}]
-        }]
-
-        response = bedrock_runtime.converse(
-            modelId=model_id,
-            messages=messages,
-            system=system_prompts
-        )
-        output = response['output']['message']['content'][0]['text']
-        
-        '''json validation is done to determine if outputs are properly structured and value types
-        are correct, otherwise we mark as eval issue and attach the raw output to the rationale.
-        This is a consequence of the non-deterministic nature of LLM outputs'''
+    return build_conversations(pd.concat(read_summary(output_path), ignore_index=True))
+
+
+def judge_model_key(model_id=None):
+    """Identity of the judge model for cache keys: the pinned model, or every model of the 'judge' route."""
+    if model_id:
+        return model_id
+    route = router.routes['judge']
+    return 'route:' + ','.join(list(route['models']) + list(route.get('fallback', [])))
+
+
+def trial_cache_key(trial, model_id=None):
+    """Cache key of a trial: the shared rubric, judge model and transcript, the same in every mode."""
+    return cache_key(judge_guidelines, judge_model_key(model_id), trial)
+
+
+def extract_json(text):
+    """Parses the outermost JSON object of a model answer, tolerating text or code fences around it."""
+    start, end = text.find('{'), text.rfind('}')
+    if start == -1 or end < start:
+        raise ValueError('no JSON object in the judge output')
+    return json.loads(text[start:end + 1])
+
+
+def parse_judgement(judgement, num_turns):
+    """
+    Validates one structured judgement {"ratings": {...}, "rationale": "..."}.
+
+    Returns:
+        tuple: (list of num_turns ratings, rationale)
+    """
+    if not isinstance(judgement, dict) or not isinstance(judgement.get('ratings'), dict):
+        raise ValueError('expected {"ratings": {...}, "rationale": "..."}')
+    ratings = list(judgement['ratings'].values())
+    if len(ratings) != num_turns:
+        raise ValueError(f'json should have {num_turns} values')
+    return ratings, str(judgement.get('rationale', ''))
+
+
+def judge_trial(system_prompts, trial, model_id=None, eval_rationale=False, num_turns=None, retries=JUDGE_RETRIES,
+                cache=None, mode='two_call'):
+    """
+    Scores one trial with the judge model, retrying the whole trial on failure.
+
+    mode 'two_call' asks for the rationale in a second call when eval_rationale is set,
+    'structured' gets ratings and rationale from a single call (system_prompts must hold
+    the matching prompt, see JUDGE_MODES).
+
+    With a JudgeCache, a trial already scored with the same rubric and model, in any mode,
+    is not sent again, and well-formed new scores are stored.
+
+    Returns:
+        tuple: (list of num_turns scores, rationale text or None, number of retries, failed flag)
+    """
+    key = None
+    if cache is not None:
+        key = trial_cache_key(trial, model_id)
+        entry = cache.get(key, need_rationale=eval_rationale)
+        if entry is not None and len(entry['scores']) == num_turns:
+            return entry['scores'], entry['rationale'] if eval_rationale else None, 0, False
+    for attempt in range(retries + 1):
         try:
-            output_json = json.loads(output)
-            if len(output_json) < num_turns or len(output_json) > num_turns:
-                raise ValueError(f'json should have {num_turns} values')
-        except JSONDecodeError:
-            correct.extend(['Eval Issue see rationale for detail' for _ in range(num_turns)])
-        else:
-            correct.extend(list(output_json.values()))
-            
-        # outputs rationale to separate sheet in Excel if flag is true
-        if eval_rationale:
-            messages.extend([{
-                "role": "assistant",
-                "content": [{"text": str(output)}]
-            }, {
-                "role": "user",
-                "content": [{"text": '\n\nCan you explain your rationale for evaluating the conversation turns the way you did? Dont output anything else except for the rationale.'}]
-            }])
-
-            # Evaluate again, this time asking the model for its justification
-            response_eval = bedrock_runtime.converse(
-                modelId=model_id,
-                messages=messages,
-                system=system_prompts
-            )
-            eval_out = response_eval['output']['message']['content'][0]['text']
-            eval_justification.append(f'This is the raw output from LLM:\n\n{output}\n\nThis is the rationale:\n\n {eval_out}')
-               
+            judge = _judge_structured if mode != 'two_call' else _judge_trial
+            scores, rationale, used_model, valid = judge(system_prompts, trial, model_id, eval_rationale, num_turns)
+            if key is not None and valid:
+                cache.put(key, scores, rationale, used_model)
+            return scores, rationale, attempt, False
+        except Exception as e:
+            if attempt == retries:
+                issue = [EVAL_ISSUE for _ in range(num_turns)]
+                return issue, f'Judge call failed after {attempt + 1} attempts: {e!r}', attempt, True
+            time.sleep(get_limiter().backoff(attempt))
+
+
+def _judge_trial(system_prompts, trial, model_id, eval_rationale, num_turns):
+    messages = [{
+        "role": "user",
+        "content": [{"text": trial}]
+    }]
+
+    response = router.converse(
+        'judge',
+        model_id=model_id,
+        messages=messages,
+        system=system_prompts
+    )
+    output = response['output']['message']['content'][0]['text']
+
+    '''json validation is done to determine if outputs are properly structured and value types
+    are correct, otherwise we mark as eval issue and attach the raw output to the rationale.
+    This is a consequence of the non-deterministic nature of LLM outputs'''
     try:
-        df['Eval'] = correct
-    except Exception as e:
-        print(e, correct, len(correct), file_path)
-        
-    parent = file_path.parent
-    file = file_path.stem
-    
-    if eval_rationale:
-        with pd.ExcelWriter(f'{parent}/{file}_eval.xlsx') as writer:
-            df.to_excel(writer, index=False, sheet_name='Trials')
-            dfr = pd.DataFrame({'Trial': range(len(eval_justification)), 'rationale': eval_justification})
-            dfr.to_excel(writer, index=False, sheet_name='Rationale')
+        output_json = extract_json(output)
+        if len(output_json) < num_turns or len(output_json) > num_turns:
+            raise ValueError(f'json should have {num_turns} values')
+    except (JSONDecodeError, ValueError):
+        scores, valid = [EVAL_ISSUE for _ in range(num_turns)], False
     else:
-        df.to_excel(f'{parent}/{file}_eval.xlsx', index=False, sheet_name='Trials')
+        scores, valid = list(output_json.values()), True
+    used_model = response['routing']['model_id']
 
+    # outputs rationale to separate sheet in Excel if flag is true
+    if not eval_rationale:
+        return scores, None, used_model, valid
+    messages.extend([{
+        "role": "assistant",
+        "content": [{"text": str(output)}]
+    }, {
+        "role": "user",
+        "content": [{"text": RATIONALE_QUESTION}]
+    }])
 
-def eval_all(path, eval_rationale=True):
-    # Set up the judge prompt as the system prompt
-    system_prompts = [{"text": judge_prompt}]
+    # Evaluate again, this time asking the model for its justification
+    response_eval = router.converse(
+        'judge',
+        model_id=used_model,
+        messages=messages,
+        system=system_prompts
+    )
+    eval_out = response_eval['output']['message']['content'][0]['text']
+    return scores, f'This is the raw output from LLM:\n\n{output}\n\nThis is the rationale:\n\n {eval_out}', used_model, valid
 
-    # Judge LLM (can change to another bedrock model)
-    model_id = 'anthropic.claude-3-sonnet-20240229-v1:0'
 
-    # Find output file paths and create Path objects.
-    # Skip any files where the file name contains "_eval" or begins with ~
-    xlsx_files = list(find_xlsx_files(path))
-    xlsx_files = [x for x in xlsx_files if "_eval" not in x and "~$" not in x]
-    print("Evaluating responses in output files for correctness")
+def _judge_structured(system_prompts, trial, model_id, eval_rationale, num_turns):
+    response = router.converse(
+        'judge',
+        model_id=model_id,
+        messages=[{"role": "user", "content": [{"text": trial}]}],
+        system=system_prompts
+    )
+    output = response['output']['message']['content'][0]['text']
+    try:
+        scores, rationale = parse_judgement(extract_json(output), num_turns)
+        valid = True
+    except ValueError:
+        scores, rationale, valid = [EVAL_ISSUE for _ in range(num_turns)], f'This is the raw output from LLM:\n\n{output}', False
+    return scores, rationale if eval_rationale else None, response['routing']['model_id'], valid
+
 
-    # Run a loop over all output files to evaluate them using the paths found above
-    for path in xlsx_files:
-        file_path = p.Path(path)
-        file = os.path.split(file_path)[-1]
-        print(f"Scoring {file}")
+def pack_batches(trials, size=JUDGE_BATCH_SIZE, max_chars=JUDGE_BATCH_CHARS):
+    """Groups consecutive trial indexes into batches of at most `size` trials and `max_chars` transcript."""
+    batch, length = [], 0
+    for i, trial in enumerate(trials):
+        if batch and (len(batch) == size or length + len(trial) > max_chars):
+            yield batch
+            batch, length = [], 0
+        batch.append(i)
+        length += len(trial)
+    if batch:
+        yield batch
+
+
+def judge_batch(system_prompts, trials, num_turns, model_id=None, eval_rationale=False, cache=None):
+    """
+    Scores several trials in one call, each in its own `<conv id="cN">` tags.
+
+    Cached trials are left out of the request. A conversation missing from the answer or
+    with a malformed judgement, or every conversation when the call fails, is scored again
+    on its own with the structured prompt.
+
+    Returns:
+        list: judge_trial results in trial order, each with a trailing fallback flag
+    """
+    structured_prompts = [{"text": judge_prompt_structured}]
+    results, keys, pending = [None] * len(trials), [None] * len(trials), []
+    for i, trial in enumerate(trials):
+        if cache is not None:
+            keys[i] = trial_cache_key(trial, model_id)
+            entry = cache.get(keys[i], need_rationale=eval_rationale)
+            if entry is not None and len(entry['scores']) == num_turns[i]:
+                results[i] = (entry['scores'], entry['rationale'] if eval_rationale else None, 0, False, False)
+                continue
+        pending.append(i)
+
+    if len(pending) > 1:
+        request = ''.join(trials[i].replace('<conv>', f'<conv id="c{i}">', 1) for i in pending)
+        try:
+            response = router.converse(
+                'judge',
+                model_id=model_id,
+                messages=[{"role": "user", "content": [{"text": request}]}],
+                system=system_prompts
+            )
+            judged = extract_json(response['output']['message']['content'][0]['text'])
+            used_model = response['routing']['model_id']
+        except Exception as e:
+            print(f"Batch of {len(pending)} conversations failed, scoring them one by one: {e!r}")
+            judged, used_model = {}, None
+        for i in pending:
+            try:
+                scores, rationale = parse_judgement(judged.get(f'c{i}'), num_turns[i])
+            except ValueError:
+                continue
+            if keys[i] is not None:
+                cache.put(keys[i], scores, rationale, used_model)
+            results[i] = (scores, rationale if eval_rationale else None, 0, False, False)
+
+    for i in pending:
+        if results[i] is None:
+            result = judge_trial(structured_prompts, trials[i], model_id, eval_rationale, num_turns[i],
+                                 cache=cache, mode='structured')
+            results[i] = result + (len(pending) > 1,)
+    return results
+
+
+def submit_trials(pool, system_prompts, trials, model_id=None, eval_rationale=False, num_turns=None, progress=None,
+                  cache=None, mode='two_call'):
+    """
+    Queues every trial of a file on the worker pool, one task per trial or, in batch mode,
+    per batch of trials.
+
+    Each task runs in a copy of the caller's context, so the usage attribution set by
+    eval_all follows the calls into the worker threads. num_turns is either one count for
+    every trial or a list with the count of each trial.
+
+    Returns:
+        list: futures in trial order
+    """
+    if not isinstance(num_turns, list):
+        num_turns = [num_turns] * len(trials)
+
+    def task(trial, turns):
+        result = judge_trial(system_prompts, trial, model_id, eval_rationale, turns, cache=cache, mode=mode)
+        if progress is not None:
+            progress.update(retries=result[2], failed=result[3])
+        return result
+
+    if mode != 'batch':
+        return [pool.submit(contextvars.copy_context().run, task, trial, turns)
+                for trial, turns in zip(trials, num_turns)]
+
+    futures = [Future() for _ in trials]
+
+    def batch_task(indexes):
         try:
-            df, trials, num_turns = prepare_conversation(file_path)
-            evaluate_response(system_prompts, df, trials, eval_rationale=eval_rationale, file_path=file_path,
-                              num_turns=num_turns, model_id=model_id)
+            results = judge_batch(system_prompts, [trials[i] for i in indexes], [num_turns[i] for i in indexes],
+                                  model_id, eval_rationale, cache)
         except Exception as e:
-            print(e)
+            for i in indexes:
+                futures[i].set_exception(e)
+            return
+        for i, result in zip(indexes, results):
+            if progress is not None:
+                progress.update(retries=result[2], failed=result[3], fallback=result[4])
+            futures[i].set_result(result[:4])
+
+    for indexes in pack_batches(trials):
+        pool.submit(contextvars.copy_context().run, batch_task, indexes)
+    return futures
+
+
+def write_scores(writer, df, futures):
+    """Waits for the trials of a chunk and hands their scores and rationales, in trial order, to an EvalWriter."""
+    results = [future.result() for future in futures]
+    writer.write(df, [score for scores, _, _, _ in results for score in scores], [rationale for _, rationale, _, _ in results])
+
+
+def evaluate_response(system_prompts, df=None, trials=None, model_id=None,
+                      eval_rationale=False, file_path=None, num_turns=None, workers=JUDGE_WORKERS, cache=None,
+                      mode='two_call', output_format=JUDGE_OUTPUT_FORMAT):
+    """
+    Scores every trial with the judge model.
+
+    model_id pins the judge model; when None the 'judge' route of model_router picks it
+    (MODEL_ROUTES env var overrides the default Sonnet route). Trials are scored by up to
+    `workers` concurrent calls and written back in their original order. system_prompts must
+    hold the prompt of `mode`, see JUDGE_MODES.
+    """
+    progress = Progress(len(trials))
+    writer = EvalWriter(file_path, output_format, eval_rationale)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        write_scores(writer, df, submit_trials(pool, system_prompts, trials, model_id, eval_rationale, num_turns,
+                                               progress, cache, mode))
+    writer.close()
+    progress.print_line()
+
+
+def eval_all(path, eval_rationale=True, model_id=None, workers=JUDGE_WORKERS, cache_dir=JUDGE_CACHE_DIR,
+             mode=JUDGE_MODE, output_format=JUDGE_OUTPUT_FORMAT, chunk_rows=JUDGE_CHUNK_ROWS):
+    # Set up the judge prompt of the mode as the system prompt
+    system_prompts = [{"text": JUDGE_MODES[mode]}]
+    # Unchanged transcripts scored before by the same prompt and model come from the cache; None disables it
+    cache = JudgeCache(cache_dir) if cache_dir else None
+
+    # Judge LLM: None routes through the 'judge' task of model_router, or pin another bedrock model
+
+    # Find the latency summaries (xlsx, jsonl or parquet), skipping judge outputs and Excel lock files
+    summary_files = list(find_summary_files(path))
+    print(f"Evaluating responses in {len(summary_files)} output files for correctness with {workers} workers, "
+          f"{mode} judge, {output_format} output")
+    set_attribution(hotel='offline', action_group='llm_judge', function='judge')
+
+    # Files are read in chunks of whole trials, all queued on one shared pool. While the
+    # oldest chunk is written, the next ones are being scored; None closes a file.
+    progress = Progress()
+    in_flight = deque()
+
+    def drain(limit):
+        while len(in_flight) > limit:
+            writer, df, futures = in_flight.popleft()
+            if futures is not None:
+                write_scores(writer, df, futures)
+                continue
+            writer.close()
+            print(f"Scored {writer.path.name}")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for file_path in summary_files:
+            writer = EvalWriter(file_path, output_format, eval_rationale)
+            try:
+                for chunk in read_summary(file_path, chunk_rows):
+                    df, trials, num_turns = build_conversations(chunk)
+                    progress.total += len(trials)
+                    futures = submit_trials(pool, system_prompts, trials, model_id, eval_rationale, num_turns,
+                                            progress, cache, mode)
+                    in_flight.append((writer, df, futures))
+                    drain(2)
+            except Exception as e:
+                print(f"Stopped reading {file_path.name}: {e!r}")
+            in_flight.append((writer, None, None))
+        drain(0)
+    progress.print_line()
+    if cache is not None:
+        print(cache.summary())
+
+    for hotel, usage in rollups.items():
+        print(f"Judge usage: {usage['calls']} calls, {usage['input_tokens']} input / "
+              f"{usage['output_tokens']} output tokens, ~${usage['cost_usd']:.4f}")
 
 
 # Run from the command line
@@ -153,5 +449,20 @@ if __name__ == "__main__":
     parser.add_argument('path', type=str, help='The directory path containing the output files.')
     parser.add_argument('--no_eval_rationale', action='store_false', dest='eval_rationale',
                         help='Do not evaluate rationale for each trial')
+    parser.add_argument('--model_id', type=str, default=None,
+                        help='Pin the judge model instead of using the judge route')
+    parser.add_argument('--workers', type=int, default=JUDGE_WORKERS,
+                        help='Judge calls in flight at once (JUDGE_WORKERS)')
+    parser.add_argument('--cache_dir', type=str, default=JUDGE_CACHE_DIR,
+                        help='Judge result cache directory (JUDGE_CACHE_DIR)')
+    parser.add_argument('--no_cache', action='store_const', const=None, dest='cache_dir',
+                        help='Score every trial again, without reading or writing the cache')
+    parser.add_argument('--mode', choices=sorted(JUDGE_MODES), default=JUDGE_MODE,
+                        help='two_call (ratings, then rationale), structured (one call) or batch (JUDGE_MODE)')
+    parser.add_argument('--output_format', choices=OUTPUT_FORMATS, default=JUDGE_OUTPUT_FORMAT,
+                        help='Format of the <input>_eval files (JUDGE_OUTPUT_FORMAT)')
+    parser.add_argument('--chunk_rows', type=int, default=JUDGE_CHUNK_ROWS,
+                        help='Rows read at a time from jsonl and parquet inputs (JUDGE_CHUNK_ROWS)')
     args = parser.parse_args()
-    eval_all(args.path, args.eval_rationale)
\ No newline at end of file
+    eval_all(args.path, args.eval_rationale, args.model_id, args.workers, args.cache_dir, args.mode,
+             args.output_format, args.chunk_rows)
\ No newline at end of file
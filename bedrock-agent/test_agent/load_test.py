@@ -0,0 +1,304 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import boto3
+import pandas as pd
+from botocore.config import Config
+
+from file_payloads import payloads
+from test_agent import build_session_state, invoke_agent_helper
+
+# shared Bedrock helpers live next to the Lambda handlers
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'lambda'))
+from rate_limiter import THROTTLE_ERROR_CODES, client_config, error_code
+
+
+def load_conversations(test_files):
+    """
+    Reads test files in the test_agent JSON format
+
+    Args:
+        test_files (list): paths of JSON test files
+
+    Returns:
+        list: (conversation name, list of turns) tuples
+    """
+    conversations = []
+    for test_file in test_files:
+        with open(test_file) as f:
+            test_cases = json.load(f)
+        stem = Path(test_file).stem
+        for key, queries in test_cases.items():
+            conversations.append((f"{stem}/{key}", queries))
+    return conversations
+
+
+def make_client(region, concurrency):
+    # no SDK retries, so throttles are counted instead of hidden in latency
+    return boto3.client('bedrock-agent-runtime', region_name=region,
+                        config=client_config.merge(Config(max_pool_connections=max(concurrency, 10))))
+
+
+def run_conversation(client, name, queries, agent_id, alias_id, memory_id, user, results, scheduled=None):
+    """
+    Runs one conversation in a fresh session and puts one result per turn on the results queue
+
+    Args:
+        client: bedrock-agent-runtime client
+        name (str): conversation name
+        queries (list): turns of the conversation
+        agent_id (str): id for the agent
+        alias_id (str): id of the agent alias
+        memory_id (str): memory id for the agent
+        user (str): virtual user or arrival id running the conversation
+        results: queue.Queue or multiprocessing queue receiving turn results
+        scheduled (float, optional): time.perf_counter() at which the conversation was due to
+            start (open loop). The first turn's latency is measured from it, so time spent
+            waiting for a free worker counts; it is also reported as queue_ms
+    """
+    session_id = str(uuid.uuid1())
+    invocation_id = None
+    for j, query in enumerate(queries):
+        query, session_state = build_session_state(query, invocation_id)
+        start = time.perf_counter()
+        result = {"t": time.time(), "conversation": name, "user": user, "alias_id": alias_id,
+                  "query_order": j + 1, "ok": True, "throttled": False, "error": None, "queue_ms": 0.0}
+        if j == 0 and scheduled is not None:
+            result["queue_ms"] = round(max(0.0, start - scheduled) * 1000, 1)
+            start = min(start, scheduled)
+        try:
+            _, _, json_trace, invocation_id = invoke_agent_helper(
+                query, 0, j, session_id, agent_id, alias_id, memory_id,
+                session_state=session_state, client=client, verbose=False)
+            result["number_steps"] = len(json_trace)
+        except Exception as e:
+            code = error_code(e)
+            result.update(ok=False, throttled=code in THROTTLE_ERROR_CODES, error=code or type(e).__name__)
+        result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        results.put(result)
+        if not result["ok"]:
+            break
+    try:
+        invoke_agent_helper("end", 0, -1, session_id, agent_id, alias_id, memory_id,
+                            end_session=True, client=client, verbose=False)
+    except Exception:
+        pass
+
+
+def closed_loop(conversations, users, duration, ramp_up, worker_args, results, stop):
+    """
+    `users` virtual users, each running conversations back to back until `duration` seconds
+    have passed. Users start evenly spread over `ramp_up` seconds.
+    """
+    deadline = time.monotonic() + duration
+
+    def user_loop(u):
+        time.sleep(ramp_up * u / max(users, 1))
+        rng = random.Random(u)
+        while time.monotonic() < deadline and not stop.is_set():
+            name, queries = conversations[rng.randrange(len(conversations))]
+            run_conversation(worker_args["client"], name, queries, worker_args["agent_id"], worker_args["alias_id"],
+                             worker_args["memory_id"], f"{worker_args['shard']}-{u}", results)
+
+    threads = [threading.Thread(target=user_loop, args=(u,), daemon=True) for u in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def open_loop(conversations, rate, concurrency, duration, ramp_up, worker_args, results, stop):
+    """
+    Starts conversations as a Poisson process of `rate` conversations per second, ramping up
+    linearly over `ramp_up` seconds. At most `concurrency` conversations run at once; arrivals
+    that find every worker busy are queued, so their queueing shows up as latency.
+
+    Arrival times are drawn on an absolute schedule, independent of how long anything takes,
+    and each conversation carries its scheduled time to run_conversation. Its first turn is
+    timed from that time rather than from when a worker picked it up, which would hide the
+    queueing (coordinated omission).
+    """
+    work = queue.Queue()
+
+    def worker():
+        while True:
+            item = work.get()
+            if item is None:
+                return
+            name, queries, arrival, scheduled = item
+            run_conversation(worker_args["client"], name, queries, worker_args["agent_id"], worker_args["alias_id"],
+                             worker_args["memory_id"], arrival, results, scheduled=scheduled)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+
+    rng = random.Random(worker_args["shard"])
+    start = time.perf_counter()
+    scheduled = start
+    arrivals = 0
+    while not stop.is_set():
+        scheduled += rng.expovariate(rate)
+        time.sleep(max(0.0, scheduled - time.perf_counter()))
+        elapsed = scheduled - start
+        if elapsed >= duration:
+            break
+        # thinning: during ramp-up keep each arrival with probability elapsed / ramp_up
+        if ramp_up > 0 and rng.random() > elapsed / ramp_up:
+            continue
+        name, queries = conversations[rng.randrange(len(conversations))]
+        work.put((name, queries, f"{worker_args['shard']}-{arrivals}", scheduled))
+        arrivals += 1
+    for _ in threads:
+        work.put(None)
+    for thread in threads:
+        thread.join()
+
+
+def run_shard(shard, conversations, args, results, stop=None):
+    """Runs one shard of the load (all of it when there is a single process)."""
+    stop = stop or threading.Event()
+    worker_args = {"client": make_client(args.region, args.concurrency), "agent_id": args.agent_id,
+                   "alias_id": args.agent_alias_id, "memory_id": args.memory_id, "shard": shard}
+    if args.rate:
+        open_loop(conversations, args.rate, args.concurrency, args.duration, args.ramp_up, worker_args, results, stop)
+    else:
+        closed_loop(conversations, args.concurrency, args.duration, args.ramp_up, worker_args, results, stop)
+
+
+def _shard_process(shard, conversations, args, results):
+    run_shard(shard, conversations, args, results)
+    results.put(None)
+
+
+def _percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))] if ordered else float('nan')
+
+
+class LiveStats:
+    """Aggregates turn results and prints latency percentiles, throughput, throttles and errors."""
+
+    def __init__(self, window=30):
+        self.window = window
+        self.start = time.time()
+        self.results = []
+
+    def add(self, result):
+        self.results.append(result)
+
+    def summary(self, since=None):
+        results = [r for r in self.results if since is None or r["t"] >= since]
+        latencies = sorted(r["latency_ms"] for r in results if r["ok"])
+        elapsed = max(time.time() - (since or self.start), 1e-9)
+        return {
+            "turns": len(results),
+            "ok": len(latencies),
+            "throttles": sum(r["throttled"] for r in results),
+            "errors": sum(not r["ok"] and not r["throttled"] for r in results),
+            "throughput_per_s": round(len(latencies) / elapsed, 2),
+            "p50_ms": _percentile(latencies, 50),
+            "p95_ms": _percentile(latencies, 95),
+            "p99_ms": _percentile(latencies, 99),
+        }
+
+    def print_line(self):
+        total = self.summary()
+        recent = self.summary(since=time.time() - self.window)
+        print(f"[{time.time() - self.start:7.1f}s] turns={total['turns']} ok={total['ok']} "
+              f"throttles={total['throttles']} errors={total['errors']} | last {self.window}s: "
+              f"{recent['throughput_per_s']}/s p50={recent['p50_ms']} p95={recent['p95_ms']} p99={recent['p99_ms']} ms",
+              flush=True)
+
+
+def load_test(args):
+    conversations = load_conversations(args.test_file)
+    if not conversations:
+        raise ValueError("no conversations found in the test files")
+    stats = LiveStats(window=args.report_interval * 3)
+    stop = threading.Event()
+
+    if args.processes > 1:
+        # shard the conversations (round robin) and the concurrency / rate across processes
+        results = mp.Queue()
+        shards = [conversations[p::args.processes] or conversations for p in range(args.processes)]
+        shard_args = argparse.Namespace(**{**vars(args),
+                                          "concurrency": max(1, args.concurrency // args.processes),
+                                          "rate": args.rate / args.processes if args.rate else None})
+        workers = [mp.Process(target=_shard_process, args=(p, shards[p], shard_args, results), daemon=True)
+                   for p in range(args.processes)]
+        for worker in workers:
+            worker.start()
+        running = len(workers)
+    else:
+        results = queue.Queue()
+        workers = [threading.Thread(target=lambda: (run_shard(0, conversations, args, results, stop), results.put(None)),
+                                    daemon=True)]
+        workers[0].start()
+        running = 1
+
+    next_report = time.time() + args.report_interval
+    try:
+        while running:
+            try:
+                result = results.get(timeout=0.5)
+                if result is None:
+                    running -= 1
+                else:
+                    stats.add(result)
+            except queue.Empty:
+                pass
+            if time.time() >= next_report:
+                stats.print_line()
+                next_report += args.report_interval
+    except KeyboardInterrupt:
+        print("Interrupted, stopping workers")
+        stop.set()
+        for worker in workers:
+            if isinstance(worker, mp.Process):
+                worker.terminate()
+
+    stats.print_line()
+    summary = stats.summary()
+    print(json.dumps(summary, indent=2))
+    if payloads.payloads:
+        print(payloads.summary())
+
+    date_time = datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
+    out_dir = Path(args.output) / "load_test"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    with pd.ExcelWriter(out_dir / f"load_test_{date_time}.xlsx") as writer:
+        pd.DataFrame(stats.results).to_excel(writer, index=False, sheet_name='Turns')
+        pd.DataFrame([{**summary, **{k: vars(args)[k] for k in ("agent_alias_id", "concurrency", "rate", "duration",
+                                                                 "ramp_up", "processes")}}]
+                     ).to_excel(writer, index=False, sheet_name='Summary')
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog='agent_load_tester',
+        description='Load test a Bedrock agent alias with concurrent conversations from test_agent JSON files'
+    )
+    parser.add_argument('--test_file', type=str, nargs='+', required=True)  # json input files containing test data
+    parser.add_argument('--agent_id', type=str, required=True)  # ID for the agent
+    parser.add_argument('--agent_alias_id', type=str, default="7OAV2UGXZ9")  # ID for agent alias
+    parser.add_argument('--region', type=str, default="us-east-1")
+    parser.add_argument('--memory_id', type=str, default='None')
+    parser.add_argument('--concurrency', type=int, default=4)  # closed loop: virtual users; open loop: max in flight
+    parser.add_argument('--rate', type=float, default=None)  # open loop: conversations started per second
+    parser.add_argument('--duration', type=float, default=60)  # seconds of load
+    parser.add_argument('--ramp_up', type=float, default=0)  # seconds to reach full concurrency / rate
+    parser.add_argument('--processes', type=int, default=1)  # shard the load across processes
+    parser.add_argument('--report_interval', type=float, default=5)  # seconds between live lines
+    parser.add_argument('--output', type=str, default="./output")
+    load_test(parser.parse_args())
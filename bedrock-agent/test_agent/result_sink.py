@@ -0,0 +1,231 @@
+"""
+Append-only, crash-safe store for test_agent turn results.
+
+Every turn is appended to `<prefix>results_<date_time>.jsonl.gz` as its own gzip member
+(one JSON record: the latency summary fields plus the full json_trace), and a line with the
+summary fields and the member's offset/length is appended to `<prefix>results_<date_time>.idx.jsonl`.
+Both files are flushed after every turn, so a crash loses at most the turn in flight, and
+memory stays bounded however long the run is.
+
+- lookups by conversation / trial / query read the index and decompress single members
+- `ResultSink.resume` reopens the latest unfinished run of a conversation, drops a torn
+  tail, and reports which turns are already done
+- `summary_frame` rebuilds the latency summary (Excel / Parquet) from the index alone
+"""
+import gzip
+import json
+import os
+import zlib
+from pathlib import Path
+
+import pandas as pd
+
+# kept in the data file only; everything else is also written to the index
+HEAVY_FIELDS = ("json_trace",)
+COMPLETE_MARKER = {"complete": True}
+
+
+def index_path_for(path):
+    return Path(str(path).replace(".jsonl.gz", ".idx.jsonl"))
+
+
+def summary_path_for(path):
+    path = Path(path)
+    return path.parent / path.name.replace("results_", "latency_summary_").replace(".jsonl.gz", ".xlsx")
+
+
+def iter_index(path):
+    """Yields the index entries of a results file, skipping the completion marker and a torn last line."""
+    index_path = index_path_for(path)
+    if not index_path.exists():
+        return
+    with open(index_path) as f:
+        for line in f:
+            if not line.endswith("\n"):
+                break
+            entry = json.loads(line)
+            if entry != COMPLETE_MARKER:
+                yield entry
+
+
+def is_complete(path):
+    index_path = index_path_for(path)
+    if not index_path.exists():
+        return False
+    with open(index_path, "rb") as f:
+        f.seek(max(0, index_path.stat().st_size - 100))
+        return f.read().rstrip().endswith(json.dumps(COMPLETE_MARKER).encode())
+
+
+def read_record(path, offset, length):
+    """Decompresses the single record stored at offset."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return json.loads(gzip.decompress(f.read(length)))
+
+
+def iter_records(path):
+    """Yields every complete record of a results file in write order, stopping at a torn tail."""
+    with open(path, "rb") as f:
+        data = f.read()
+    position = 0
+    while position < len(data):
+        decompressor = zlib.decompressobj(wbits=31)
+        try:
+            payload = decompressor.decompress(data[position:])
+        except zlib.error:
+            return
+        if not decompressor.eof:
+            return
+        yield json.loads(payload)
+        position = len(data) - len(decompressor.unused_data)
+
+
+def lookup(path, execution=None, query_order=None):
+    """Records of a results file matching a trial and/or query, latest write of each turn."""
+    entries = {}
+    for entry in iter_index(path):
+        if execution is not None and entry["execution"] != execution:
+            continue
+        if query_order is not None and entry["query_order"] != query_order:
+            continue
+        entries[(entry["execution"], entry["query_order"])] = entry
+    return [read_record(path, e["offset"], e["length"]) for _, e in sorted(entries.items())]
+
+
+def load_trace(trace_file):
+    """json_trace of a turn from a `<results>.jsonl.gz@<offset>:<length>` reference or a legacy JSON file."""
+    trace_file = str(trace_file)
+    if ".jsonl.gz@" in trace_file:
+        path, _, position = trace_file.rpartition("@")
+        offset, _, length = position.partition(":")
+        return read_record(path, int(offset), int(length))["json_trace"]
+    with open(trace_file) as f:
+        return json.load(f)
+
+
+def summary_frame(path):
+    """Latency summary of a results file from its index; a turn written twice (resumed trial) keeps its last write."""
+    entries = {}
+    for entry in iter_index(path):
+        entries[(entry["execution"], entry["query_order"])] = entry
+    frame = pd.DataFrame([entries[key] for key in sorted(entries)])
+    return frame.drop(columns=["offset", "length"], errors="ignore")
+
+
+def summary_frames(run_dir):
+    """
+    Yields (conversation, summary DataFrame, summary path) for every run under run_dir: Excel
+    latency summaries, plus results files whose run never got to write one (crashed or running).
+    """
+    run_dir = Path(run_dir)
+    for summary_path in sorted(run_dir.rglob("*latency_summary_*.xlsx")):
+        yield summary_path.parent.name, pd.read_excel(summary_path), summary_path
+    for path in sorted(run_dir.rglob("*results_*.jsonl.gz")):
+        if not summary_path_for(path).exists():
+            frame = summary_frame(path)
+            if not frame.empty:
+                yield path.parent.name, frame, path
+
+
+def rollup_parquet(path, out_path=None):
+    """Writes the summary of a results file as Parquet (needs pyarrow or fastparquet)."""
+    out_path = out_path or Path(str(path).replace(".jsonl.gz", ".parquet"))
+    try:
+        summary_frame(path).to_parquet(out_path, index=False)
+    except ImportError as e:
+        print(f"Skipping Parquet rollup: {e}")
+        return None
+    return out_path
+
+
+class ResultSink:
+    """
+    Appends turn records to a results file and its index.
+
+    Args:
+        path (str): `<dir>/<prefix>results_<date_time>.jsonl.gz`
+        fsync (bool): fsync both files after every turn (survives power loss, not just crashes)
+    """
+
+    def __init__(self, path, fsync=False):
+        self.path = Path(path)
+        self.index_path = index_path_for(self.path)
+        self.fsync = fsync
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.completed = set()
+        self._repair()
+        self._data = open(self.path, "ab")
+        self._index = open(self.index_path, "a")
+
+    @classmethod
+    def resume(cls, directory, prefix="", fsync=False):
+        """Reopens the latest unfinished results file in directory, or returns None."""
+        candidates = [p for p in sorted(Path(directory).glob(f"{prefix}results_*.jsonl.gz")) if not is_complete(p)]
+        return cls(candidates[-1], fsync=fsync) if candidates else None
+
+    @property
+    def date_time(self):
+        return self.path.name.split("results_", 1)[1].replace(".jsonl.gz", "")
+
+    def _repair(self):
+        """Truncates a torn tail left by a crash so both files end on the same complete turn."""
+        if not self.index_path.exists():
+            if self.path.exists():
+                self.path.unlink()
+            return
+        valid_lines, end = [], 0
+        size = self.path.stat().st_size if self.path.exists() else 0
+        with open(self.index_path) as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                entry = json.loads(line)
+                if entry == COMPLETE_MARKER:
+                    continue
+                if entry["offset"] != end or entry["offset"] + entry["length"] > size:
+                    break
+                valid_lines.append(line)
+                end = entry["offset"] + entry["length"]
+                self.completed.add((entry["execution"], entry["query_order"]))
+        with open(self.index_path, "w") as f:
+            f.writelines(valid_lines)
+        if self.path.exists():
+            with open(self.path, "r+b") as f:
+                f.truncate(end)
+
+    def _flush(self, f):
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    def write(self, record):
+        """
+        Appends one turn record (must carry execution and query_order).
+
+        Returns:
+            str: reference to the stored record, usable with load_trace
+        """
+        data = gzip.compress(json.dumps(record, default=str).encode("utf-8"))
+        offset = self._data.tell()
+        self._data.write(data)
+        self._flush(self._data)
+        reference = f"{self.path}@{offset}:{len(data)}"
+        entry = {k: v for k, v in record.items() if k not in HEAVY_FIELDS}
+        entry.update(trace_file=reference, offset=offset, length=len(data))
+        self._index.write(json.dumps(entry, default=str) + "\n")
+        self._flush(self._index)
+        self.completed.add((record["execution"], record["query_order"]))
+        return reference
+
+    def trial_complete(self, execution, number_queries):
+        return all((execution, q) in self.completed for q in range(1, number_queries + 1))
+
+    def summary_frame(self):
+        return summary_frame(self.path)
+
+    def close(self, complete=True):
+        if complete:
+            self._index.write(json.dumps(COMPLETE_MARKER) + "\n")
+        self._data.close()
+        self._index.close()
@@ -7,13 +7,15 @@ from pathlib import Path
 import json
 import pandas as pd
 from llm_judge import eval_all
+from result_sink import ResultSink, rollup_parquet, summary_path_for
+from file_payloads import payloads, redact_payloads
 import openpyxl
 from pprint import pprint
 
 global bedrock_agent_runtime_client
 
 
-def process_response(query, session_state, trial_id, query_id, resp):
+def process_response(query, session_state, trial_id, query_id, resp, verbose=True):
     """
     Function that parsers the invoke_model response of an agent
 
@@ -23,6 +25,7 @@ def process_response(query, session_state, trial_id, query_id, resp):
         trial_id (int): trial id for user query
         query_id (int): query id inside a conversation
         resp (dict): the JSON response of the invokeModel API
+        verbose (bool): print action group inputs and step numbers while parsing
     """
     start_time = time.time()
     step_time = start_time
@@ -34,22 +37,26 @@ def process_response(query, session_state, trial_id, query_id, resp):
     step = 0
     for event in event_stream: 
         # print (f"\n{event = }\n")
-        try:
-            pprint (event['trace']['trace']['orchestrationTrace']['invocationInput']['actionGroupInvocationInput'])
-        except:
-            pass
+        if verbose:
+            try:
+                pprint (event['trace']['trace']['orchestrationTrace']['invocationInput']['actionGroupInvocationInput'])
+            except:
+                pass
 
         # If trace in response, print trace
         if "trace" in event.keys():
             trace_object = event.get('trace')['trace']
-            if "orchestrationTrace" in trace_object:
-                trace_event = trace_object['orchestrationTrace']
+            # pre-processing (when enabled on the agent) is recorded as steps like orchestration
+            trace_part = next((part for part in ("preProcessingTrace", "orchestrationTrace") if part in trace_object), None)
+            if trace_part:
+                trace_event = trace_object[trace_part]
                 if "modelInvocationInput" in trace_event: # the input for the pre-processing step, print each of these steps
                     if step > 0:
                         step_duration = (time.time() - step_time)
                         step_time = time.time()
                         json_trace[f"Step_{step}"]["step_duration"] = step_duration
-                    print(f"Step {step}")
+                    if verbose:
+                        print(f"Step {step}")
 
                     step += 1
                     if "Step_{step}" not in json_trace: # if current step isn't in the json_trace dictionary, add it
@@ -71,6 +78,11 @@ def process_response(query, session_state, trial_id, query_id, resp):
                     if 'finalResponse' in obs: # the response back to user
                         step_duration = (time.time() - step_time)
                         json_trace[f"Step_{step}"]["step_duration"] = step_duration
+                # seconds since the call started, so a step splits into model time and action time
+                if f"Step_{step}" in json_trace:
+                    for key in ("modelInvocationInput", "invocationInput", "observation"):
+                        if key in trace_event:
+                            json_trace[f"Step_{step}"].setdefault("event_times", {})[key] = time.time() - start_time
 
         if 'chunk' in event: # get citations for response
             data = event['chunk']['bytes']
@@ -163,7 +175,8 @@ def add_file_to_session_state(local_file_name=None, file_url=None, use_case='COD
                 "sourceType": "BYTE_CONTENT", 
                 "byteContent": {
                     "mediaType": media_type,
-                    "data": open(local_file_name, "rb").read()
+                    # read once per file content and shared across trials, see file_payloads.py
+                    "data": payloads.get(local_file_name)
                 }
             },
             "useCase": use_case
@@ -186,7 +199,8 @@ def add_file_to_session_state(local_file_name=None, file_url=None, use_case='COD
 
 
 def invoke_agent_helper(
-    query, trial_id, query_id, session_id, agent_id, alias_id, memory_id, session_state=None, end_session=False
+    query, trial_id, query_id, session_id, agent_id, alias_id, memory_id, session_state=None, end_session=False,
+    client=None, verbose=True
 ):
     """
     Support function to invoke agent
@@ -200,13 +214,15 @@ def invoke_agent_helper(
         alias_id (str): id of the agent alias
         session_state (dict): a session id to use to maintain the session context
         end_session (bool): if the session should be terminated
+        client: bedrock-agent-runtime client, defaults to the module client
+        verbose (bool): print trace details while parsing the response
     """
     
     if not session_state:
         session_state = {}
     
     # invoke the agent API
-    agent_response = bedrock_agent_runtime_client.invoke_agent(
+    agent_response = (client or bedrock_agent_runtime_client).invoke_agent(
         inputText=query,
         agentId=agent_id,
         agentAliasId=alias_id,
@@ -216,12 +232,57 @@ def invoke_agent_helper(
         endSession=end_session,
         sessionState=session_state
     )
-    return process_response(query, session_state, trial_id, query_id, agent_response)
+    return process_response(query, session_state, trial_id, query_id, agent_response, verbose=verbose)
+
+
+def build_session_state(query, invocation_id=None):
+    """
+    Splits one turn of a test file into the query text and the sessionState to send with it
+    
+    Args:
+        query (str | dict): a plain query, or a dict with query / file / promptSessionAttributes /
+            sessionAttributes / returnControlInvocationResults
+        invocation_id (str): invocation id of the previous returnControl, for returnControlInvocationResults
+    """
+    session_state = None
+    if type(query) == dict:
+        if "file" in query:
+            local_file_name = None
+            file_url = None
+            if "s3" in query["file"]:
+                file_url = query["file"]
+            else:
+                local_file_name = query["file"]
+            print(local_file_name, file_url)
+            use_case = query["type"]
+            session_state = add_file_to_session_state(
+                local_file_name=local_file_name,
+                file_url=file_url,
+                use_case=use_case,
+                session_state=None
+            )
+        if "promptSessionAttributes" in query:
+            if session_state is None:
+                session_state = {}
+            session_state["promptSessionAttributes"] = query["promptSessionAttributes"]
+        if "sessionAttributes" in query:
+            if session_state is None:
+                session_state = {}
+            session_state["sessionAttributes"] = query["sessionAttributes"]
+        if "returnControlInvocationResults" in query:
+            if session_state is None:
+                session_state = {}
+            session_state['returnControlInvocationResults'] = query['returnControlInvocationResults']
+            session_state['invocationId'] = invocation_id
+            query = ""
+        if "query" in query:
+            query = query["query"]
+    return query, session_state
 
 
 def test_query(
     show_code_use, queries_list, agent_id, alias_id, number_trials, memory_id, session_id, 
-    session_state=None, file_prefix="", sleep_time=0, 
+    session_state=None, file_prefix="", sleep_time=0, resume=False, parquet=False, fsync=False,
 ):
     #print('parms for test_query',queries_list, agent_id, alias_id, number_trials,session_state)
     """
@@ -236,8 +297,10 @@ def test_query(
         file_prefix (str): prefix to add to output files
         sleep_time (int): seconds to sleep between invocations
         memory_id (str): memory id for the agent for a previous conversation
+        resume (bool): continue the latest unfinished run of this conversation, skipping completed trials
+        parquet (bool): also write the latency summary as Parquet
+        fsync (bool): fsync the result sink after every turn
     """
-    latency_data = []
     folder_prefix = "conversation"
     
     if file_prefix != "":
@@ -245,50 +308,26 @@ def test_query(
         file_prefix += "_"
     Path("output/").mkdir(parents=True, exist_ok=True)
     
-    now = datetime.now() # current date and time
-    date_time = now.strftime("%Y_%m_%d_%H_%M_%S")
     Path(f"output/{folder_prefix}/").mkdir(parents=True, exist_ok=True)
+    # every turn is streamed to an append-only results file, see result_sink.py
+    sink = ResultSink.resume(f"output/{folder_prefix}", file_prefix, fsync=fsync) if resume else None
+    if sink is None:
+        date_time = datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
+        sink = ResultSink(f"output/{folder_prefix}/{file_prefix}results_{date_time}.jsonl.gz", fsync=fsync)
+    else:
+        print(f"Resuming {sink.path} with {len(sink.completed)} completed turns")
     # repeat trial for as many time as specified by number_trials
     for i in range(number_trials):
+        if sink.trial_complete(i + 1, len(queries_list)):
+            print(f"================== trial {i} already complete ==================")
+            continue
         print(f"================== trial {i} ==================")
         if session_id == 'None':
             session_id:str = str(uuid.uuid1())
         j = 0
         invocation_id = None
         for query in queries_list:
-            session_state = None
-            if type(query) == dict:
-                if "file" in query:
-                    local_file_name = None
-                    file_url = None
-                    if "s3" in query["file"]:
-                        file_url = query["file"]
-                    else:
-                        local_file_name = query["file"]
-                    print(local_file_name, file_url)
-                    use_case = query["type"]
-                    session_state = add_file_to_session_state(
-                        local_file_name=local_file_name,
-                        file_url=file_url,
-                        use_case=use_case,
-                        session_state=None
-                    )
-                if "promptSessionAttributes" in query:
-                    if session_state is None:
-                        session_state = {}
-                    session_state["promptSessionAttributes"] = query["promptSessionAttributes"]
-                if "sessionAttributes" in query:
-                    if session_state is None:
-                        session_state = {}
-                    session_state["sessionAttributes"] = query["sessionAttributes"]
-                if "returnControlInvocationResults" in query:
-                    if session_state is None:
-                        session_state = {}
-                    session_state['returnControlInvocationResults'] = query['returnControlInvocationResults']
-                    session_state['invocationId'] = invocation_id
-                    query = ""
-                if "query" in query:
-                    query = query["query"]
+            query, session_state = build_session_state(query, invocation_id)
             print(f"Query: {query}, Invocation Id: {invocation_id}")
             final_resp, execution_time, json_trace, invocation_id = invoke_agent_helper(
                 query, i, j, session_id, agent_id, alias_id, memory_id,
@@ -297,19 +336,17 @@ def test_query(
 
             print(f"Final response: {final_resp}")
             print(f"Execution time: {execution_time}")
-            trace_file_json = f'output/{folder_prefix}/{file_prefix}test_{i}_query_{j}_{date_time}.json'
-            with open(trace_file_json, 'w') as output:
-                json.dump(json_trace, output)
-            latency_data.append({
+            sink.write({
                 "agent_id": agent_id,
+                "alias_id": alias_id,
                 "execution": (i+1),
                 "query_order": (j+1),
-                "trace_file": trace_file_json,
                 "execution_time": execution_time,
                 "query": query,
-                "session_state": str(session_state),
+                "session_state": str(redact_payloads(session_state, payloads)),
                 "final_response": final_resp,
-                "number_steps": len(json_trace.keys())
+                "number_steps": len(json_trace.keys()),
+                "json_trace": json_trace,
             })
             j += 1
             if sleep_time > 0:
@@ -319,8 +356,13 @@ def test_query(
             session_state=session_state, 
             end_session=True
         )
-    latency_df = pd.DataFrame(latency_data)
-    latency_df.to_excel(f"output/{folder_prefix}/{file_prefix}latency_summary_{date_time}.xlsx", index=False)
+    sink.close()
+    if payloads.payloads:
+        print(payloads.summary())
+    # the Excel summary is still written for llm_judge and older tooling; trace_file points into the results file
+    sink.summary_frame().to_excel(summary_path_for(sink.path), index=False)
+    if parquet:
+        rollup_parquet(sink.path)
     
     
 if __name__ == "__main__":
@@ -338,6 +380,9 @@ if __name__ == "__main__":
     parser.add_argument('--memory_id', type=str, default='None') # Memory ID 
     parser.add_argument('--session_id', type=str, default='None') # Session ID to continue a previous conversation
     parser.add_argument('--output', type=str, default="./output") #path to the folder that hold all the agent trial outputs
+    parser.add_argument('--resume', action='store_true') # continue the latest unfinished run of each conversation
+    parser.add_argument('--parquet', action='store_true') # also write the latency summary as Parquet
+    parser.add_argument('--fsync', action='store_true') # fsync results after every turn
 
     args = parser.parse_args()
     print(args)
@@ -351,7 +396,7 @@ if __name__ == "__main__":
             test_query(
                 args.show_code_use, queries, args.agent_id, args.agent_alias_id,
                 args.number_trials, args.memory_id, args.session_id, None,
-                key, args.sleep_time
+                key, args.sleep_time, resume=args.resume, parquet=args.parquet, fsync=args.fsync
             )
         exit()
         eval_all(Path(f"output"))
@@ -0,0 +1,38 @@
+"""
+Which files of a test_agent output tree llm_judge picks up.
+
+    python -m pytest bedrock-agent/test_agent/tests
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from judge_io import find_summary_files  # noqa: E402
+
+DATE = '2026_10_19_18_00_00'
+
+
+def touch(directory, *names):
+    directory.mkdir(parents=True, exist_ok=True)
+    for name in names:
+        (directory / name).write_bytes(b'')
+
+
+def test_only_test_agent_summaries_are_found(tmp_path):
+    touch(tmp_path / 'conversation',
+          f'results_{DATE}.jsonl.gz', f'results_{DATE}.idx.jsonl', f'latency_summary_{DATE}.xlsx',
+          f'latency_summary_{DATE}_eval.jsonl', f'~$latency_summary_{DATE}.xlsx')
+    touch(tmp_path / 'towels', f'towels_latency_summary_{DATE}.xlsx')
+    touch(tmp_path,
+          f'load_test_{DATE}.xlsx', 'trace_analytics.xlsx', 'compare.xlsx', 'workload.jsonl', 'steps.parquet')
+
+    found = sorted(path.relative_to(tmp_path).as_posix() for path in find_summary_files(tmp_path))
+
+    assert found == [f'conversation/results_{DATE}.idx.jsonl', f'towels/towels_latency_summary_{DATE}.xlsx']
+
+
+def test_parquet_rollup_is_preferred(tmp_path):
+    touch(tmp_path, f'results_{DATE}.parquet', f'results_{DATE}.idx.jsonl', f'latency_summary_{DATE}.xlsx')
+
+    assert [path.name for path in find_summary_files(tmp_path)] == [f'results_{DATE}.parquet']
@@ -0,0 +1,64 @@
+"""
+Step classification of traces recorded by test_agent.process_response.
+
+    python -m pytest bedrock-agent/test_agent/tests
+"""
+import os
+import sys
+from pathlib import Path
+
+TEST_AGENT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(TEST_AGENT_DIR))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+from test_agent import process_response  # noqa: E402
+from trace_analytics import classify_step, trace_steps  # noqa: E402
+
+AGENT = {'agentId': 'QPUIAGLFMO', 'agentAliasId': 'FN2KWQFPLG', 'sessionId': 'session-1'}
+
+
+def orchestration(part):
+    return {'trace': {**AGENT, 'trace': {'orchestrationTrace': part}}}
+
+
+# A front desk transfer as the agent streams it: one orchestration step that calls the
+# lookup action group, then one whose model call ends the stream in returnControl.
+RETURN_CONTROL_TURN = [
+    orchestration({'modelInvocationInput': {'traceId': 't-0', 'type': 'ORCHESTRATION', 'text': '...'}}),
+    orchestration({'rationale': {'traceId': 't-0', 'text': 'Look up the room first.'}}),
+    orchestration({'invocationInput': {'traceId': 't-0', 'invocationType': 'ACTION_GROUP', 'actionGroupInvocationInput': {
+        'actionGroupName': 'lookup', 'function': 'getRoom', 'parameters': []}}}),
+    orchestration({'observation': {'traceId': 't-0', 'type': 'ACTION_GROUP', 'actionGroupInvocationOutput': {'text': '851'}}}),
+    orchestration({'modelInvocationInput': {'traceId': 't-1', 'type': 'ORCHESTRATION', 'text': '...'}}),
+    orchestration({'rationale': {'traceId': 't-1', 'text': 'The guest wants the front desk.'}}),
+    {'returnControl': {'invocationId': 'd3b5c1e2', 'invocationInputs': [{'functionInvocationInput': {
+        'actionGroup': 'transfer', 'function': 'transferFD', 'actionInvocationType': 'RESULT', 'parameters': []}}]}},
+]
+
+
+def recorded_trace():
+    resp = {'ResponseMetadata': {'HTTPStatusCode': 200}, 'completion': iter(RETURN_CONTROL_TURN)}
+    answer, _, json_trace, invocation_id = process_response('front desk please', {}, 0, 0, resp, verbose=False)
+    assert invocation_id == 'd3b5c1e2'
+    return json_trace
+
+
+def test_step_ending_in_return_control_is_classified_by_its_model_call():
+    json_trace = recorded_trace()
+
+    assert 'invocationInputs' in json_trace['Step_2']
+    assert classify_step(json_trace['Step_1']) == 'action_group'
+    assert classify_step(json_trace['Step_2']) == 'orchestration'
+
+
+def test_return_control_hand_off_is_a_zero_duration_row():
+    steps = trace_steps(recorded_trace())
+
+    assert [(row['step'], row['step_type'], row['target']) for row in steps] == [
+        (1, 'action_group', 'lookup.getRoom'),
+        (2, 'orchestration', ''),
+        (2, 'returnControl', 'transfer.transferFD'),
+    ]
+    orchestration_row, hand_off = steps[1], steps[2]
+    assert orchestration_row['model_s'] == orchestration_row['duration_s'] is not None
+    assert hand_off['duration_s'] == 0.0 and hand_off['model_s'] == 0.0
@@ -0,0 +1,216 @@
+import argparse
+import json
+import re
+from pathlib import Path
+
+import pandas as pd
+
+from result_sink import load_trace, summary_frames
+
+STEP_TYPES = ("pre_processing", "orchestration", "action_group", "knowledge_base", "returnControl")
+TRACE_FILE_PATTERN = re.compile(r"test_(\d+)_query_(-?\d+)_")
+
+
+def classify_step(step):
+    """
+    Classifies one Step_N entry of a json_trace written by test_agent.process_response
+
+    Args:
+        step (dict): the step entry
+
+    Returns:
+        str: one of STEP_TYPES except returnControl. A step that ended in returnControl is
+        classified by its model call; trace_steps adds the hand-off as its own row
+    """
+    invocation = step.get("invocationInput", {})
+    invocation_type = invocation.get("invocationType", "")
+    if invocation_type.startswith("ACTION_GROUP") or "actionGroupInvocationInput" in invocation:
+        return "action_group"
+    if invocation_type == "KNOWLEDGE_BASE" or "knowledgeBaseLookupInput" in invocation:
+        return "knowledge_base"
+    if step.get("modelInvocationInput", {}).get("type") == "PRE_PROCESSING":
+        return "pre_processing"
+    return "orchestration"
+
+
+def step_target(step):
+    """Name of the action group function or knowledge base a step called."""
+    invocation = step.get("invocationInput", {})
+    if "actionGroupInvocationInput" in invocation:
+        action = invocation["actionGroupInvocationInput"]
+        return f"{action.get('actionGroupName', '')}.{action.get('function') or action.get('apiPath', '')}"
+    if "knowledgeBaseLookupInput" in invocation:
+        return invocation["knowledgeBaseLookupInput"].get("knowledgeBaseId", "")
+    return ""
+
+
+def return_control_target(step):
+    """Action group function a step handed back to the caller through returnControl."""
+    inputs = step.get("invocationInputs") or [{}]
+    function_input = inputs[0].get("functionInvocationInput", {})
+    return f"{function_input.get('actionGroup', '')}.{function_input.get('function', '')}"
+
+
+def trace_steps(json_trace):
+    """
+    One row per step of a json_trace. When event times were recorded, a step that invoked an
+    action group or knowledge base is split into model_s (modelInvocationInput -> invocationInput)
+    and action_s (invocationInput -> observation).
+
+    A step that ended in returnControl keeps its model time under its own step type and is
+    followed by a returnControl row with zero duration. The function itself runs in the
+    caller after the stream ended, so the trace has no time for it.
+    """
+    rows = []
+    for key, step in json_trace.items():
+        if not key.startswith("Step_") or not isinstance(step, dict):
+            continue
+        step_type = classify_step(step)
+        duration = step.get("step_duration")
+        times = step.get("event_times", {})
+        model_s = action_s = None
+        if "invocationInput" in times and "modelInvocationInput" in times:
+            model_s = times["invocationInput"] - times["modelInvocationInput"]
+        if "observation" in times and "invocationInput" in times and step_type in ("action_group", "knowledge_base"):
+            action_s = times["observation"] - times["invocationInput"]
+        if model_s is None and duration is not None and step_type in ("orchestration", "pre_processing"):
+            model_s = duration
+        rows.append({
+            "step": int(key.split("_")[1]),
+            "step_type": step_type,
+            "target": step_target(step),
+            "duration_s": duration,
+            "model_s": model_s,
+            "action_s": action_s,
+        })
+        if "invocationInputs" in step or "invocationId" in step:
+            rows.append({
+                "step": rows[-1]["step"],
+                "step_type": "returnControl",
+                "target": return_control_target(step),
+                "duration_s": 0.0,
+                "model_s": 0.0,
+                "action_s": None,
+            })
+    return rows
+
+
+def _resolve_trace_file(trace_file, run_dir):
+    trace_file = str(trace_file)
+    if ".jsonl.gz@" in trace_file:
+        path, _, position = trace_file.rpartition("@")
+        resolved = _resolve_trace_file(path, run_dir)
+        return f"{resolved}@{position}" if resolved else None
+    path = Path(trace_file)
+    for candidate in (path, run_dir.parent / path, run_dir / path.name):
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def load_run(output_dir):
+    """
+    Loads every step of every trace under an output directory written by test_agent.
+
+    Latency summaries (or the index of a results file whose run never finished) supply
+    conversation, alias and query order; legacy per-query trace files without a summary are
+    still loaded, with the conversation taken from their folder name.
+
+    Args:
+        output_dir (str): test_agent output directory (or one conversation folder in it)
+
+    Returns:
+        pd.DataFrame: one row per step
+    """
+    output_dir = Path(output_dir)
+    rows, seen = [], set()
+    for conversation, summary, summary_path in summary_frames(output_dir):
+        for record in summary.to_dict("records"):
+            trace_path = _resolve_trace_file(record["trace_file"], summary_path.parent)
+            if trace_path is None:
+                continue
+            if isinstance(trace_path, Path):
+                seen.add(trace_path.resolve())
+            turn = {
+                "conversation": conversation,
+                "agent_id": record.get("agent_id", "unknown"),
+                "alias_id": record.get("alias_id", "unknown"),
+                "execution": record.get("execution"),
+                "query_order": record.get("query_order"),
+                "execution_time": record.get("execution_time"),
+                "trace_file": str(trace_path),
+            }
+            rows.extend({**turn, **step} for step in trace_steps(load_trace(trace_path)))
+
+    for trace_path in sorted(output_dir.rglob("*test_*_query_*.json")):
+        if trace_path.resolve() in seen:
+            continue
+        match = TRACE_FILE_PATTERN.search(trace_path.name)
+        turn = {
+            "conversation": trace_path.parent.name,
+            "agent_id": "unknown",
+            "alias_id": "unknown",
+            "execution": int(match.group(1)) + 1 if match else None,
+            "query_order": int(match.group(2)) + 1 if match else None,
+            "execution_time": None,
+            "trace_file": str(trace_path),
+        }
+        rows.extend({**turn, **step} for step in trace_steps(json.loads(trace_path.read_text())))
+    return pd.DataFrame(rows)
+
+
+def distribution(steps, by):
+    """count / mean / p50 / p95 / max of step duration and its share of the total per group."""
+    grouped = steps.dropna(subset=["duration_s"]).groupby(by)["duration_s"]
+    table = grouped.agg(count="count", mean="mean", p50="median",
+                        p95=lambda s: s.quantile(0.95), max="max", total="sum")
+    table["share"] = table["total"] / table["total"].sum()
+    return table.round(3)
+
+
+def time_split(steps, by):
+    """Seconds spent in model calls vs action groups / knowledge bases per group."""
+    split = steps.groupby(by)[["model_s", "action_s"]].sum(min_count=1)
+    split["action_share"] = split["action_s"] / split[["model_s", "action_s"]].sum(axis=1)
+    return split.round(3)
+
+
+def analyze(output_dir, top=10, write=True):
+    steps = load_run(output_dir)
+    if steps.empty:
+        print(f"No traces found under {output_dir}")
+        return {}
+
+    results = {
+        "by_step_type": distribution(steps, "step_type"),
+        "by_conversation": distribution(steps, ["conversation", "step_type"]),
+        "by_alias": distribution(steps, ["alias_id", "step_type"]),
+        "by_target": distribution(steps[steps["target"] != ""], ["step_type", "target"]),
+        "model_vs_action": time_split(steps, ["alias_id", "conversation"]),
+        "slowest_steps": steps.nlargest(top, "duration_s")[
+            ["conversation", "alias_id", "execution", "query_order", "step", "step_type", "target",
+             "duration_s", "model_s", "action_s", "trace_file"]],
+    }
+
+    pd.set_option("display.width", 200)
+    for name in ("by_step_type", "by_alias", "by_target", "model_vs_action", "slowest_steps"):
+        print(f"\n== {name} ==")
+        print(results[name].to_string())
+
+    if write:
+        out_path = Path(output_dir) / "trace_analytics.xlsx"
+        with pd.ExcelWriter(out_path) as writer:
+            steps.to_excel(writer, index=False, sheet_name="Steps")
+            for name, table in results.items():
+                table.to_excel(writer, sheet_name=name[:31], index=name != "slowest_steps")
+        print(f"\nWritten to {out_path}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Per-step latency breakdown of test_agent traces.')
+    parser.add_argument('path', type=str, help='test_agent output directory')
+    parser.add_argument('--top', type=int, default=10, help='number of slowest steps to list')
+    parser.add_argument('--no_write', action='store_false', dest='write', help='only print, no xlsx')
+    args = parser.parse_args()
+    analyze(args.path, top=args.top, write=args.write)
@@ -0,0 +1,113 @@
+"""
+Concurrency benchmark for the asyncio agent invocation path.
+
+Drives `invoke_agent_helper_async` against a local stub of bedrock-agent-runtime whose
+event stream emits trace events and a final chunk with configurable delays, and compares
+it with the same workload run thread-per-call through the blocking `invoke_agent_helper`
+of lambda-fulfillment-handler.py against FakeAgentRuntime. Both stubs stream the same
+stubs.agent_events with the same per-event delay, and both helpers go through the rate
+limiter, spans and usage accounting, so the comparison covers the whole call path.
+
+Usage:
+    python benchmarks/bench_agent_async.py --conversations 500 --events 6 --event_delay 0.05
+"""
+import argparse
+import asyncio
+import importlib.util
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from stubs import LAMBDA_DIR, FakeAgentRuntime, agent_events, offline_environment  # noqa: E402
+
+offline_environment(METRICS_ENABLED=os.environ.get('METRICS_ENABLED', '0'))
+sys.path.insert(0, str(LAMBDA_DIR))
+
+from agent_async import invoke_agent_helper_async  # noqa: E402
+
+
+class StubAsyncAgentRuntime:
+    """Async counterpart of stubs.FakeAgentRuntime, streaming the same canned events."""
+
+    def __init__(self, trace_events=6, event_delay=0.05, return_control_every=0):
+        self.trace_events = trace_events
+        self.event_delay = event_delay
+        self.return_control_every = return_control_every
+        self.calls = 0
+
+    async def invoke_agent(self, **kwargs):
+        self.calls += 1
+        return_control = bool(self.return_control_every and 'inputText' in kwargs
+                              and self.calls % self.return_control_every == 0)
+        return {'completion': self._stream(agent_events(self.trace_events, return_control=return_control))}
+
+    async def _stream(self, events):
+        for event in events:
+            if self.event_delay:
+                await asyncio.sleep(self.event_delay)
+            yield event
+
+
+def load_fulfillment_handler():
+    """lambda-fulfillment-handler.py as a module, for its blocking invoke_agent_helper."""
+    spec = importlib.util.spec_from_file_location('lambda-fulfillment-handler', LAMBDA_DIR / 'lambda-fulfillment-handler.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _summary(label, latencies, wall):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+    print(f"{label:<10} n={len(latencies):<6} wall={wall:8.2f}s  "
+          f"throughput={len(latencies) / wall:9.1f} conv/s  "
+          f"p50={statistics.median(latencies) * 1000:8.1f}ms  p95={p95 * 1000:8.1f}ms  "
+          f"threads={threading.active_count()}")
+
+
+async def run_async(args):
+    client = StubAsyncAgentRuntime(args.events, args.event_delay, args.return_control_every)
+
+    async def conversation(i):
+        start = time.perf_counter()
+        await invoke_agent_helper_async(client, 'I need two towels', f'session-{i}', 'AGENT', 'ALIAS', memory_id='123')
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(conversation(i) for i in range(args.conversations)))
+    _summary('asyncio', latencies, time.perf_counter() - start)
+
+
+def run_threads(args):
+    handler = load_fulfillment_handler()
+    handler.bedrock_agent_runtime_client = FakeAgentRuntime(args.events, args.event_delay, args.return_control_every)
+
+    def conversation(i):
+        start = time.perf_counter()
+        handler.invoke_agent_helper('I need two towels', f'session-{i}', 'AGENT', 'ALIAS', memory_id='123')
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        latencies = list(pool.map(conversation, range(args.conversations)))
+    _summary(f'threads={args.threads}', latencies, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark concurrent agent conversations against a stub event stream.')
+    parser.add_argument('--conversations', type=int, default=500)
+    parser.add_argument('--events', type=int, default=6, help='trace events streamed before the final chunk')
+    parser.add_argument('--event_delay', type=float, default=0.05, help='seconds between stream events')
+    parser.add_argument('--return_control_every', type=int, default=0, help='every Nth call ends in returnControl')
+    parser.add_argument('--threads', type=int, default=32, help='pool size for the thread-per-call comparison, 0 to skip')
+    args = parser.parse_args()
+
+    asyncio.run(run_async(args))
+    if args.threads:
+        run_threads(args)
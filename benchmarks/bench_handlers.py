@@ -0,0 +1,216 @@
+"""
+Offline benchmark of the Lambda handlers' own Python overhead.
+
+Every handler runs against recorded events (fixtures/events.json) with its AWS
+dependencies replaced by the stand-ins in stubs.py: stubbed botocore clients for
+bedrock-runtime / lambda / lexv2-runtime, a fake invoke_agent event stream, an in-memory
+S3 holding fixtures/, and a local HTTP server for the robot order API (ORDER_API_URL).
+What is left is the handlers' own work: parsing, prompt building, routing, rate limiting,
+instrumentation, logging, botocore serialization and loopback HTTP.
+
+Reports µs/op (mean, p50, p95) and tracemalloc peak KiB/op per handler, checks the shape
+of converse requests (cachePoint only sent to models that support prompt caching, and only
+as the last system block), and compares with a stored baseline:
+
+    python benchmarks/bench_handlers.py                       # compare with benchmarks/baseline.json
+    python benchmarks/bench_handlers.py --save-baseline       # record a new baseline
+    python benchmarks/bench_handlers.py --only ticket-api-call --ops 2000 --fail-on-regression
+"""
+import argparse
+import contextlib
+import gc
+import importlib.util
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from stubs import (FIXTURES, LAMBDA_DIR, FakeAgentRuntime, InMemoryS3, OrderServer,  # noqa: E402
+                   StubAws, converse_response, offline_environment)
+
+BASELINE = Path(__file__).resolve().parent / 'baseline.json'
+
+# handler name -> (module file, entry point)
+HANDLERS = {
+    "fulfillment-handler": ("lambda-fulfillment-handler.py", "lambda_handler"),
+    "ticket-api-call": ("lambda-ticket-api-call.py", "lambda_handler"),
+    "create-ticket": ("lambda-create-ticket.py", "lambda_handler"),
+    "local-area-info": ("lambda-local-area-info.py", "lambda_handler"),
+    "proxy-api-handler": ("lambda-proxy-api-handler.py", "handler"),
+}
+
+ITEM_EXTRACTION_ANSWER = '[{"item": "Bath Towel", "quantity": "2"}, {"item": "Toothbrush", "quantity": "1"}]'
+LOCAL_AREA_ANSWER = ("1. Mama's Pizza - 2300 Bass Pro Dr, 0.2 miles\n2. Napoli's - 101 Main St, 1.1 miles\n"
+                     "3. Pie Five - 500 W State Hwy 114, 1.4 miles")
+
+
+class LambdaContext:
+    function_name = "bench"
+    aws_request_id = "bench-request"
+    invoked_function_arn = "arn:aws:lambda:us-east-1:000000000000:function:bench"
+
+    @staticmethod
+    def get_remaining_time_in_millis():
+        return 180000
+
+
+class CachePointCheck:
+    """Counts converse requests whose cachePoint blocks do (not) fit the target model."""
+
+    def __init__(self):
+        self.ok = 0
+        self.bad = []
+
+    def __call__(self, params):
+        from prompt_cache import supports_prompt_caching
+        has_cache_point = any('cachePoint' in block for block in params.get('system', []))
+        expected = supports_prompt_caching(params['modelId'])
+        if not has_cache_point or (expected and 'cachePoint' in params['system'][-1]):
+            self.ok += 1
+        else:
+            self.bad.append({"modelId": params['modelId'], "system_blocks": [list(b) for b in params.get('system', [])]})
+
+
+def load_handler(name):
+    filename, entry_point = HANDLERS[name]
+    spec = importlib.util.spec_from_file_location(Path(filename).stem, LAMBDA_DIR / filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return getattr(module, entry_point)
+
+
+def measure(handler, event, ops, warmup):
+    """Times `ops` calls one by one, then reruns a slice under tracemalloc for the peak."""
+    context = LambdaContext()
+    for _ in range(warmup):
+        handler(event, context)
+
+    gc.collect()
+    gc.disable()
+    timings = []
+    try:
+        for _ in range(ops):
+            start = time.perf_counter_ns()
+            handler(event, context)
+            timings.append(time.perf_counter_ns() - start)
+    finally:
+        gc.enable()
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(max(1, min(ops, 50))):
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            handler(event, context)
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+
+    timings = sorted(t / 1000 for t in timings)
+    return {
+        "ops": ops,
+        "us_per_op": round(statistics.fmean(timings), 1),
+        "p50_us": round(timings[len(timings) // 2], 1),
+        "p95_us": round(timings[min(len(timings) - 1, int(0.95 * len(timings)))], 1),
+        "peak_kib_per_op": round(statistics.fmean(peaks) / 1024, 1),
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints the change against the baseline, returns the names of regressed handlers.
+    Time is compared on p50, which is far less noisy than the mean on a busy laptop.
+    """
+    regressions = []
+    print(f"\n{'handler':<22}{'p50 us':>10}{'base':>10}{'delta':>9}{'KiB/op':>9}{'base':>9}{'delta':>9}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            print(f"{name:<22}{result['p50_us']:>10}{'-':>10}{'':>9}{result['peak_kib_per_op']:>9}{'-':>9}")
+            continue
+        time_delta = result['p50_us'] / base['p50_us'] - 1
+        mem_delta = result['peak_kib_per_op'] / base['peak_kib_per_op'] - 1 if base['peak_kib_per_op'] else 0
+        flag = ""
+        if time_delta > threshold or mem_delta > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<22}{result['p50_us']:>10}{base['p50_us']:>10}{time_delta:>+9.1%}"
+              f"{result['peak_kib_per_op']:>9}{base['peak_kib_per_op']:>9}{mem_delta:>+9.1%}{flag}")
+    return regressions
+
+
+def run(args):
+    events = json.loads((FIXTURES / 'events.json').read_text())
+    cache_check = CachePointCheck()
+    aws = StubAws(s3=InMemoryS3.from_directory(FIXTURES, 'bench-config'),
+                  agent_runtime=FakeAgentRuntime(trace_events=args.trace_events))
+    aws.respond('lambda', 'invoke', {'StatusCode': 202, 'Payload': b''})
+    aws.respond('lexv2-runtime', 'recognize_text', {
+        'sessionId': 'bench-session-0001',
+        'messages': [{'contentType': 'PlainText', 'content': 'Two bath towels are on their way.'}],
+        'sessionState': {'dialogAction': {'type': 'Close'}, 'intent': {'name': 'FallbackIntent', 'state': 'Fulfilled'},
+                         'sessionAttributes': {'phone_number': '+16782030501', 'room_number': '851'}},
+    })
+
+    results = {}
+    sys.path.insert(0, str(LAMBDA_DIR))
+    devnull = open(os.devnull, 'w')
+    # handlers print EMF lines and log every call: keep the formatting cost, drop the output
+    logging.basicConfig(stream=devnull, force=True,
+                        format='[%(asctime)s] p%(process)s {%(filename)s:%(lineno)d} %(levelname)s - %(message)s')
+    if args.no_logging:
+        logging.disable(logging.CRITICAL)
+    with OrderServer() as order_server, aws:
+        offline_environment(ORDER_API_URL=order_server.url)
+        for name in args.only or HANDLERS:
+            answer = LOCAL_AREA_ANSWER if name == 'local-area-info' else ITEM_EXTRACTION_ANSWER
+            aws.respond('bedrock-runtime', 'converse', converse_response(answer), checker=cache_check)
+            with contextlib.redirect_stdout(devnull):
+                handler = load_handler(name)
+                results[name] = measure(handler, events[name], args.ops, args.warmup)
+            print(f"{name:<22} {results[name]['us_per_op']:>10} us/op  p50={results[name]['p50_us']}  "
+                  f"p95={results[name]['p95_us']}  peak={results[name]['peak_kib_per_op']} KiB/op", flush=True)
+        print(f"order API requests: {order_server.requests}, S3 gets: {aws.s3.gets}, "
+              f"invoke_agent calls: {aws.agent_runtime.calls}")
+
+    print(f"converse cachePoint shape: {cache_check.ok} ok, {len(cache_check.bad)} wrong")
+    for bad in cache_check.bad[:3]:
+        print(f"  {bad}")
+
+    if args.save_baseline:
+        baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+        baseline.update(results)
+        BASELINE.write_text(json.dumps(baseline, indent=2) + "\n")
+        print(f"baseline written to {BASELINE}")
+        regressions = []
+    elif BASELINE.exists():
+        regressions = compare(results, json.loads(BASELINE.read_text()), args.threshold)
+    else:
+        regressions = []
+        print("no baseline yet, run with --save-baseline")
+
+    if cache_check.bad:
+        return 2
+    if regressions and args.fail_on_regression:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the Lambda handlers offline against stubbed AWS services.')
+    parser.add_argument('--only', nargs='+', choices=sorted(HANDLERS), help='handlers to run, default all')
+    parser.add_argument('--ops', type=int, default=500, help='timed calls per handler')
+    parser.add_argument('--warmup', type=int, default=50, help='untimed calls per handler first')
+    parser.add_argument('--trace_events', type=int, default=4, help='trace events in the fake agent stream')
+    parser.add_argument('--no_logging', action='store_true', help='disable logging to see its share of the cost')
+    parser.add_argument('--threshold', type=float, default=0.15, help='relative slowdown counted as a regression')
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the baseline')
+    parser.add_argument('--fail-on-regression', action='store_true', help='exit 1 when a handler regressed')
+    sys.exit(run(parser.parse_args()))
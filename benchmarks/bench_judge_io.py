@@ -0,0 +1,92 @@
+"""
+Benchmark of llm_judge input/output per format.
+
+Writes a synthetic latency summary in each format, then times the judge's I/O path on it:
+read (in chunks for JSONL and Parquet), conversation assembly, and writing scores and
+rationales through EvalWriter. The judge calls are replaced by constant scores. Every case
+runs in a fresh process, so peak RSS covers pandas, openpyxl and pyarrow allocations.
+
+Usage:
+    python benchmarks/bench_judge_io.py --rows 100000
+    python benchmarks/bench_judge_io.py --rows 20000 --formats xlsx jsonl
+"""
+import argparse
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'bedrock-agent' / 'test_agent'))
+
+from stubs import offline_environment  # noqa: E402
+
+offline_environment()
+from bench_prepare_conversation import synthetic_summary  # noqa: E402
+from judge_io import EvalWriter, read_summary  # noqa: E402
+from llm_judge import build_conversations  # noqa: E402
+
+SUFFIXES = {'xlsx': '.xlsx', 'jsonl': '.jsonl', 'parquet': '.parquet'}
+
+
+def write_input(df, directory, fmt):
+    path = Path(directory) / f'latency_summary_bench{SUFFIXES[fmt]}'
+    if fmt == 'xlsx':
+        df.to_excel(path, index=False)
+    elif fmt == 'jsonl':
+        df.to_json(path, orient='records', lines=True)
+    else:
+        df.to_parquet(path, index=False)
+    return path
+
+
+def judge_io(path, fmt, chunk_rows, queue):
+    start = time.perf_counter()
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    writer = EvalWriter(path, fmt, eval_rationale=True)
+    rows = trials_total = 0
+    for chunk in read_summary(path, chunk_rows):
+        df, trials, num_turns = build_conversations(chunk)
+        writer.write(df, [4] * len(df), ['rationale'] * len(trials))
+        rows += len(df)
+        trials_total += len(trials)
+    writer.close()
+    queue.put({
+        'format': fmt, 'rows': rows, 'trials': trials_total,
+        'seconds': round(time.perf_counter() - start, 3),
+        'peak_rss_mib': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'rss_growth_mib': round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base_rss) / 1024, 1),
+        'output_kib': round(writer.path.stat().st_size / 1024, 1),
+    })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark llm_judge I/O per format.')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--turns', type=int, default=5)
+    parser.add_argument('--chunk_rows', type=int, default=5000)
+    parser.add_argument('--formats', nargs='+', choices=sorted(SUFFIXES), default=['xlsx', 'jsonl', 'parquet'])
+    args = parser.parse_args()
+
+    df = synthetic_summary(args.rows, args.turns)
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as directory:
+        results = []
+        for fmt in args.formats:
+            path = write_input(df, directory, fmt)
+            queue = context.Queue()
+            process = context.Process(target=judge_io, args=(path, fmt, args.chunk_rows, queue))
+            process.start()
+            results.append(queue.get())
+            process.join()
+            result = results[-1]
+            print(f"{fmt:<8} {result['rows']} rows, {result['trials']} trials: {result['seconds']:>7}s  "
+                  f"peak RSS {result['peak_rss_mib']} MiB (+{result['rss_growth_mib']} during I/O)  "
+                  f"output {result['output_kib']} KiB", flush=True)
+    reference = next((r for r in results if r['format'] == 'xlsx'), None)
+    if reference:
+        for result in results:
+            if result is not reference:
+                print(f"{result['format']}: x{reference['seconds'] / result['seconds']:.1f} faster than xlsx")
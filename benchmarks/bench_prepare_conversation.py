@@ -0,0 +1,105 @@
+"""
+Benchmark of conversation assembly in llm_judge.
+
+Builds a synthetic latency summary (uniform or ragged trials, rows shuffled or in order)
+and times `build_conversations` against the previous row-by-row loop, which is kept here
+as the reference. On uniform, ordered input both must produce identical transcripts.
+
+Usage:
+    python benchmarks/bench_prepare_conversation.py --rows 100000 --turns 5
+    python benchmarks/bench_prepare_conversation.py --rows 100000 --ragged --shuffle
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'bedrock-agent' / 'test_agent'))
+
+from stubs import offline_environment  # noqa: E402
+
+offline_environment()
+from llm_judge import build_conversations  # noqa: E402
+
+
+def legacy_conversations(df):
+    """The former prepare_conversation loop (by column name), valid only when every trial has the same turns."""
+    turn = 1
+    test = '\n<conv>\n'
+    trials = []
+    num_turns = int(len(df) / df['execution'].nunique())
+    query, answer = df.columns.get_loc('query'), df.columns.get_loc('final_response')
+    for i in range(len(df)):
+        if num_turns != 1:
+            if not (i % num_turns == 0) or i == 0:
+                test += f'\nTurn {turn}\n<user>\n{df.iloc[i, query]}\n</user>\n<chatbot>\n{df.iloc[i, answer]}\n</chatbot>\n'
+                if i == len(df) - 1:
+                    test += '\n</conv>'
+                    trials.append(test)
+                turn += 1
+            else:
+                test += '\n</conv>'
+                trials.append(test)
+                test = '\n<conv>\n'
+                turn = 1
+                test += f'\nTurn {turn}\n<user>\n{df.iloc[i, query]}\n</user>\n<chatbot>\n{df.iloc[i, answer]}\n</chatbot>\n'
+                turn += 1
+        else:
+            test = '\n<conv>\n'
+            test += f'\nTurn {turn}\n<user>\n{df.iloc[i, query]}\n</user>\n<chatbot>\n{df.iloc[i, answer]}\n</chatbot>\n'
+            test += '\n</conv>'
+            trials.append(test)
+    return trials
+
+
+def synthetic_summary(rows, turns, ragged=False, shuffle=False, seed=0):
+    rng = random.Random(seed)
+    records, execution = [], 0
+    while len(records) < rows:
+        execution += 1
+        for query_order in range(1, (rng.randint(1, 2 * turns - 1) if ragged else turns) + 1):
+            records.append({
+                "agent_id": "BENCHAGENT", "alias_id": "TSTALIASID", "execution": execution,
+                "query_order": query_order, "execution_time": rng.uniform(1, 10),
+                "query": f"Can I get {rng.randint(1, 4)} towels to room {rng.randint(100, 999)}?",
+                "final_response": "Your request has been submitted, towels are on their way.",
+                "number_steps": rng.randint(2, 8),
+            })
+    records = records[:rows]
+    if shuffle:
+        rng.shuffle(records)
+    return pd.DataFrame(records)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark llm_judge conversation assembly.')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--turns', type=int, default=5, help='turns per trial (mean turns when ragged)')
+    parser.add_argument('--ragged', action='store_true', help='trials with 1..2*turns-1 turns')
+    parser.add_argument('--shuffle', action='store_true', help='rows in random order')
+    parser.add_argument('--skip_legacy', action='store_true', help='do not time the row-by-row loop')
+    args = parser.parse_args()
+
+    df = synthetic_summary(args.rows, args.turns, args.ragged, args.shuffle)
+    (_, trials, sizes), elapsed = timed(build_conversations, df)
+    print(f"build_conversations: {len(df)} rows -> {len(trials)} trials in {elapsed * 1000:.1f} ms "
+          f"({len(df) / elapsed:,.0f} rows/s), turns per trial {min(sizes)}..{max(sizes)}")
+
+    if not args.skip_legacy:
+        legacy, legacy_elapsed = timed(legacy_conversations, df)
+        print(f"legacy loop:         {len(df)} rows -> {len(legacy)} trials in {legacy_elapsed * 1000:.1f} ms "
+              f"({len(df) / legacy_elapsed:,.0f} rows/s), speedup x{legacy_elapsed / elapsed:.1f}")
+        if not args.ragged and not args.shuffle and len(df) % args.turns == 0:
+            print(f"identical transcripts: {legacy == trials}")
+        else:
+            print("legacy loop mis-groups ragged or unordered input, transcripts not compared")
@@ -0,0 +1,232 @@
+"""
+Replays recorded agent traces through the fulfillment handler with their recorded timing.
+
+Every turn test_agent recorded (results files, see bedrock-agent/test_agent/result_sink.py,
+or single json_trace files) is turned back into an invoke_agent event stream: trace events
+at the times they arrived (`event_times`, or `step_duration` for older traces), then the
+final chunk or returnControl at the recorded execution time. `--scale` stretches or shrinks
+those delays; `--scale 0` delivers everything at once and leaves only handler overhead.
+
+The streams feed `lambda-fulfillment-handler.lambda_handler` with AWS replaced by the
+stand-ins in stubs.py. Conversations are replayed `--concurrency` at a time, the turns of a
+conversation one after the other in the same session. The follow-up call after a
+returnControl was not recorded and answers at once. Recorded traces carry no
+modelInvocationOutput, so token usage is not replayed.
+
+Reports recorded and replayed latency per turn, the handler's overhead over the stream
+(p50 / p95 / max), errors, answers that differ from the recording, and turns over the
+Lambda timeout:
+
+    python benchmarks/replay_traces.py bedrock-agent/test_agent/output --concurrency 20
+    python benchmarks/replay_traces.py output/conversation_one/results_2025_03_01_10_00_00.jsonl.gz --scale 0.5 --repeat 10
+    python benchmarks/replay_traces.py bedrock-agent/test_agent/output --scale 0
+"""
+import argparse
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'bedrock-agent' / 'test_agent'))
+
+from bench_handlers import LambdaContext, load_handler  # noqa: E402
+from result_sink import lookup  # noqa: E402
+from stubs import (FIXTURES, LAMBDA_DIR, FakeAgentRuntime, InMemoryS3, ScheduledEventStream,  # noqa: E402
+                   StubAws, offline_environment)
+
+STEP_KEY = re.compile(r'Step_(\d+)$')
+TRACE_KEYS = ('modelInvocationInput', 'rationale', 'invocationInput', 'observation')
+RETURN_CONTROL_ANSWER = 'Let me transfer you to the front desk.'
+
+
+def trace_schedule(json_trace, execution_time=None, final_response=''):
+    """
+    Rebuilds the invoke_agent event stream of one recorded turn.
+
+    Events recorded with `event_times` keep those times. Older traces only have
+    `step_duration`, so their events are placed at the start of the step and the
+    observation at its end. The chunk (or returnControl) comes at execution_time, or right
+    after the last step.
+
+    Returns:
+        list: (seconds since the call started, event) pairs in delivery order
+    """
+    steps = sorted((int(STEP_KEY.match(key).group(1)), step) for key, step in json_trace.items()
+                   if STEP_KEY.match(key) and isinstance(step, dict))
+    schedule, cursor, final = [], 0.0, None
+    for _, step in steps:
+        times = step.get('event_times', {})
+        start = last = cursor
+        end = start + float(step.get('step_duration') or 0)
+        for key in TRACE_KEYS:
+            if key not in step:
+                continue
+            offset = times.get(key, end if key == 'observation' else last)
+            last = max(last, float(offset))
+            trace = {'sessionId': 'replay', 'trace': {'orchestrationTrace': {key: step[key]}}}
+            schedule.append((last, {'trace': trace}))
+        cursor = max(end, last)
+        if 'original_agent_answer' in step:
+            chunk = {'bytes': step['original_agent_answer'].encode('utf-8')}
+            if step.get('citations'):
+                chunk['attribution'] = {'citations': step['citations']}
+            final = {'chunk': chunk}
+        elif 'invocationId' in step:
+            final = {'returnControl': {'invocationId': step['invocationId'],
+                                       'invocationInputs': step.get('invocationInputs', [])}}
+    if final is None:
+        final = {'chunk': {'bytes': str(final_response or '').encode('utf-8')}}
+    schedule.append((max(cursor, float(execution_time or 0)), final))
+    return schedule
+
+
+def expected_answer(schedule):
+    final = schedule[-1][1]
+    return final['chunk']['bytes'].decode('utf-8') if 'chunk' in final else RETURN_CONTROL_ANSWER
+
+
+def load_conversations(paths):
+    """
+    Recorded conversations under paths (results files, directories holding them, or
+    json_trace files): lists of turns with the query and the rebuilt schedule.
+    """
+    files = []
+    for path in map(Path, paths):
+        files.extend(sorted(path.rglob('*results_*.jsonl.gz')) if path.is_dir() else [path])
+    conversations = []
+    for path in files:
+        if path.name.endswith('.jsonl.gz'):
+            trials = {}
+            for record in lookup(path):
+                schedule = trace_schedule(record['json_trace'], record.get('execution_time'),
+                                          record.get('final_response'))
+                trials.setdefault(record['execution'], []).append({'query': record.get('query'), 'schedule': schedule})
+            conversations.extend(trials.values())
+        else:
+            schedule = trace_schedule(json.loads(path.read_text()))
+            conversations.append([{'query': None, 'schedule': schedule}])
+    return conversations
+
+
+class ReplayAgentRuntime(FakeAgentRuntime):
+    """FakeAgentRuntime answering each session's next call with the turn queued for it."""
+
+    def __init__(self, scale=1.0):
+        super().__init__(script=self._stream)
+        self.scale = scale
+        self.pending = {}
+
+    def expect(self, session_id, turn):
+        self.pending[session_id] = turn
+
+    def _stream(self, params):
+        if 'inputText' not in params:
+            # the call carrying the returnControl result was never recorded
+            return [{'chunk': {'bytes': RETURN_CONTROL_ANSWER.encode('utf-8')}}]
+        offsets, events = zip(*self.pending.pop(params['sessionId'])['schedule'])
+        return ScheduledEventStream(list(events), list(offsets), self.scale)
+
+
+class ReplayContext(LambdaContext):
+    def __init__(self, timeout):
+        self.deadline = time.perf_counter() + timeout
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self.deadline - time.perf_counter()) * 1000))
+
+
+def replay_conversation(handler, runtime, base_event, conversation, session_id, scale, timeout):
+    results = []
+    default_query = base_event['transcriptions'][0]['transcription']
+    for turn in conversation:
+        runtime.expect(session_id, turn)
+        event = {**base_event, 'sessionId': session_id,
+                 'transcriptions': [{'transcription': turn['query'] or default_query, 'transcriptionConfidence': 1.0}]}
+        start = time.perf_counter()
+        try:
+            response, error = handler(event, ReplayContext(timeout)), None
+        except Exception as e:
+            response, error = None, repr(e)
+        latency = time.perf_counter() - start
+        answer = response['messages'][0]['content'] if response else None
+        results.append({
+            'recorded': turn['schedule'][-1][0] * scale,
+            'replayed': latency,
+            'error': error,
+            'mismatch': error is None and answer != expected_answer(turn['schedule']),
+        })
+    return results
+
+
+def percentiles(values):
+    values = sorted(values)
+    return {
+        'p50': round(values[len(values) // 2], 3),
+        'p95': round(values[min(len(values) - 1, int(0.95 * len(values)))], 3),
+        'max': round(values[-1], 3),
+    }
+
+
+def run(args):
+    conversations = load_conversations(args.paths) * args.repeat
+    if not conversations:
+        print(f"no recorded turns under {', '.join(args.paths)}")
+        return 1
+    base_event = json.loads((FIXTURES / 'events.json').read_text())['fulfillment-handler']
+    runtime = ReplayAgentRuntime(args.scale)
+    aws = StubAws(s3=InMemoryS3.from_directory(FIXTURES, 'bench-config'), agent_runtime=runtime)
+
+    sys.path.insert(0, str(LAMBDA_DIR))
+    devnull = open(os.devnull, 'w')
+    logging.basicConfig(stream=devnull, force=True,
+                        format='[%(asctime)s] p%(process)s {%(filename)s:%(lineno)d} %(levelname)s - %(message)s')
+    turns = sum(len(conversation) for conversation in conversations)
+    print(f"replaying {turns} turns of {len(conversations)} conversations, "
+          f"concurrency {args.concurrency}, scale {args.scale}", flush=True)
+    start = time.perf_counter()
+    with aws, contextlib.redirect_stdout(devnull):
+        offline_environment()
+        handler = load_handler('fulfillment-handler')
+        # the first call pays lazy imports and config loads, keep that off the first replayed turn
+        runtime.expect('replay-warmup', {'schedule': [(0.0, {'chunk': {'bytes': b'warm'}})]})
+        handler({**base_event, 'sessionId': 'replay-warmup'}, ReplayContext(args.timeout))
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            futures = [
+                pool.submit(contextvars.copy_context().run, replay_conversation, handler, runtime, base_event,
+                            conversation, f'replay-{i:06d}', args.scale, args.timeout)
+                for i, conversation in enumerate(conversations)
+            ]
+            results = [result for future in futures for result in future.result()]
+    wall = time.perf_counter() - start
+
+    ok = [r for r in results if r['error'] is None]
+    errors = [r['error'] for r in results if r['error'] is not None]
+    print(f"{len(results)} turns in {wall:.2f}s ({len(results) / wall:.1f} turns/s), {len(errors)} errors, "
+          f"{sum(r['mismatch'] for r in ok)} answers differ from the recording, "
+          f"{sum(r['replayed'] > args.timeout for r in results)} over the {args.timeout:g}s timeout")
+    if ok:
+        for label, values in (('recorded s', [r['recorded'] for r in ok]),
+                              ('replayed s', [r['replayed'] for r in ok]),
+                              ('overhead ms', [(r['replayed'] - r['recorded']) * 1000 for r in ok])):
+            stats = percentiles(values)
+            print(f"{label:<12} p50={stats['p50']:<10} p95={stats['p95']:<10} max={stats['max']}")
+    for error in sorted(set(errors))[:3]:
+        print(f"  {error}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Replay recorded agent traces through the fulfillment handler.')
+    parser.add_argument('paths', nargs='+', help='results files (*.jsonl.gz), directories of them, or json_trace files')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplier on recorded delays, 0 for none')
+    parser.add_argument('--concurrency', type=int, default=10, help='conversations replayed at once')
+    parser.add_argument('--repeat', type=int, default=1, help='replay every conversation this many times')
+    parser.add_argument('--timeout', type=float, default=180, help='Lambda timeout in seconds, as deployed')
+    sys.exit(run(parser.parse_args()))
@@ -0,0 +1,328 @@
+"""
+Offline stand-ins for everything the Lambda handlers talk to.
+
+- `RepeatingStubber`: a botocore Stubber that answers every call of an operation with the
+  same canned response (instead of one queued response per call) and hands the request
+  parameters to an optional checker. Requests still go through botocore's parameter
+  validation and serialization, only the HTTP round trip is skipped.
+- `FakeAgentRuntime`: bedrock-agent-runtime whose invoke_agent returns a fake event stream
+  of trace events followed by a chunk (or a returnControl), since event streams cannot be
+  stubbed with Stubber. `ScheduledEventStream` delivers events at recorded offsets.
+- `InMemoryS3`: get_object / put_object / upload_file over a dict, loadable from a directory.
+- `OrderServer`: local HTTP server answering POST /robot/order/create.
+- `StubAws`: patches `boto3.client` and `boto3.Session.client` so handlers importing boto3
+  get the stand-ins above.
+"""
+import copy
+import io
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import boto3
+import botocore.session
+from botocore.awsrequest import AWSResponse
+from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
+from botocore.stub import Stubber
+
+FIXTURES = Path(__file__).resolve().parent / 'fixtures'
+LAMBDA_DIR = Path(__file__).resolve().parents[1] / 'lambda'
+
+
+class RepeatingStubber(Stubber):
+    """Stubber whose responses are per operation and never run out."""
+
+    def __init__(self, client):
+        super().__init__(client)
+        self._responses = {}
+        self._checkers = {}
+        self.calls = {}
+
+    def respond(self, method, service_response, checker=None):
+        """
+        Answers every call of `method` with `service_response`.
+
+        Args:
+            method (str): client method, e.g. 'converse'
+            service_response (dict): response, validated against the service model once here
+            checker (callable, optional): called with the request params of every call
+        """
+        operation_name = self.client.meta.method_to_api_mapping[method]
+        self._validate_operation_response(operation_name, service_response)
+        self._responses[operation_name] = service_response
+        if checker:
+            self._checkers[operation_name] = checker
+        return self
+
+    def _assert_expected_params(self, model, params, context, **kwargs):
+        checker = self._checkers.get(model.name)
+        if checker:
+            checker(params)
+
+    def _get_response_handler(self, model, params, context, **kwargs):
+        if model.name not in self._responses:
+            raise AssertionError(f"No stubbed response for {model.name}")
+        self.calls[model.name] = self.calls.get(model.name, 0) + 1
+        # a fresh copy per call, as parsing a real response would give (callers may mutate it)
+        response = copy.deepcopy(self._responses[model.name])
+        if 'Payload' in response:
+            # streaming bodies are single use, hand out a fresh one per call
+            data = response['Payload']
+            response = {**response, 'Payload': StreamingBody(io.BytesIO(data), len(data))}
+        return AWSResponse(None, 200, {}, None), response
+
+
+class FakeEventStream:
+    """Iterable of canned invoke_agent events with an optional delay before each one."""
+
+    def __init__(self, events, event_delay=0.0):
+        self.events = events
+        self.event_delay = event_delay
+        self.closed = False
+
+    def __iter__(self):
+        for event in self.events:
+            if self.event_delay:
+                time.sleep(self.event_delay)
+            yield event
+
+    def close(self):
+        self.closed = True
+
+
+class ScheduledEventStream(FakeEventStream):
+    """
+    Event stream that delivers each event at its own offset (seconds) from the moment the
+    stream was created, as a recorded agent call did. Offsets are absolute, so a slow
+    consumer falls behind the recording instead of stretching it.
+    """
+
+    def __init__(self, events, offsets, scale=1.0):
+        super().__init__(events)
+        self.offsets = [offset * scale for offset in offsets]
+        self.created = time.perf_counter()
+
+    def __iter__(self):
+        for event, offset in zip(self.events, self.offsets):
+            delay = self.created + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            yield event
+
+
+def agent_events(trace_events=4, answer=b'Sure, two bath towels and a toothbrush are on their way to room 851.',
+                 return_control=False):
+    """Trace events of a short orchestration, then the final chunk or a returnControl."""
+    events = []
+    for i in range(trace_events):
+        if i % 2 == 0:
+            part = {'modelInvocationInput': {'traceId': f't-{i}', 'type': 'ORCHESTRATION', 'text': 'prompt ' * 200}}
+        else:
+            part = {'modelInvocationOutput': {'traceId': f't-{i}', 'rawResponse': {'content': 'completion ' * 50},
+                                              'metadata': {'usage': {'inputTokens': 1800, 'outputTokens': 60}}}}
+        events.append({'trace': {'agentId': 'QPUIAGLFMO', 'agentAliasId': 'FN2KWQFPLG', 'sessionId': 'bench',
+                                 'trace': {'orchestrationTrace': part}}})
+    if return_control:
+        events.append({'returnControl': {'invocationId': 'bench-invocation', 'invocationInputs': [
+            {'functionInvocationInput': {'actionGroup': 'transfer', 'function': 'transferFD', 'parameters': []}}]}})
+    else:
+        events.append({'chunk': {'bytes': answer}})
+    return events
+
+
+class FakeAgentRuntime:
+    """
+    bedrock-agent-runtime stand-in. invoke_agent returns a FakeEventStream; every
+    `return_control_every`-th call with inputText ends in returnControl. A `script` is
+    called with the request parameters and returns a list of events or a ready stream.
+    """
+
+    def __init__(self, trace_events=4, event_delay=0.0, return_control_every=0, script=None):
+        self.trace_events = trace_events
+        self.event_delay = event_delay
+        self.return_control_every = return_control_every
+        self.script = script
+        self.calls = 0
+        self.requests = []
+
+    def invoke_agent(self, **kwargs):
+        self.calls += 1
+        self.requests.append(kwargs)
+        if self.script is not None:
+            events = self.script(kwargs)
+        else:
+            return_control = bool(self.return_control_every and 'inputText' in kwargs
+                                  and self.calls % self.return_control_every == 0)
+            events = agent_events(self.trace_events, return_control=return_control)
+        stream = events if isinstance(events, FakeEventStream) else FakeEventStream(events, self.event_delay)
+        return {'ResponseMetadata': {'HTTPStatusCode': 200}, 'contentType': 'application/json',
+                'sessionId': kwargs.get('sessionId'), 'completion': stream}
+
+
+class InMemoryS3:
+    """The subset of the S3 client the handlers use, over a dict of (bucket, key) -> bytes."""
+
+    def __init__(self, objects=None):
+        self.objects = dict(objects or {})
+        self.gets = 0
+
+    @classmethod
+    def from_directory(cls, directory, bucket):
+        objects = {(bucket, path.name): path.read_bytes() for path in Path(directory).iterdir() if path.is_file()}
+        return cls(objects)
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self.gets += 1
+        if (Bucket, Key) not in self.objects:
+            raise ClientError({'Error': {'Code': 'NoSuchKey', 'Message': f'{Key} not found'}}, 'GetObject')
+        data = self.objects[(Bucket, Key)]
+        return {'Body': StreamingBody(io.BytesIO(data), len(data)), 'ContentLength': len(data)}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[(Bucket, Key)] = Body if isinstance(Body, bytes) else Body.encode('utf-8')
+        return {}
+
+    def upload_file(self, Filename, Bucket, Key, **kwargs):
+        self.objects[(Bucket, Key)] = Path(Filename).read_bytes()
+
+
+class OrderServer:
+    """Local stand-in for the robot order API, usable as a context manager."""
+
+    def __init__(self, response=None, delay=0.0):
+        self.response = json.dumps(response or {"code": 0, "msg": "success", "data": {"orderId": "bench"}}).encode()
+        self.delay = delay
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                server.requests += 1
+                if server.delay:
+                    time.sleep(server.delay)
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(server.response)))
+                self.end_headers()
+                self.wfile.write(server.response)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/robot/order/create"
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def converse_response(text, input_tokens=900, output_tokens=40, cache_read=0):
+    return {
+        'output': {'message': {'role': 'assistant', 'content': [{'text': text}]}},
+        'stopReason': 'end_turn',
+        'usage': {'inputTokens': input_tokens, 'outputTokens': output_tokens,
+                  'totalTokens': input_tokens + output_tokens, 'cacheReadInputTokens': cache_read},
+        'metrics': {'latencyMs': 1},
+    }
+
+
+class StubAws:
+    """
+    Routes boto3 client creation to the stand-ins while installed.
+
+    Real botocore clients (with a RepeatingStubber) are used for bedrock-runtime, lambda
+    and lexv2-runtime; s3 and bedrock-agent-runtime get InMemoryS3 / FakeAgentRuntime.
+    A fresh botocore client is built for every boto3.client call, so handlers that create
+    clients per invocation pay that cost in the benchmark too.
+    """
+
+    STUBBED_SERVICES = ('bedrock-runtime', 'lambda', 'lexv2-runtime', 'bedrock-agent')
+
+    def __init__(self, s3=None, agent_runtime=None, region='us-east-1'):
+        self.s3 = s3 or InMemoryS3()
+        self.agent_runtime = agent_runtime or FakeAgentRuntime()
+        self.region = region
+        self.responses = {}
+        self.stubbers = []
+        self._session = botocore.session.get_session()
+        self._patched = []
+
+    def respond(self, service_name, method, service_response, checker=None):
+        """Canned response for every client of service_name created from now on."""
+        self.responses.setdefault(service_name, {})[method] = (service_response, checker)
+        for stubber in self.stubbers:
+            if stubber.client.meta.service_model.service_name == service_name:
+                stubber.respond(method, service_response, checker)
+        return self
+
+    def client(self, service_name, *args, **kwargs):
+        if service_name == 's3':
+            return self.s3
+        if service_name == 'bedrock-agent-runtime':
+            return self.agent_runtime
+        if service_name not in self.STUBBED_SERVICES:
+            raise AssertionError(f"No offline stand-in for {service_name}")
+        client = self._session.create_client(
+            service_name, region_name=kwargs.get('region_name') or self.region, config=kwargs.get('config'),
+            aws_access_key_id='bench', aws_secret_access_key='bench')
+        stubber = RepeatingStubber(client)
+        for method, (service_response, checker) in self.responses.get(service_name, {}).items():
+            stubber.respond(method, service_response, checker)
+        stubber.activate()
+        self.stubbers.append(stubber)
+        return client
+
+    def install(self):
+        stub = self
+
+        def session_client(session_self, service_name, *args, **kwargs):
+            return stub.client(service_name, *args, **kwargs)
+
+        self._patched = [(boto3, 'client', boto3.client), (boto3.Session, 'client', boto3.Session.client)]
+        boto3.client = lambda service_name, *args, **kwargs: stub.client(service_name, *args, **kwargs)
+        boto3.Session.client = session_client
+        return self
+
+    def uninstall(self):
+        for owner, name, original in self._patched:
+            setattr(owner, name, original)
+        self._patched = []
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, *exc):
+        self.uninstall()
+
+
+def offline_environment(**overrides):
+    """Environment variables that keep the handlers off the network and out of rate limits."""
+    env = {
+        'AWS_DEFAULT_REGION': 'us-east-1',
+        'AWS_ACCESS_KEY_ID': 'bench',
+        'AWS_SECRET_ACCESS_KEY': 'bench',
+        'BUCKET': 'bench-config',
+        'LAMBDA': 'bench-ticket-api-call',
+        'BOT_ID': 'BENCHBOT01',
+        'BOT_ALIAS_ID': 'TSTALIASID',
+        'LOCALE_ID': 'en_US',
+        'BEDROCK_RATE_PER_SEC': '1000000',
+        'BEDROCK_BURST': '1000000',
+        'AGENT_TRACE_SAMPLE_RATE': '0',
+    }
+    env.update(overrides)
+    os.environ.update(env)
+    return env
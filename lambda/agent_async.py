@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import os
+import time
+
+from instrumentation import emit_metric, span
+from rate_limiter import CLIENT_RETRIES, CLIENT_TIMEOUTS, get_limiter
+from usage_accounting import record_agent_trace_usage
+
+logger = logging.getLogger(__name__)
+
+
+def create_agent_runtime_client(region_name=None):
+    """
+    Creates an asyncio-native bedrock-agent-runtime client.
+
+    The returned object is an async context manager, use it as
+    `async with create_agent_runtime_client() as client:` and share the client across
+    every conversation hosted by the process.
+
+    Args:
+        region_name (str, optional): AWS region. Defaults to the REGION environment variable
+
+    Returns:
+        aiobotocore client context manager for bedrock-agent-runtime
+    """
+    try:
+        from aiobotocore.config import AioConfig
+        from aiobotocore.session import get_session
+    except ImportError as e:
+        raise ImportError("aiobotocore is required for the async agent path (pip install aiobotocore)") from e
+
+    return get_session().create_client(
+        'bedrock-agent-runtime',
+        region_name=region_name or os.environ.get('REGION', 'us-east-1'),
+        config=AioConfig(retries=CLIENT_RETRIES, **CLIENT_TIMEOUTS)
+    )
+
+
+def return_control_session_state(return_control):
+    """
+    Builds the sessionState that hands an empty function result back to the agent
+    after a returnControl event (front desk transfer).
+
+    Args:
+        return_control (dict): The 'returnControl' payload of the event stream
+
+    Returns:
+        dict: sessionState for the follow-up invoke_agent call
+    """
+    function_input = return_control["invocationInputs"][0]["functionInvocationInput"]
+    return {
+        'invocationId': return_control["invocationId"],
+        'returnControlInvocationResults': [{
+                'functionResult': {
+                    'actionGroup': function_input["actionGroup"],
+                    'function': function_input["function"],
+                    'responseBody': {
+                        "TEXT": {
+                            'body': ''
+                        }
+                    }
+                }
+        }]}
+
+
+async def _close_stream(event_stream):
+    close = getattr(event_stream, 'close', None)
+    if close is None:
+        return
+    result = close()
+    if asyncio.iscoroutine(result):
+        await result
+
+
+def _chunk_answer(event, start_time, path, enable_trace, trace_recorder):
+    emit_metric('latency', round((time.perf_counter() - start_time) * 1000, 3), stage='first_chunk', path=path)
+    if trace_recorder:
+        trace_recorder.mark('chunk')
+    agent_answer = event['chunk']['bytes'].decode('utf8')
+    if enable_trace:
+        logger.info(f"Final answer ->\n{agent_answer}")
+    return agent_answer
+
+
+def _record_trace(event, trace_recorder):
+    record_agent_trace_usage(event['trace'])
+    if trace_recorder:
+        trace_recorder.add(event['trace'])
+
+
+async def invoke_agent_helper_async(client, query, session_id, agent_id, alias_id, enable_trace=False, memory_id=None, session_state=None, end_session=False, trace_recorder=None, limiter=None):
+    """
+    Async counterpart of `invoke_agent_helper` in lambda-fulfillment-handler, with the same
+    wrappers: calls go through the process-wide rate limiter, first_chunk latency is emitted
+    on both paths, the returnControl round trip runs in a `return_control` span, and trace
+    events feed usage accounting and the trace recorder.
+
+    The event stream is consumed with `async for`, so the loop keeps serving other
+    conversations while this one waits on the agent. Cancelling the calling task closes
+    the open stream and propagates `asyncio.CancelledError`.
+
+    Args:
+        client: aiobotocore bedrock-agent-runtime client (see `create_agent_runtime_client`)
+        query (str): The input text query to send to the agent
+        session_id (str): Unique identifier for the session
+        agent_id (str): The ID of the Bedrock agent
+        alias_id (str): The alias ID of the Bedrock agent
+        enable_trace (bool, optional): Whether to enable tracing. Defaults to False
+        memory_id (str, optional): ID for memory persistence. Defaults to None
+        session_state (dict, optional): State information for the session. Defaults to None
+        end_session (bool, optional): Whether to end the session. Defaults to False
+        trace_recorder (TraceRecorder, optional): collects trace events (see trace_sink.py)
+        limiter (AdaptiveRateLimiter, optional): defaults to the process-wide limiter
+
+    Returns:
+        tuple: (agent_answer, action_type) where action_type is 'transferFD' when the
+               answer came back after a returnControl round trip
+    """
+    if not session_state:
+        session_state = {}
+    limiter = limiter or get_limiter()
+
+    start_time = time.perf_counter()
+    agent_response = await limiter.call_async(
+        'invoke_agent', alias_id, client.invoke_agent,
+        inputText=query,
+        agentId=agent_id,
+        agentAliasId=alias_id,
+        sessionId=session_id,
+        enableTrace=enable_trace,
+        endSession=end_session,
+        memoryId=memory_id,
+        sessionState=session_state
+    )
+
+    event_stream = agent_response['completion']
+    try:
+        async for event in event_stream:
+            if 'chunk' in event:
+                return _chunk_answer(event, start_time, 'direct', enable_trace, trace_recorder), ''
+            elif 'trace' in event:
+                _record_trace(event, trace_recorder)
+            elif 'returnControl' in event:
+                if trace_recorder:
+                    trace_recorder.mark('returnControl')
+                with span('return_control'):
+                    agent_answer = await _invoke_after_return_control(
+                        client, limiter, event['returnControl'], session_id, agent_id, alias_id, start_time,
+                        enable_trace=enable_trace, memory_id=memory_id, end_session=end_session,
+                        trace_recorder=trace_recorder
+                    )
+                return agent_answer, 'transferFD'
+            else:
+                raise Exception("unexpected event.", event)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        raise Exception("unexpected event.", e)
+    finally:
+        await _close_stream(event_stream)
+
+
+async def _invoke_after_return_control(client, limiter, return_control, session_id, agent_id, alias_id, start_time, enable_trace=False, memory_id=None, end_session=False, trace_recorder=None):
+    response_with_roc_allowed = await limiter.call_async(
+        'invoke_agent', alias_id, client.invoke_agent,
+        agentId=agent_id,
+        agentAliasId=alias_id,
+        sessionId=session_id,
+        enableTrace=enable_trace,
+        endSession=end_session,
+        memoryId=memory_id,
+        sessionState=return_control_session_state(return_control)
+    )
+    event_stream = response_with_roc_allowed['completion']
+    try:
+        async for response_event in event_stream:
+            if 'chunk' in response_event:
+                return _chunk_answer(response_event, start_time, 'return_control', enable_trace, trace_recorder)
+            elif 'trace' in response_event:
+                _record_trace(response_event, trace_recorder)
+            else:
+                raise Exception("unexpected event.", response_event)
+    finally:
+        await _close_stream(event_stream)
@@ -0,0 +1,370 @@
+"""
+Compiled per-hotel configuration.
+
+The raw configuration is `hotel_number.json` (the hotel directory) and one
+`<hotel>serviceInfo.json` per hotel in the config bucket. `python hotel_config.py` validates
+it and compiles one artifact per hotel, `compiled/<hotel>config.v<ARTIFACT_VERSION>.json`.
+The artifact holds the directory entry, the rendered prompt attributes, the hotel_info
+session attribute and the item index. Handlers load it with `load_hotel_config`, in one
+read, and fall back to the raw files while a hotel has no artifact.
+
+    python hotel_config.py --config_dir ../benchmarks/fixtures --out build        # validate and compile locally
+    python hotel_config.py --bucket botconfig205154476688v2 --publish             # compile from and publish to S3
+    python hotel_config.py --config_dir ../benchmarks/fixtures --check             # validate only
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import boto3
+
+from instrumentation import timed
+from service_catalog import DEFAULT_BUCKET, ServiceCatalog, load_catalog
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# bump when the artifact layout changes; handlers only read the version they were built for
+ARTIFACT_VERSION = 1
+HOTEL_DIRECTORY_KEY = 'hotel_number.json'
+REQUIRED_HOTEL_FIELDS = ('timezone', 'fd_start_time', 'fd_end_time', 'eng_start_time', 'eng_end_time', 'class')
+REQUIRED_ITEM_FIELDS = ('Department', 'Service Type', 'Bot Action', 'Avaliable')
+KNOWN_BOT_ACTIONS = ('Create Ticket', 'Transfer')
+HOTEL_TONES = {'0': "Luxury & Upper Upscale", '1': "Upscale & Upper Midscale"}
+
+# used when the hotel directory has no entry for the hotel
+DEFAULT_HOTEL_INFO = {
+    "timezone": "America/New_York",
+    "fd_hour": "Cycle",
+    "fd_start_time": "07:00 AM",
+    "fd_end_time": "07:00 PM",
+    "eng_hour": "Cycle",
+    "eng_request_time": "tomorrow_08:00 AM",
+    "eng_start_time": "08:00 AM",
+    "eng_end_time": "04:00 PM",
+    "transfer_fo": "+16784336186",
+    "address": "2401 Bass Pro Drive",
+    "name": "Embassy Suites by Hilton - DFW Airport North",
+    "city": "Grapevine",
+    "class": "0"}
+
+
+class ConfigError(ValueError):
+    """Raw hotel configuration that cannot be compiled; `errors` lists every problem found."""
+
+    def __init__(self, hotel_number, errors, warnings=()):
+        super().__init__(f"{hotel_number}: " + "; ".join(errors))
+        self.hotel_number = hotel_number
+        self.errors = errors
+        self.warnings = list(warnings)
+
+
+def artifact_key(hotel_number):
+    return f'compiled/{hotel_number}config.v{ARTIFACT_VERSION}.json'
+
+
+def hotel_tone(hotel_class):
+    return HOTEL_TONES.get(hotel_class, "Midscale & Economy")
+
+
+def render_prompt_attributes(hotel_info, catalog):
+    """
+    promptSessionAttributes of the fulfillment handler except current_datetime, which is
+    left empty in its place so the key order of the full attributes stays the same.
+    """
+    return {
+        'hotel_tone': hotel_tone(hotel_info['class']),
+        'current_datetime': '',
+        'fd_start_time': hotel_info['fd_start_time'],
+        'fd_end_time': hotel_info['fd_end_time'],
+        'eng_start_time': hotel_info['eng_start_time'],
+        'eng_end_time': hotel_info['eng_end_time'],
+        'unavailable_items': ', '.join(catalog.unavailable_items),
+        'available_items': ', '.join(catalog.available_items),
+        'dept_items': json.dumps(catalog.dept_items),
+    }
+
+
+def config_version(hotel_info, rows):
+    """Content hash of a hotel's raw configuration; changes whenever anything a guest sees does."""
+    raw = json.dumps([hotel_info, rows], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def validate_hotel(hotel_number, hotel_info, service_info):
+    """
+    Checks a hotel's directory entry and serviceInfo.json.
+
+    Returns:
+        tuple: (errors, warnings), lists of messages; errors block compilation
+    """
+    errors, warnings = [], []
+    if hotel_info is None:
+        errors.append("no entry in hotel_number.json")
+        hotel_info = {}
+    for field in REQUIRED_HOTEL_FIELDS:
+        if field not in hotel_info:
+            errors.append(f"hotel_number.json entry has no {field}")
+    if 'timezone' in hotel_info:
+        try:
+            ZoneInfo(hotel_info['timezone'])
+        except Exception:
+            errors.append(f"unknown timezone {hotel_info['timezone']!r}")
+    for field in ('fd_start_time', 'fd_end_time', 'eng_start_time', 'eng_end_time'):
+        if field in hotel_info:
+            try:
+                datetime.strptime(hotel_info[field], "%I:%M %p")
+            except (TypeError, ValueError):
+                errors.append(f"{field} {hotel_info[field]!r} is not like '07:00 AM'")
+    if hotel_info.get('class') not in (None, *HOTEL_TONES, '2'):
+        warnings.append(f"class {hotel_info['class']!r} is not 0, 1 or 2, the tone falls back to Midscale & Economy")
+
+    if not isinstance(service_info, dict) or not service_info:
+        errors.append("serviceInfo.json is missing or empty")
+        return errors, warnings
+    seen = {}
+    for name, details in service_info.items():
+        if ',' in name:
+            # item lists are comma separated in prompts
+            errors.append(f"item {name!r} contains a comma")
+        missing = [field for field in REQUIRED_ITEM_FIELDS if field not in details]
+        if missing:
+            errors.append(f"item {name!r} has no {', '.join(missing)}")
+            continue
+        if details['Avaliable'] not in ('Yes', 'No'):
+            errors.append(f"item {name!r} has Avaliable {details['Avaliable']!r}, expected Yes or No")
+        if details['Bot Action'] not in KNOWN_BOT_ACTIONS:
+            warnings.append(f"item {name!r} has unknown Bot Action {details['Bot Action']!r}")
+        key = name.strip().lower()
+        if key in seen:
+            warnings.append(f"items {seen[key]!r} and {name!r} differ only in case or spacing")
+        seen[key] = name
+    return errors, warnings
+
+
+def compile_hotel(hotel_number, hotel_info, service_info):
+    """
+    Validates and compiles one hotel.
+
+    Returns:
+        tuple: (artifact dict, warnings)
+
+    Raises:
+        ConfigError: when the raw configuration has errors
+    """
+    errors, warnings = validate_hotel(hotel_number, hotel_info, service_info)
+    if errors:
+        raise ConfigError(hotel_number, errors, warnings)
+    catalog = ServiceCatalog(service_info)
+    rows = catalog.to_rows()
+    artifact = {
+        'artifact_version': ARTIFACT_VERSION,
+        'config_version': config_version(hotel_info, rows),
+        'compiled_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'hotel_number': hotel_number,
+        'hotel_info': hotel_info,
+        'hotel_info_json': json.dumps(hotel_info),
+        'prompt_attributes': render_prompt_attributes(hotel_info, catalog),
+        'items': rows,
+    }
+    return artifact, warnings
+
+
+class HotelConfig:
+    """
+    Everything the handlers derive from a hotel's configuration, ready to serve.
+
+    Attributes:
+        hotel_info (dict): hotel directory entry
+        hotel_info_json (str): hotel_info as sent in sessionAttributes
+        prompt_attributes (dict): static promptSessionAttributes, see render_prompt_attributes
+        catalog (ServiceCatalog): the hotel's items
+        config_version (str): content hash of the configuration
+        source (str): 'artifact' or 'raw'
+    """
+
+    __slots__ = ('hotel_number', 'hotel_info', 'hotel_info_json', 'prompt_attributes', 'catalog',
+                 'config_version', 'source')
+
+    def __init__(self, hotel_number, hotel_info, catalog, prompt_attributes=None, hotel_info_json=None,
+                 version=None, source='raw'):
+        self.hotel_number = hotel_number
+        self.hotel_info = hotel_info
+        self.catalog = catalog
+        self.prompt_attributes = prompt_attributes or render_prompt_attributes(hotel_info, catalog)
+        self.hotel_info_json = hotel_info_json or json.dumps(hotel_info)
+        self.config_version = version or config_version(hotel_info, catalog.to_rows())
+        self.source = source
+
+    @classmethod
+    def from_artifact(cls, artifact):
+        return cls(artifact['hotel_number'], artifact['hotel_info'], ServiceCatalog(rows=artifact['items']),
+                   prompt_attributes=artifact['prompt_attributes'], hotel_info_json=artifact['hotel_info_json'],
+                   version=artifact['config_version'], source='artifact')
+
+
+# S3 answers AccessDenied instead of NoSuchKey for a missing key when the caller has no
+# s3:ListBucket, which the handler roles do not have
+MISSING_CODES = ('NoSuchKey', '404', 'AccessDenied', '403')
+# how long a hotel without a published artifact is served from the raw files before the
+# artifact is looked up again
+MISSING_ARTIFACT_TTL = float(os.environ.get('HOTEL_CONFIG_MISSING_TTL', 300))
+
+_missing_artifacts = {}
+
+
+def _is_missing(error):
+    return getattr(error, 'response', {}).get('Error', {}).get('Code') in MISSING_CODES
+
+
+@lru_cache(maxsize=128)
+@timed('s3_config_load')
+def _fetch_artifact(hotel_number, bucket_name):
+    response = boto3.client('s3').get_object(Bucket=bucket_name, Key=artifact_key(hotel_number))
+    artifact = json.loads(response['Body'].read())
+    if artifact.get('artifact_version') != ARTIFACT_VERSION:
+        raise ValueError(f"artifact version {artifact.get('artifact_version')}, expected {ARTIFACT_VERSION}")
+    return HotelConfig.from_artifact(artifact)
+
+
+def _artifact_config(hotel_number, bucket_name):
+    """
+    Compiled config of a hotel, None when it has not been published. A hit is kept for the
+    life of the container; a miss for MISSING_ARTIFACT_TTL seconds, so a config published
+    later is picked up by warm containers.
+    """
+    key = (hotel_number, bucket_name)
+    if _missing_artifacts.get(key, 0) > time.monotonic():
+        return None
+    try:
+        config = _fetch_artifact(hotel_number, bucket_name)
+    except Exception as e:
+        if _is_missing(e):
+            _missing_artifacts[key] = time.monotonic() + MISSING_ARTIFACT_TTL
+            return None
+        raise
+    _missing_artifacts.pop(key, None)
+    return config
+
+
+@lru_cache(maxsize=4)
+@timed('s3_config_load')
+def _hotel_directory(bucket_name):
+    response = boto3.client('s3').get_object(Bucket=bucket_name, Key=HOTEL_DIRECTORY_KEY)
+    return json.loads(response['Body'].read())
+
+
+def load_hotel_config(hotel_number, bucket_name=None):
+    """
+    A hotel's compiled config, parsed once per container. Without a published artifact (or
+    when it cannot be read) the config is built from the raw files, as before compiled
+    configs: an unknown hotel gets DEFAULT_HOTEL_INFO and an unreadable catalog is empty.
+
+    Args:
+        hotel_number (str): hotel phone number
+        bucket_name (str, optional): config bucket. Defaults to the BUCKET environment variable
+
+    Returns:
+        HotelConfig: the hotel's config, never None
+    """
+    bucket_name = bucket_name or os.environ.get('BUCKET', DEFAULT_BUCKET)
+    try:
+        config = _artifact_config(hotel_number, bucket_name)
+        if config is not None:
+            return config
+    except Exception as e:
+        logger.warning(f"Compiled config of {hotel_number} unreadable, using the raw files: {e}")
+    return _raw_config(hotel_number, bucket_name)
+
+
+def _raw_config(hotel_number, bucket_name):
+    try:
+        hotel_info = _hotel_directory(bucket_name).get(hotel_number)
+    except Exception as e:
+        logger.warning(f"HOTEL INFO FROM S3 FAILED: {e}")
+        hotel_info = None
+    if hotel_info is None:
+        hotel_info = DEFAULT_HOTEL_INFO
+    return _build_raw_config(hotel_number, json.dumps(hotel_info), load_catalog(hotel_number, bucket_name))
+
+
+@lru_cache(maxsize=128)
+def _build_raw_config(hotel_number, hotel_info_key, catalog):
+    # keyed on the catalog object, so a retried catalog read builds a new config
+    return HotelConfig(hotel_number, json.loads(hotel_info_key), catalog)
+
+
+def read_raw_config(config_dir=None, bucket_name=None):
+    """(hotel directory, {hotel: serviceInfo dict or None}) from a local directory or the bucket."""
+    if config_dir:
+        config_dir = Path(config_dir)
+        directory = json.loads((config_dir / HOTEL_DIRECTORY_KEY).read_text())
+        read = lambda key: json.loads((config_dir / key).read_text()) if (config_dir / key).exists() else None
+    else:
+        s3 = boto3.client('s3')
+        directory = json.loads(s3.get_object(Bucket=bucket_name, Key=HOTEL_DIRECTORY_KEY)['Body'].read())
+
+        def read(key):
+            try:
+                return json.loads(s3.get_object(Bucket=bucket_name, Key=key)['Body'].read())
+            except Exception as e:
+                if _is_missing(e):
+                    return None
+                raise
+    return directory, {hotel: read(f'{hotel}serviceInfo.json') for hotel in directory}
+
+
+def compile_all(directory, service_infos):
+    """Compiles every hotel of the directory. Returns ({hotel: artifact}, {hotel: errors}, {hotel: warnings})."""
+    artifacts, errors, warnings = {}, {}, {}
+    for hotel_number, hotel_info in directory.items():
+        try:
+            artifacts[hotel_number], hotel_warnings = compile_hotel(hotel_number, hotel_info, service_infos.get(hotel_number))
+        except ConfigError as e:
+            errors[hotel_number], hotel_warnings = e.errors, e.warnings
+        if hotel_warnings:
+            warnings[hotel_number] = hotel_warnings
+    return artifacts, errors, warnings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Validate hotel configs and compile one artifact per hotel.')
+    parser.add_argument('--config_dir', type=str, help='local directory with hotel_number.json and serviceInfo files')
+    parser.add_argument('--bucket', type=str, default=os.environ.get('BUCKET', DEFAULT_BUCKET),
+                        help='config bucket, read when --config_dir is not given')
+    parser.add_argument('--out', type=str, help='write artifacts under this directory')
+    parser.add_argument('--publish', action='store_true', help='upload artifacts to --bucket')
+    parser.add_argument('--check', action='store_true', help='validate only')
+    args = parser.parse_args()
+
+    directory, service_infos = read_raw_config(args.config_dir, args.bucket)
+    artifacts, errors, warnings = compile_all(directory, service_infos)
+    for hotel_number, messages in warnings.items():
+        for message in messages:
+            print(f"WARNING {hotel_number}: {message}")
+    for hotel_number, messages in errors.items():
+        for message in messages:
+            print(f"ERROR {hotel_number}: {message}")
+    print(f"{len(artifacts)} hotels compiled, {len(errors)} with errors, {len(warnings)} with warnings")
+    if errors:
+        sys.exit(1)
+    if args.check:
+        sys.exit(0)
+    s3 = boto3.client('s3') if args.publish else None
+    for hotel_number, artifact in artifacts.items():
+        body = json.dumps(artifact, separators=(',', ':')).encode('utf-8')
+        if args.out:
+            path = Path(args.out) / artifact_key(hotel_number)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(body)
+        if s3:
+            s3.put_object(Bucket=args.bucket, Key=artifact_key(hotel_number), Body=body, ContentType='application/json')
+        print(f"{artifact_key(hotel_number)}: {artifact['config_version']}, {len(artifact['items'])} items, {len(body)} bytes")
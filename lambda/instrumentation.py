@@ -0,0 +1,213 @@
+"""
+Per-stage latency instrumentation emitted as CloudWatch Embedded Metric Format (EMF).
+
+Each finished span prints one EMF JSON line to stdout, which CloudWatch turns into a
+`latency` metric with dimensions stage / hotel / intent / cold-or-warm start. The same
+lines can be rendered locally:
+
+    python lambda/instrumentation.py report captured.log [more.log ...]
+"""
+import argparse
+import contextvars
+import functools
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'HotelAssistant')
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+DIMENSION_SETS = [
+    ["handler", "stage"],
+    ["handler", "stage", "hotel"],
+    ["handler", "stage", "hotel", "intent", "start"],
+]
+DIMENSION_KEYS = ("handler", "stage", "hotel", "intent", "start")
+
+_cold_start = True
+_dimensions = contextvars.ContextVar('metric_dimensions', default={})
+_end_hooks = []
+
+
+def start_invocation(handler):
+    """Resets the invocation dimensions and marks the first invocation of the container as cold."""
+    global _cold_start
+    _dimensions.set({"handler": handler, "start": "cold" if _cold_start else "warm"})
+    _cold_start = False
+
+
+def on_invocation_end(hook):
+    """Registers a callable run after every `instrumented` invocation (per-invocation metric flushes)."""
+    _end_hooks.append(hook)
+
+
+def set_dimensions(**dimensions):
+    """Adds dimensions (hotel, intent, ...) to every metric emitted for the rest of the invocation."""
+    _dimensions.set({**_dimensions.get(), **{k: str(v) for k, v in dimensions.items() if v is not None}})
+
+
+def emit_metric(name, value, unit='Milliseconds', stage=None, **properties):
+    """
+    Prints one EMF record for a single metric value.
+
+    Args:
+        name (str): metric name, e.g. 'latency' or 'queue_delay'
+        value (float): metric value
+        unit (str, optional): CloudWatch unit. Defaults to 'Milliseconds'
+        stage (str, optional): stage dimension value
+        **properties: extra fields kept in the log line but not used as dimensions
+
+    Returns:
+        dict: the emitted record (None when metrics are disabled)
+    """
+    return emit_metrics({name: (value, unit)}, stage=stage, **properties)
+
+
+def emit_metrics(metrics, stage=None, **properties):
+    """
+    Prints one EMF record carrying several metrics that share dimensions.
+
+    Args:
+        metrics (dict): metric name -> (value, unit)
+        stage (str, optional): stage dimension value
+        **properties: extra fields kept in the log line but not used as dimensions
+
+    Returns:
+        dict: the emitted record (None when metrics are disabled)
+    """
+    if not METRICS_ENABLED:
+        return None
+    dimensions = {key: "unknown" for key in DIMENSION_KEYS}
+    dimensions.update(_dimensions.get())
+    if stage is not None:
+        dimensions["stage"] = stage
+    record = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": NAMESPACE,
+                "Dimensions": DIMENSION_SETS,
+                "Metrics": [{"Name": name, "Unit": unit} for name, (_, unit) in metrics.items()],
+            }],
+        },
+        **properties,
+        **dimensions,
+        **{name: value for name, (value, _) in metrics.items()},
+    }
+    # EMF has to be a bare JSON line, so bypass the logging formatter
+    print(json.dumps(record, default=str), flush=True)
+    return record
+
+
+@contextmanager
+def span(stage, **properties):
+    """
+    Times the enclosed block and emits it as the `latency` metric of `stage`.
+
+    Args:
+        stage (str): stage name, e.g. 's3_config_load' or 'agent_invoke'
+        **properties: extra fields for the log line (model_id, attempt, ...)
+    """
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        latency_ms = round((time.perf_counter() - start) * 1000, 3)
+        if error:
+            properties["error"] = error
+        emit_metric("latency", latency_ms, stage=stage, **properties)
+
+
+def timed(stage):
+    """Decorator form of `span`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrumented(handler):
+    """
+    Decorator for Lambda entry points: starts a fresh set of dimensions for the invocation
+    and emits the whole invocation as the 'handler' stage.
+
+    Args:
+        handler (str): handler name used as the `handler` dimension
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(event, context):
+            start_invocation(handler)
+            try:
+                with span("handler"):
+                    return func(event, context)
+            finally:
+                for hook in _end_hooks:
+                    hook()
+        return wrapper
+    return decorator
+
+
+def read_records(paths):
+    """Yields EMF records found in captured logs, ignoring non-EMF lines and log prefixes."""
+    for path in paths:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                brace = line.find('{')
+                if brace < 0 or '"_aws"' not in line:
+                    continue
+                try:
+                    record = json.loads(line[brace:])
+                except ValueError:
+                    continue
+                if isinstance(record, dict) and "_aws" in record:
+                    yield record
+
+
+def _percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def report(paths, metric="latency", group_by=("hotel", "stage"), out=sys.stdout):
+    """
+    Prints count / p50 / p95 / max of a metric per group from captured EMF logs.
+
+    Args:
+        paths (list): log files to read
+        metric (str, optional): metric name. Defaults to 'latency'
+        group_by (tuple, optional): record fields to group by. Defaults to ('hotel', 'stage')
+    """
+    groups = {}
+    for record in read_records(paths):
+        if metric not in record:
+            continue
+        key = tuple(str(record.get(field, "unknown")) for field in group_by)
+        groups.setdefault(key, []).append(float(record[metric]))
+
+    header = "".join(f"{field:<24}" for field in group_by) + f"{'count':>8}{'p50':>12}{'p95':>12}{'max':>12}"
+    print(header, file=out)
+    for key in sorted(groups):
+        values = sorted(groups[key])
+        print("".join(f"{value:<24}" for value in key)
+              + f"{len(values):>8}{_percentile(values, 50):>12.1f}{_percentile(values, 95):>12.1f}{values[-1]:>12.1f}",
+              file=out)
+    return groups
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Render EMF latency spans from captured Lambda logs.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    report_parser = subparsers.add_parser('report', help='p50/p95 per group')
+    report_parser.add_argument('logs', nargs='+', help='captured log files')
+    report_parser.add_argument('--metric', default='latency')
+    report_parser.add_argument('--group_by', default='hotel,stage', help='comma separated record fields')
+    args = parser.parse_args()
+    report(args.logs, metric=args.metric, group_by=tuple(args.group_by.split(',')))
@@ -6,49 +6,58 @@ import logging
 import time
 import os
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+from instrumentation import instrumented, set_dimensions, span
+from profiling import profiled
+from structured_log import get_logger, log_payload
+
+logger = get_logger(__name__)
 
 region_name=os.environ.get('REGION', 'us-east-1')
 session = boto3.Session(region_name=region_name)
 lambda_client = session.client('lambda')
+# Robot order API, overridable so benchmarks and tests can point at a local server
+ORDER_API_URL = os.environ.get('ORDER_API_URL', 'http://54.175.83.87:33480/robot/order/create')
 
 
 def call_api_endpoint(ticket_data):
-    orderUrl = "http://54.175.83.87:33480/robot/order/create"
+    orderUrl = ORDER_API_URL
     http = urllib3.PoolManager(num_pools=1, headers={'Content-Type': 'application/json'})
     dataJson = json.dumps(ticket_data)
     resp = http.request('POST', orderUrl, body=dataJson, timeout=30, retries=5)
     result = json.loads(resp.data)
     return result
 
-def get_request_ticket_api(userInput: str, phoneNumber: str, confirmTime:str, roomNumber:str) -> str:
+def get_request_ticket_api(userInput: str, phoneNumber: str, confirmTime:str, roomNumber:str, actionGroup: str = None, function: str = None) -> str:
     """receive userinput and create request ticket by invoking lambda funciton
 
     :param userInput: transcription
     :param confirmTime: time
     :param roomNumber: room
     :param phonenumber: phone
+    :param actionGroup: agent action group, used for usage attribution
+    :param function: agent function, used for usage attribution
     """
     logger.info(f"get_request_ticket_api invoked")
     # start_time = time.time()
-    payload = json.dumps({"userInput": userInput, "phoneNumber": phoneNumber, "confirmTime": confirmTime, "roomNumber": roomNumber})
-    logger.info(f"{payload = }")
+    payload = json.dumps({"userInput": userInput, "phoneNumber": phoneNumber, "confirmTime": confirmTime, "roomNumber": roomNumber,
+                          "actionGroup": actionGroup, "function": function})
+    log_payload(logger, "PAYLOAD", payload, verbose=False)
 
-    response = lambda_client.invoke(
-        FunctionName=os.environ.get('LAMBDA'),
-        InvocationType='Event', # Event - async; 'RequestResponse' - wait for response; DryRun - for testing
-        LogType='None',
-        Payload=payload)
+    with span('ticket_lambda_invoke'):
+        response = lambda_client.invoke(
+            FunctionName=os.environ.get('LAMBDA'),
+            InvocationType='Event', # Event - async; 'RequestResponse' - wait for response; DryRun - for testing
+            LogType='None',
+            Payload=payload)
 
     # print(f"--- {(time.time() - start_time):.2f} seconds for making api call ---")
     return "ticket is created successfully"
 
 
+@profiled
+@instrumented('create-ticket')
 def lambda_handler(event, context):
-    start_time = time.time()
-    logger.info(f"{event = }")
-    logger.info(f"{context = }")
+    log_payload(logger, "EVENT", event)
 
     agent = event['agent']
     actionGroup = event['actionGroup']
@@ -56,17 +65,20 @@ def lambda_handler(event, context):
 
     parameters = event.get('parameters', [])
     params = {param['name']: param['value'] for param in parameters}
-    logger.info(f"{params = }")
+    log_payload(logger, "PARAMS", params, verbose=False)
 
 
     phoneNumber = event['sessionAttributes']['hotel_phone_number']
     roomNumber=event['sessionAttributes']['room_number']
+    set_dimensions(hotel=phoneNumber, intent=function)
 
     api_response = get_request_ticket_api(
         userInput=params['userInput'],
         phoneNumber=phoneNumber,
         confirmTime=params['confirmTime'],
-        roomNumber=roomNumber)
+        roomNumber=roomNumber,
+        actionGroup=actionGroup,
+        function=function)
     logger.info(f"{api_response = }")
 
 
@@ -87,7 +99,6 @@ def lambda_handler(event, context):
     }
 
     dummy_function_response = {'response': action_response, 'messageVersion': event['messageVersion']}
-    print("Response: {}".format(dummy_function_response))
-    logger.info(f"LATENCY TO FINISH: {time.time() - start_time:.2f} sec")
+    log_payload(logger, "RESPONSE", dummy_function_response)
 
     return dummy_function_response
@@ -6,27 +6,43 @@ import logging
 import time
 import os
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+from instrumentation import instrumented, set_dimensions, span
+from model_router import ModelRouter
+from profiling import profiled
+from rate_limiter import client_config
+from structured_log import get_logger, log_payload
+from usage_accounting import set_attribution
+
+logger = get_logger(__name__)
 
 session = boto3.Session(region_name=os.environ.get('REGION', 'us-east-1'))
-bedrock_client = session.client('bedrock-runtime')
-# MODEL_ID = "anthropic.claude-3-haiku-20240307-v1:0"
-MODEL_ID = "amazon.nova-micro-v1:0"
+bedrock_client = session.client('bedrock-runtime', config=client_config)
+# Model choice and fallback per task live in model_router (MODEL_ROUTES env var overrides)
+router = ModelRouter(bedrock_client)
 
-def get_info(userInput: str, hotelAddress: str):
-    system = [
-        {
-            "text" : f"""
-    You are a Hotel Local Advisor. The user asked: "{userInput}".
-    Respond to the use with recommendation around the address: {hotelAddress}.
+# Static advisor instructions, shared by every hotel. The guest question travels in the
+# user message only, so the system prompt stays identical per hotel.
+LOCAL_ADVISOR_PROMPT = """
+    You are a Hotel Local Advisor.
+    Respond to the user with recommendations around the hotel address given below.
     Give top 3 places. Make your recommendations short and concise.
     Provide the name of the business, address and distance to the address.
     Give only distinct recommendations, do not repeat.
-    """          
-        }
+    """
+
+
+def build_info_system_prompt(hotelAddress: str):
+    # no cachePoint: the advisor prompt is far below the ~1K token minimum Bedrock caches
+    return [
+        {"text": LOCAL_ADVISOR_PROMPT},
+        {"text": f"The hotel address is: {hotelAddress}"},
     ]
 
+
+def get_info(userInput: str, hotelAddress: str):
+    with span('prompt_build'):
+        system = build_info_system_prompt(hotelAddress)
+
     # Your user prompt
     messages = [
         {"role": "user", "content": [{"text":userInput}]},
@@ -35,21 +51,26 @@ def get_info(userInput: str, hotelAddress: str):
     # Configure the inference parameters.
     inf_params = {"maxTokens": 300, "topP": 0.9, "temperature": 0.0}
 
-    model_response = bedrock_client.converse(
-        modelId=MODEL_ID, messages=messages, system=system, inferenceConfig=inf_params,
+    model_response = router.converse(
+        "local_area_info", messages=messages, system=system, inferenceConfig=inf_params,
         # performanceConfig={'latency': 'optimized'} # error
     
     )
 
-    logger.info(f"{model_response = }")
+    log_payload(logger, "MODEL RESPONSE", model_response)
     return model_response["output"]["message"]["content"][0]['text']
 
 def populate_function_response(event, response_body):
     return {'response': {'actionGroup': event['actionGroup'], 'function': event['function'],
                 'functionResponse': {'responseBody': {'TEXT': {'body': str(response_body)}}}}}
 
+@profiled
+@instrumented('local-area-info')
 def lambda_handler(event, context):
-    logger.info(f"{event = }")
+    log_payload(logger, "EVENT", event)
+    set_dimensions(hotel=event.get('sessionAttributes', {}).get('hotel_phone_number'), intent=event.get('function'))
+    set_attribution(hotel=event.get('sessionAttributes', {}).get('hotel_phone_number'),
+                    action_group=event.get('actionGroup'), function=event.get('function'))
 
     # userInput = event.get("inputText", "Recommend me good restaraunts or fast-food places nearby")
     userInput = event["inputText"]
@@ -67,9 +88,8 @@ def lambda_handler(event, context):
 
     logger.info(f"{userInput = } {hotelAddress = }")
     result = get_info(userInput, hotelAddress)
-    logger.info(f"{result = }")
+    log_payload(logger, "RESULT", result, verbose=False)
 
     response = populate_function_response(event, result)
-    logger.info(f"{response = }")
 
     return response
\ No newline at end of file
@@ -6,10 +6,15 @@ from botocore.exceptions import ClientError
 from botocore.config import Config
 from collections import OrderedDict
 
+from instrumentation import instrumented, set_dimensions, span
+from profiling import profiled
+from structured_log import get_logger, log_payload
+
 # Configure logging
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+logger = get_logger(__name__)
 
+@profiled
+@instrumented('proxy-api-handler')
 def handler(event, context):
     # Configure boto3 client with retries and parameter validation
     config = Config(
@@ -26,7 +31,7 @@ def handler(event, context):
     logger.info("Starting proxy Lambda")
     
     try:
-        print(event)
+        log_payload(logger, "EVENT", event)
         if 'body' in event:
             body = json.loads(event['body'])
         else:
@@ -55,6 +60,7 @@ def handler(event, context):
         # Extract session attributes
         phone_number = body.get('phone_number', '')
         room_number = body.get('room_number', '')
+        set_dimensions(hotel=phone_number or None)
         hotel_info = body.get('hotel_info', '')
         
         # Get hotel information map from request
@@ -77,18 +83,19 @@ def handler(event, context):
         logger.info(f"Lambda environment variables: BOT_ID={os.getenv('BOT_ID')}, BOT_ALIAS_ID={os.getenv('BOT_ALIAS_ID')}")
 
         try:
-            response = lex_client.recognize_text(
-                botId=bot_id,
-                botAliasId=bot_alias_id,
-                localeId=locale_id,
-                sessionId=session_id,
-                text=text_input,
-                sessionState={
-                    "sessionAttributes": session_attributes
-                }
-            )
+            with span('lex_recognize'):
+                response = lex_client.recognize_text(
+                    botId=bot_id,
+                    botAliasId=bot_alias_id,
+                    localeId=locale_id,
+                    sessionId=session_id,
+                    text=text_input,
+                    sessionState={
+                        "sessionAttributes": session_attributes
+                    }
+                )
             
-            logger.info(f"Lex response: {json.dumps(response)}")
+            log_payload(logger, "Lex response:", response)
 
             return {
                 'statusCode': 200,
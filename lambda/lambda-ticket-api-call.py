@@ -4,24 +4,29 @@ import urllib3
 import datetime
 import logging
 import os
+import re
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+from instrumentation import instrumented, set_dimensions, span, timed
+from model_router import ModelRouter
+from profiling import profiled
+from prompt_cache import CACHE_POINT
+from rate_limiter import client_config
+from hotel_config import load_hotel_config
+from structured_log import get_logger, log_payload
+from usage_accounting import set_attribution
 
-session = boto3.Session(region_name=os.environ.get('REGION', 'us-east-1'))
-bedrock_client = session.client('bedrock-runtime')
-
-def get_item(userInput: str, items: str):
-    """from the provided user request choose the right category for name of the requested service items. 
-
-    :param userInput: transcription
-    """
+logger = get_logger(__name__)
 
-    MODEL_ID = "anthropic.claude-3-haiku-20240307-v1:0"
-
-    system = [
-        {
-            "text": f"""
+session = boto3.Session(region_name=os.environ.get('REGION', 'us-east-1'))
+bedrock_client = session.client('bedrock-runtime', config=client_config)
+router = ModelRouter(bedrock_client)
+# Robot order API, overridable so benchmarks and tests can point at a local server
+ORDER_API_URL = os.environ.get('ORDER_API_URL', 'http://54.175.83.87:33480/robot/order/create')
+
+# Static part of the item extraction prompt. Kept byte-identical across requests so the
+# prefix, together with the per-hotel catalog that follows it, can be served from the
+# Bedrock prompt cache.
+ITEM_EXTRACTION_PROMPT = """
             From the provided user request, choose the correct category for the requested service items and their respective quantities.
 
             <guidelines>
@@ -31,7 +36,7 @@ def get_item(userInput: str, items: str):
             
             ```json
             [
-                {{"item": "selected category", "quantity": "requested quantity"}}
+                {"item": "selected category", "quantity": "requested quantity"}
             ]
             ```
 
@@ -46,21 +51,58 @@ def get_item(userInput: str, items: str):
             **Correct JSON Response:**
             ```json
             [
-                {{"item": "Blanket", "quantity": "1"}},
-                {{"item": "Bath Towel", "quantity": "1"}},
-                {{"item": "Air Conditioner", "quantity": "1"}}
+                {"item": "Blanket", "quantity": "1"},
+                {"item": "Bath Towel", "quantity": "1"},
+                {"item": "Air Conditioner", "quantity": "1"}
             ]
+"""
+
 
-            Here are the possible category options: {items}
-            """
-        }
+def build_item_system_prompt(items: str):
+    """Static guidelines, then the hotel's catalog, then a cache point covering both.
+
+    :param items: comma separated service items of the hotel
+    """
+    return [
+        {"text": ITEM_EXTRACTION_PROMPT},
+        {"text": f"Here are the possible category options: {items}"},
+        CACHE_POINT,
     ]
 
 
+# The prompt shows its example answer inside a ```json fence, which models tend to copy
+CODE_FENCE = re.compile(r"^\s*```(?:json)?\s*(.*?)\s*```\s*$", re.DOTALL)
+
 
+def parse_items(text: str):
+    """Item list from the model answer, with any code fence removed; [] when it is not JSON.
 
+    :param text: model answer
+    """
+    match = CODE_FENCE.match(text)
+    if match:
+        text = match.group(1)
+    try:
+        items = json.loads(text)
+    except json.JSONDecodeError as e:
+        logger.error("Item extraction answer is not JSON %s: %r", e, text)
+        return []
+    if not isinstance(items, list):
+        logger.error("Item extraction answer is not a JSON array: %r", text)
+        return []
+    return items
 
-    logger.info(f"{system = }")
+
+def get_item(userInput: str, items: str):
+    """from the provided user request choose the right category for name of the requested service items. 
+
+    :param userInput: transcription
+    """
+
+    with span('prompt_build'):
+        system = build_item_system_prompt(items)
+
+    log_payload(logger, "SYSTEM PROMPT", system, level=logging.DEBUG)
 
     # Your user prompt
     messages = [
@@ -70,16 +112,17 @@ def get_item(userInput: str, items: str):
     # Configure the inference parameters.
     inf_params = {"maxTokens": 1000, "topP": 0.9, "temperature": 0.0}
 
-    model_response = bedrock_client.converse(
-        modelId=MODEL_ID, messages=messages, system=system, inferenceConfig=inf_params
+    model_response = router.converse(
+        "item_extraction", messages=messages, system=system, inferenceConfig=inf_params
     )
 
-    print(f"{model_response = }")
-    return model_response["output"]["message"]["content"][0]['text']
+    log_payload(logger, "MODEL RESPONSE", model_response)
+    return parse_items(model_response["output"]["message"]["content"][0]['text'])
 
 
+@timed('ticket_post')
 def call_api_endpoint(ticket_data):
-    orderUrl = "http://54.175.83.87:33480/robot/order/create"
+    orderUrl = ORDER_API_URL
     http = urllib3.PoolManager(num_pools=1, headers={'Content-Type': 'application/json'})
     dataJson = json.dumps(ticket_data)
     resp = http.request('POST', orderUrl, body=dataJson, timeout=30, retries=5)
@@ -91,7 +134,7 @@ def get_request_ticket_api(item, serviceProfile, quantity, userInput, roomNumber
 
     :param item: item requested if any
     :param quantity: how many items requested if applicable
-    :param serviceProfile: list of items and corresponding service type and department and request status
+    :param serviceProfile: ServiceCatalog of the hotel, with each item's department, service type and action
     :param userInput: transcription
     """
 
@@ -102,12 +145,12 @@ def get_request_ticket_api(item, serviceProfile, quantity, userInput, roomNumber
                           "roomNumber": roomNumber,
                           "robotVer": "chimeInternal_DRAFT",
                           "createBy": "205154476688",
-                          "dept": serviceProfile[item]['Department'],  
-                          "service": serviceProfile[item]['Service Type'],  
+                          "dept": serviceProfile[item].department,
+                          "service": serviceProfile[item].service_type,
                           "subCategory": item, 
                           "quantity": quantity,
                           "requestTime": str(datetime.datetime.now(datetime.UTC)),
-                          "status": serviceProfile[item]['Bot Action'],  
+                          "status": serviceProfile[item].bot_action,
                           "input": userInput,
                           "callIdFull": "99033d55-e034-4e8e-b6fb-d6b17fc122f6",
                           "callStatus": "answer",
@@ -118,40 +161,30 @@ def get_request_ticket_api(item, serviceProfile, quantity, userInput, roomNumber
                   ]
               }
           }
-    logger.info(f"{ticket = }")
+    log_payload(logger, "TICKET", ticket, verbose=False)
     api_response = call_api_endpoint(ticket)
-    logger.info(f"{api_response = }")
+    log_payload(logger, "API RESPONSE", api_response, verbose=False)
     return json.dumps(api_response)
 
 def s3_retrieve(hotel_number, bucket_name):
-    s3_client = boto3.client('s3')
-    
-    service_info_path = f'{hotel_number}serviceInfo.json'
-    try:
-        response = s3_client.get_object(Bucket=bucket_name, Key=service_info_path)
-        data = response['Body'].read().decode('utf-8')
-        data = json.loads(data)
-        return data
-        # available_items = [k for k, v in data.items() if v['Avaliable'] == 'Yes']
-        # return available_items
-    except Exception as e:
-        logger.error(f"Error occurred while retrieving {service_info_path}: {e}")
-        return {}
+    # compiled hotel config when published, else the raw serviceInfo.json; parsed once per container
+    return load_hotel_config(hotel_number, bucket_name).catalog
 
+@profiled
+@instrumented('ticket-api-call')
 def lambda_handler(event, context):
-    logger.info(f"{event = }")
+    log_payload(logger, "EVENT", event, verbose=False)
     
     phone_number = event['phoneNumber']
+    set_dimensions(hotel=phone_number, intent='create_ticket')
+    set_attribution(hotel=phone_number, action_group=event.get('actionGroup'), function=event.get('function'))
     bucket = os.environ.get('BUCKET', 'botconfig205154476688v2') # 'botconfig205154476688v2'
     json_service_info = s3_retrieve(phone_number, bucket)
-    # available_items = [k for k, v in data.items() if v['Avaliable'] == 'Yes']
-    logger.info(f"{json_service_info = }")
-    items = json_service_info.keys()
-
-    extracted_items = get_item(event["userInput"], ', '.join(items))
-    logger.info(f"{extracted_items = }")
-    item_quantity = json.loads(extracted_items)
-    logger.info(f"{item_quantity = }")
+    if logger.isEnabledFor(logging.DEBUG):
+        log_payload(logger, "SERVICE INFO", json_service_info.to_dict(), level=logging.DEBUG)
+
+    item_quantity = get_item(event["userInput"], json_service_info.item_names)
+    logger.info("extracted_items %s", item_quantity)
 
     for i in range(len(item_quantity)):
         get_request_ticket_api(
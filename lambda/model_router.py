@@ -0,0 +1,209 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from botocore.exceptions import ClientError, ConnectTimeoutError, ReadTimeoutError
+
+from instrumentation import span
+from prompt_cache import prepare_request, record_cache_usage
+from rate_limiter import get_limiter
+from usage_accounting import record_usage
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+HAIKU = "anthropic.claude-3-haiku-20240307-v1:0"
+NOVA_MICRO = "amazon.nova-micro-v1:0"
+SONNET = "anthropic.claude-3-sonnet-20240229-v1:0"
+
+# Per task: candidate models ordered cheapest first, alternates that are only used when
+# every candidate failed, and the latency budget used to pick among the candidates.
+# Override without a code change through the MODEL_ROUTES environment variable (same JSON shape).
+DEFAULT_ROUTES = {
+    # Claude 3 Haiku has no prompt caching, so the catalog cachePoint is stripped. Routing to a
+    # caching model (e.g. Nova Micro) is opt-in through MODEL_ROUTES, after an accuracy check
+    "item_extraction": {"models": [HAIKU], "fallback": [NOVA_MICRO], "budget_ms": 3000},
+    "local_area_info": {"models": [NOVA_MICRO], "fallback": [HAIKU], "budget_ms": 3000},
+    "judge": {"models": [SONNET], "fallback": [], "budget_ms": 30000},
+}
+
+# Errors that move the call on to the next model instead of failing the request
+FAILOVER_ERROR_CODES = {
+    "ThrottlingException",
+    "ModelTimeoutException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+}
+
+
+def load_routes():
+    """
+    Loads routes from the MODEL_ROUTES environment variable merged over DEFAULT_ROUTES.
+
+    Returns:
+        dict: task name -> {"models": [...], "fallback": [...], "budget_ms": int}
+    """
+    routes = {task: dict(route) for task, route in DEFAULT_ROUTES.items()}
+    raw = os.environ.get('MODEL_ROUTES')
+    if raw:
+        try:
+            for task, route in json.loads(raw).items():
+                routes[task] = {**routes.get(task, {"fallback": [], "budget_ms": None}), **route}
+        except Exception as e:
+            logger.error(f"Ignoring invalid MODEL_ROUTES {e = }")
+    return routes
+
+
+def is_failover_error(error):
+    if isinstance(error, (ReadTimeoutError, ConnectTimeoutError)):
+        return True
+    if isinstance(error, ClientError):
+        return error.response.get('Error', {}).get('Code') in FAILOVER_ERROR_CODES
+    return False
+
+
+class LatencyWindow:
+    """Rolling window of observed latencies (ms) for one model."""
+
+    def __init__(self, size=100):
+        self.samples = deque(maxlen=size)
+
+    def add(self, latency_ms):
+        self.samples.append(latency_ms)
+
+    def percentile(self, pct):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+    @property
+    def p50(self):
+        return self.percentile(50)
+
+    @property
+    def p95(self):
+        return self.percentile(95)
+
+
+class ModelRouter:
+    """
+    Routes `converse` calls per task to the cheapest model whose rolling p95 fits the
+    latency budget, and fails over to the next model on throttling or timeout.
+
+    Args:
+        client: boto3 bedrock-runtime client
+        routes (dict, optional): task routes, defaults to `load_routes()`
+        window (int, optional): latency samples kept per model. Defaults to 100
+        min_samples (int, optional): samples needed before a model's p95 is trusted. Defaults to 5
+        limiter (AdaptiveRateLimiter, optional): defaults to the process-wide limiter
+    """
+
+    def __init__(self, client, routes=None, window=100, min_samples=5, limiter=None):
+        self.client = client
+        self.limiter = limiter or get_limiter()
+        self.routes = routes if routes is not None else load_routes()
+        self.window = window
+        self.min_samples = min_samples
+        self.stats = {}
+        self.decisions = deque(maxlen=1000)
+        self._lock = threading.Lock()
+
+    def _window(self, model_id):
+        with self._lock:
+            if model_id not in self.stats:
+                self.stats[model_id] = LatencyWindow(self.window)
+            return self.stats[model_id]
+
+    def observe(self, model_id, latency_ms):
+        self._window(model_id).add(latency_ms)
+
+    def plan(self, task, budget_ms=None):
+        """
+        Orders the models to try for a task.
+
+        Args:
+            task (str): task name from the routes table
+            budget_ms (float, optional): latency budget, defaults to the route's budget_ms
+
+        Returns:
+            tuple: (models in attempt order, reason the first model was picked)
+        """
+        route = self.routes[task]
+        candidates = list(route['models'])
+        budget_ms = budget_ms if budget_ms is not None else route.get('budget_ms')
+
+        chosen, reason = None, None
+        if budget_ms is None:
+            chosen, reason = candidates[0], 'no_budget'
+        else:
+            for model_id in candidates:
+                window = self._window(model_id)
+                if len(window.samples) < self.min_samples:
+                    chosen, reason = model_id, 'warming_up'
+                    break
+                if window.p95 <= budget_ms:
+                    chosen, reason = model_id, 'fits_budget'
+                    break
+            if chosen is None:
+                chosen = min(candidates, key=lambda m: self._window(m).p95)
+                reason = 'over_budget_fastest'
+
+        ordered = [chosen] + [m for m in candidates if m != chosen]
+        ordered += [m for m in route.get('fallback', []) if m not in ordered]
+        return ordered, reason
+
+    def converse(self, task, budget_ms=None, model_id=None, **kwargs):
+        """
+        Calls `converse` for a task through the routing table.
+
+        Args:
+            task (str): task name from the routes table
+            budget_ms (float, optional): per-call latency budget override
+            model_id (str, optional): pin the call to one model, skipping selection and failover
+            **kwargs: passed through to bedrock-runtime `converse` (messages, system, inferenceConfig, ...)
+
+        Returns:
+            dict: the converse response, with the routing decision under 'routing'
+        """
+        if model_id:
+            models, reason = [model_id], 'pinned'
+        else:
+            models, reason = self.plan(task, budget_ms)
+
+        decision = {
+            "task": task,
+            "budget_ms": budget_ms if budget_ms is not None else self.routes.get(task, {}).get('budget_ms'),
+            "reason": reason,
+            "attempts": [],
+        }
+        try:
+            for i, candidate in enumerate(models):
+                start = time.perf_counter()
+                try:
+                    request = prepare_request(candidate, kwargs)
+                    with span('model_converse', task=task, model_id=candidate):
+                        response = self.limiter.call('converse', candidate, self.client.converse, modelId=candidate, **request)
+                except Exception as e:
+                    latency_ms = (time.perf_counter() - start) * 1000
+                    decision["attempts"].append({"model_id": candidate, "latency_ms": round(latency_ms, 1), "error": type(e).__name__})
+                    if not is_failover_error(e) or i == len(models) - 1:
+                        raise
+                    self.observe(candidate, latency_ms)
+                    continue
+
+                latency_ms = (time.perf_counter() - start) * 1000
+                self.observe(candidate, latency_ms)
+                record_cache_usage(candidate, response.get('usage'))
+                record_usage('converse', candidate, response.get('usage'), latency_ms)
+                window = self._window(candidate)
+                decision["attempts"].append({"model_id": candidate, "latency_ms": round(latency_ms, 1)})
+                decision.update({"model_id": candidate, "p50_ms": window.p50, "p95_ms": window.p95})
+                response['routing'] = decision
+                return response
+        finally:
+            self.decisions.append(decision)
+            logger.info(f"MODEL ROUTING: {json.dumps(decision)}")
@@ -0,0 +1,129 @@
+"""
+Per-invocation profiler for Lambda handlers.
+
+    @profiled
+    def lambda_handler(event, context): ...
+
+HANDLER_PROFILING selects the mode when the container starts:
+- unset / 'off': the handler is returned undecorated, so profiling costs nothing
+- 'event': profile only invocations whose event carries HANDLER_PROFILING_TOKEN as
+  `_profile` (top level or in sessionAttributes) or as an `x-profile` header. Events reach
+  the handlers from guests through Lex and the proxy API, so a bare flag is not enough;
+  without a token set, no event is profiled
+- 'always': profile every invocation
+
+Each profiled invocation writes a cProfile dump and a JSON summary (wall vs CPU time,
+allocated blocks, top functions, optionally top allocation sites) to /tmp, and uploads
+both when HANDLER_PROFILING_BUCKET is set.
+"""
+import cProfile
+import functools
+import hmac
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+PROFILE_DIR = os.environ.get('HANDLER_PROFILING_DIR', '/tmp')
+
+
+def _event_requests_profile(event, token):
+    if not token or not isinstance(event, dict):
+        return False
+    headers = event.get('headers') or {}
+    candidates = (event.get('_profile'), (event.get('sessionAttributes') or {}).get('_profile'),
+                  headers.get('x-profile'), headers.get('X-Profile'))
+    return any(isinstance(value, str) and hmac.compare_digest(value.encode(), token.encode())
+               for value in candidates)
+
+
+def _top_functions(profiler, limit=25):
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, name), (cc, nc, tt, ct, _) in stats.stats.items():
+        rows.append({"function": f"{os.path.basename(filename)}:{line}({name})",
+                     "calls": nc, "tottime_ms": round(tt * 1000, 3), "cumtime_ms": round(ct * 1000, 3)})
+    rows.sort(key=lambda r: r["cumtime_ms"], reverse=True)
+    return rows[:limit]
+
+
+def _upload(paths):
+    bucket = os.environ.get('HANDLER_PROFILING_BUCKET')
+    if not bucket:
+        return
+    import boto3
+    prefix = os.environ.get('HANDLER_PROFILING_PREFIX', 'profiles').strip('/')
+    s3_client = boto3.client('s3')
+    for path in paths:
+        key = f"{prefix}/{os.path.basename(path)}"
+        s3_client.upload_file(path, bucket, key)
+        logger.info(f"PROFILE uploaded to s3://{bucket}/{key}")
+
+
+def profile_call(func, event, context, name):
+    """Runs one invocation under cProfile and writes its profile and summary."""
+    track_alloc = os.environ.get('HANDLER_PROFILING_ALLOC') == '1'
+    if track_alloc:
+        tracemalloc.start(10)
+    blocks_before = sys.getallocatedblocks()
+    profiler = cProfile.Profile()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    profiler.enable()
+    try:
+        return func(event, context)
+    finally:
+        profiler.disable()
+        wall_ms = (time.perf_counter() - wall_start) * 1000
+        cpu_ms = (time.process_time() - cpu_start) * 1000
+        summary = {
+            "handler": name,
+            "wall_ms": round(wall_ms, 3),
+            "cpu_ms": round(cpu_ms, 3),
+            "wait_ms": round(max(wall_ms - cpu_ms, 0), 3),
+            "allocated_blocks_delta": sys.getallocatedblocks() - blocks_before,
+            "top_functions": _top_functions(profiler),
+        }
+        if track_alloc:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            summary["top_allocations"] = [
+                {"site": str(stat.traceback[0]), "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+                for stat in snapshot.statistics('lineno')[:25]
+            ]
+        try:
+            stem = os.path.join(PROFILE_DIR, f"profile-{name}-{int(time.time() * 1000)}")
+            profiler.dump_stats(f"{stem}.prof")
+            with open(f"{stem}.json", 'w') as f:
+                json.dump(summary, f, indent=2)
+            text = io.StringIO()
+            pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(10)
+            logger.info(f"PROFILE {name}: wall={summary['wall_ms']}ms cpu={summary['cpu_ms']}ms "
+                        f"blocks={summary['allocated_blocks_delta']} -> {stem}.prof\n{text.getvalue()}")
+            _upload([f"{stem}.prof", f"{stem}.json"])
+        except Exception as e:
+            logger.error(f"Failed to write profile {e = }")
+
+
+def profiled(func):
+    """Decorator for `lambda_handler` / `handler`, see the module docstring for the modes."""
+    mode = os.environ.get('HANDLER_PROFILING', '').lower()
+    if mode not in ('event', 'always'):
+        return func
+    name = os.environ.get('AWS_LAMBDA_FUNCTION_NAME', func.__module__)
+    token = os.environ.get('HANDLER_PROFILING_TOKEN', '')
+    if mode == 'event' and not token:
+        logger.warning("HANDLER_PROFILING=event without HANDLER_PROFILING_TOKEN, no invocation will be profiled")
+
+    @functools.wraps(func)
+    def wrapper(event, context):
+        if mode == 'event' and not _event_requests_profile(event, token):
+            return func(event, context)
+        return profile_call(func, event, context, name)
+    return wrapper
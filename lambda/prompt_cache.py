@@ -0,0 +1,82 @@
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Converse content block marking the end of a cacheable prompt prefix
+CACHE_POINT = {"cachePoint": {"type": "default"}}
+
+# Model families that accept cachePoint blocks in converse. Matched as substrings so
+# cross-region inference profiles (us.amazon.nova-micro-v1:0, ...) are covered too.
+# Override with a comma separated PROMPT_CACHE_MODELS environment variable.
+DEFAULT_CACHE_MODELS = (
+    "amazon.nova-micro",
+    "amazon.nova-lite",
+    "amazon.nova-pro",
+    "anthropic.claude-3-5-haiku",
+    "anthropic.claude-3-7-sonnet",
+    "anthropic.claude-sonnet-4",
+    "anthropic.claude-opus-4",
+)
+
+_lock = threading.Lock()
+cache_usage = {}
+
+
+def cache_models():
+    raw = os.environ.get('PROMPT_CACHE_MODELS')
+    if raw is not None:
+        return tuple(m.strip() for m in raw.split(',') if m.strip())
+    return DEFAULT_CACHE_MODELS
+
+
+def supports_prompt_caching(model_id):
+    return any(family in model_id for family in cache_models())
+
+
+def strip_cache_points(blocks):
+    return [block for block in blocks if 'cachePoint' not in block]
+
+
+def prepare_request(model_id, request):
+    """
+    Drops cachePoint blocks from the system prompt when the target model does not
+    support prompt caching, so one prompt builder serves every routed model.
+
+    Args:
+        model_id (str): model the request is about to be sent to
+        request (dict): converse keyword arguments
+
+    Returns:
+        dict: converse keyword arguments safe for model_id
+    """
+    if 'system' not in request or supports_prompt_caching(model_id):
+        return request
+    return {**request, 'system': strip_cache_points(request['system'])}
+
+
+def record_cache_usage(model_id, usage):
+    """
+    Accumulates cache read/write token counts from a converse `usage` block per model.
+
+    Args:
+        model_id (str): model that served the call
+        usage (dict): the `usage` block of the converse response
+
+    Returns:
+        dict: running totals for model_id
+    """
+    usage = usage or {}
+    with _lock:
+        totals = cache_usage.setdefault(model_id, {
+            "calls": 0, "inputTokens": 0, "cacheReadInputTokens": 0, "cacheWriteInputTokens": 0
+        })
+        totals["calls"] += 1
+        for field in ("inputTokens", "cacheReadInputTokens", "cacheWriteInputTokens"):
+            totals[field] += usage.get(field, 0)
+        snapshot = dict(totals)
+    logger.info(f"PROMPT CACHE: model={model_id} read={usage.get('cacheReadInputTokens', 0)} "
+                f"write={usage.get('cacheWriteInputTokens', 0)} input={usage.get('inputTokens', 0)}")
+    return snapshot
@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+
+from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectionError, ReadTimeoutError
+
+from instrumentation import emit_metric
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Error codes that mean "slow down": they shrink the bucket's rate and are retried
+THROTTLE_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceQuotaExceededException",
+}
+# Transient server errors: retried with backoff, rate left alone
+TRANSIENT_ERROR_CODES = {
+    "ServiceUnavailableException",
+    "InternalServerException",
+}
+# Network failures botocore retried before client_config turned its retries off: dropped or
+# refused connections (ConnectionError covers connect timeouts) and read timeouts
+CONNECTION_ERRORS = (ConnectionError, ReadTimeoutError)
+
+# Socket timeouts for those calls, kept short enough that every attempt fits the 180 s Lambda
+# timeout: 4 attempts x (5 s connect + 35 s read) plus at most 1.4 s of backoff is ~162 s.
+# botocore's 60 s default read timeout would take 240 s before the handler could report the
+# failure. read_timeout bounds the wait for each read, so a streaming invoke_agent response
+# may take longer overall as long as it keeps sending events.
+CLIENT_TIMEOUTS = {
+    'connect_timeout': float(os.environ.get('BEDROCK_CONNECT_TIMEOUT', 5)),
+    'read_timeout': float(os.environ.get('BEDROCK_READ_TIMEOUT', 35)),
+}
+CLIENT_RETRIES = {'total_max_attempts': 1, 'mode': 'standard'}
+
+# Config for Bedrock clients whose calls go through the limiter: retries are owned by the
+# limiter, so botocore must not retry throttles underneath it
+client_config = Config(retries=CLIENT_RETRIES, **CLIENT_TIMEOUTS)
+
+
+def error_code(error):
+    if isinstance(error, ClientError):
+        return error.response.get('Error', {}).get('Code')
+    return None
+
+
+class TokenBucket:
+    """
+    Token bucket whose refill rate adapts to throttling: halved on every throttle
+    (down to min_rate), raised additively after each success (up to max_rate).
+    """
+
+    def __init__(self, rate, burst, min_rate=0.5, max_rate=None, increase=0.1):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.min_rate = min_rate
+        self.max_rate = max_rate if max_rate is not None else rate * 4
+        self.increase = increase
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Takes one token, returning how long the caller has to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def on_throttle(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+
+class AdaptiveRateLimiter:
+    """
+    Process-wide client-side limiter for Bedrock calls, one token bucket per (api, model).
+
+    Every call waits for a token, throttling responses halve that key's rate and are
+    retried with full-jitter exponential backoff, as are transient server errors and
+    connection failures. The time spent queueing is recorded per key in `stats`.
+
+    Args:
+        rate (float): initial requests per second per key
+        burst (int): bucket size
+        max_attempts (int): attempts per call, including the first one
+        base_delay (float): backoff base in seconds
+        max_delay (float): backoff cap in seconds
+    """
+
+    def __init__(self, rate=5.0, burst=5, max_attempts=4, base_delay=0.2, max_delay=5.0):
+        self.rate = rate
+        self.burst = burst
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.buckets = {}
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, api, model_id):
+        key = (api, model_id)
+        with self._lock:
+            if key not in self.buckets:
+                self.buckets[key] = TokenBucket(self.rate, self.burst)
+                self.stats[key] = {"calls": 0, "throttles": 0, "retries": 0, "queue_delay_total": 0.0, "queue_delay_max": 0.0}
+            return self.buckets[key]
+
+    def _record_delay(self, key, waited):
+        with self._lock:
+            stats = self.stats[key]
+            stats["calls"] += 1
+            stats["queue_delay_total"] += waited
+            stats["queue_delay_max"] = max(stats["queue_delay_max"], waited)
+        if waited > 0:
+            emit_metric('queue_delay', round(waited * 1000, 3), stage=key[0], model_id=key[1])
+            logger.info(f"RATE LIMIT QUEUE DELAY: api={key[0]} model={key[1]} {waited * 1000:.1f} ms")
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _retry_delay(self, key, bucket, error, attempt):
+        """Backoff before the next attempt after error, or None when error has to be raised."""
+        code = error_code(error) or type(error).__name__
+        if code in THROTTLE_ERROR_CODES:
+            bucket.on_throttle()
+            with self._lock:
+                self.stats[key]["throttles"] += 1
+        elif code not in TRANSIENT_ERROR_CODES and not isinstance(error, CONNECTION_ERRORS):
+            return None
+        if attempt == self.max_attempts - 1:
+            return None
+        with self._lock:
+            self.stats[key]["retries"] += 1
+        delay = self.backoff(attempt)
+        logger.warning(f"{code} on {key[0]} {key[1]}, retry {attempt + 1} in {delay:.2f}s (rate {bucket.rate:.2f}/s)")
+        return delay
+
+    def call(self, api, model_id, fn, **kwargs):
+        """
+        Paces and retries `fn(**kwargs)` under the (api, model_id) bucket.
+
+        Args:
+            api (str): API name, e.g. 'converse' or 'invoke_agent'
+            model_id (str): model ID (or agent alias) the call targets
+            fn (callable): the boto3 client method to call
+            **kwargs: arguments for fn
+
+        Returns:
+            whatever fn returns
+        """
+        key = (api, model_id)
+        bucket = self.bucket(api, model_id)
+        for attempt in range(self.max_attempts):
+            self._record_delay(key, bucket.acquire())
+            try:
+                result = fn(**kwargs)
+            except (ClientError, *CONNECTION_ERRORS) as e:
+                delay = self._retry_delay(key, bucket, e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            bucket.on_success()
+            return result
+
+    async def call_async(self, api, model_id, fn, **kwargs):
+        """`call` for coroutine functions (aiobotocore clients): waits with asyncio.sleep."""
+        key = (api, model_id)
+        bucket = self.bucket(api, model_id)
+        for attempt in range(self.max_attempts):
+            wait = bucket._reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._record_delay(key, wait)
+            try:
+                result = await fn(**kwargs)
+            except (ClientError, *CONNECTION_ERRORS) as e:
+                delay = self._retry_delay(key, bucket, e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            bucket.on_success()
+            return result
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    """
+    Returns the process-wide limiter, configured from BEDROCK_RATE_PER_SEC,
+    BEDROCK_BURST and BEDROCK_MAX_ATTEMPTS on first use.
+    """
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = AdaptiveRateLimiter(
+                rate=float(os.environ.get('BEDROCK_RATE_PER_SEC', 5)),
+                burst=int(os.environ.get('BEDROCK_BURST', 5)),
+                max_attempts=int(os.environ.get('BEDROCK_MAX_ATTEMPTS', 4)),
+            )
+        return _limiter
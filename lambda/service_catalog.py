@@ -0,0 +1,131 @@
+import json
+import logging
+import os
+import sys
+from functools import lru_cache
+
+import boto3
+
+from instrumentation import timed
+from structured_log import log_payload
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+DEFAULT_BUCKET = 'botconfig205154476688v2'
+
+
+class ServiceItem:
+    """One entry of a hotel's serviceInfo.json. Field values are interned, so the few
+    distinct departments, service types and actions are shared by every item and hotel."""
+
+    __slots__ = ('name', 'department', 'service_type', 'bot_action', 'available')
+
+    def __init__(self, name, department, service_type, bot_action, available):
+        self.name = name
+        self.department = department
+        self.service_type = service_type
+        self.bot_action = bot_action
+        self.available = available
+
+    def to_dict(self):
+        return {'Department': self.department, 'Service Type': self.service_type,
+                'Bot Action': self.bot_action, 'Avaliable': 'Yes' if self.available else 'No'}
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class ServiceCatalog:
+    """
+    A hotel's service items, in serviceInfo.json order, with the lists the handlers need
+    built in one pass: available and unavailable item names, available items per
+    department, and the comma separated name list used in prompts.
+
+    Args:
+        data (dict): parsed serviceInfo.json, {item: {"Department": .., "Service Type": ..,
+            "Bot Action": .., "Avaliable": "Yes" | "No"}}
+        rows (list, optional): [name, department, service type, bot action, available] rows
+            of a compiled hotel config, used instead of data
+    """
+
+    __slots__ = ('items', 'available_items', 'unavailable_items', 'departments', 'dept_items', 'item_names')
+
+    def __init__(self, data=None, rows=None):
+        self.items = {}
+        self.available_items = []
+        self.unavailable_items = []
+        self.departments = {}
+        if rows is None:
+            rows = ((name, details.get('Department'), details.get('Service Type'), details.get('Bot Action'),
+                     details.get('Avaliable') == 'Yes') for name, details in (data or {}).items())
+        for name, department, service_type, bot_action, available in rows:
+            item = ServiceItem(name, _intern(department), _intern(service_type), _intern(bot_action), bool(available))
+            self.items[name] = item
+            if item.available:
+                self.available_items.append(name)
+                self.departments.setdefault(item.department, []).append(name)
+            else:
+                self.unavailable_items.append(name)
+        # {'Engineering': 'Ipod Docking Station, Laptop Charger, ...', ...}
+        self.dept_items = {department: ', '.join(names) for department, names in self.departments.items()}
+        self.item_names = ', '.join(self.items)
+
+    @classmethod
+    def from_json(cls, raw):
+        return cls(json.loads(raw))
+
+    def __getitem__(self, name):
+        return self.items[name]
+
+    def __contains__(self, name):
+        return name in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def to_dict(self):
+        return {name: item.to_dict() for name, item in self.items.items()}
+
+    def to_rows(self):
+        return [[item.name, item.department, item.service_type, item.bot_action, int(item.available)]
+                for item in self.items.values()]
+
+
+EMPTY_CATALOG = ServiceCatalog({})
+
+
+@lru_cache(maxsize=128)
+@timed('s3_config_load')
+def _fetch_catalog(hotel_number, bucket_name):
+    response = boto3.client('s3').get_object(Bucket=bucket_name, Key=f'{hotel_number}serviceInfo.json')
+    catalog = ServiceCatalog.from_json(response['Body'].read())
+    log_payload(logger, "UNAVAILABLE ITEMS", catalog.unavailable_items)
+    log_payload(logger, "AVAILABLE ITEMS", catalog.available_items)
+    log_payload(logger, "DEPT ITEMS", catalog.dept_items)
+    return catalog
+
+
+def load_catalog(hotel_number, bucket_name=None):
+    """
+    The hotel's catalog from `<hotel_number>serviceInfo.json` in the config bucket, parsed
+    once per container. A failed read is logged, answered with an empty catalog and
+    retried on the next call.
+
+    Args:
+        hotel_number (str): hotel phone number
+        bucket_name (str, optional): config bucket. Defaults to the BUCKET environment variable
+
+    Returns:
+        ServiceCatalog: the hotel's catalog, or EMPTY_CATALOG
+    """
+    bucket_name = bucket_name or os.environ.get('BUCKET', DEFAULT_BUCKET)
+    try:
+        return _fetch_catalog(hotel_number, bucket_name)
+    except Exception as e:
+        logger.error(f"Error occurred while retrieving {hotel_number}serviceInfo.json: {e}")
+        return EMPTY_CATALOG
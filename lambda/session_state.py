@@ -0,0 +1,98 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from instrumentation import emit_metrics
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Sessions remembered per container, least recently used dropped first
+DEFAULT_CACHE_SIZE = 4096
+# Resend the static attributes when a session was idle this long. Kept below the agent's
+# idleSessionTtlInSeconds (1800, see lib/bedrock-agent-stack.ts): past that the agent has
+# started a new session and forgotten them.
+DEFAULT_RESEND_SECONDS = 1500
+
+
+class SessionStateManager:
+    """
+    Tracks which static sessionAttributes each agent session already holds, so they are
+    sent on the first turn only.
+
+    The agent keeps sessionAttributes for the whole session, so later turns can leave them
+    out. promptSessionAttributes only last one turn and are substituted into every
+    orchestration prompt ($prompt_session_attributes$), so they are sent on every turn.
+
+    The static attributes are sent again when the hotel's config version or the
+    attributes change, when the session was idle for resend_after seconds, or after
+    forget() (failed or ended calls). A container that has not seen a session always sends
+    them.
+
+    Args:
+        maxsize (int): sessions remembered, least recently used dropped first
+        resend_after (float): idle seconds after which the static attributes are resent
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, resend_after=DEFAULT_RESEND_SECONDS):
+        self.maxsize = maxsize
+        self.resend_after = resend_after
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def build(self, session_id, config_version, session_attributes, prompt_attributes):
+        """
+        sessionState for the next invoke_agent call of session_id.
+
+        Args:
+            session_id (str): agent session id
+            config_version (str): version of the hotel config the attributes come from
+            session_attributes (dict): static sessionAttributes of the session
+            prompt_attributes (dict): promptSessionAttributes of this turn
+
+        Returns:
+            dict: sessionState, with sessionAttributes only when the session needs them
+        """
+        key = (config_version, tuple(session_attributes.items()))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            delta = entry is not None and entry[0] == key and now - entry[1] < self.resend_after
+            if delta:
+                size = entry[2]
+                self._sessions.move_to_end(session_id)
+            else:
+                size = len(json.dumps(session_attributes))
+            self._sessions[session_id] = (key, now, size)
+            while len(self._sessions) > self.maxsize:
+                self._sessions.popitem(last=False)
+
+        emit_metrics({
+            'session_state_bytes_saved': (size if delta else 0, 'Bytes'),
+            'session_state_static_sent': (0 if delta else 1, 'Count'),
+        }, stage='session_state')
+        if delta:
+            return {'promptSessionAttributes': prompt_attributes}
+        return {'sessionAttributes': session_attributes, 'promptSessionAttributes': prompt_attributes}
+
+    def forget(self, session_id):
+        """Sends the static attributes again on the next turn, e.g. after a failed call."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+_manager = None
+
+
+def get_session_state_manager():
+    """Process wide manager sized by SESSION_STATE_CACHE_SIZE and SESSION_STATE_RESEND_SECONDS."""
+    global _manager
+    if _manager is None:
+        _manager = SessionStateManager(
+            maxsize=int(os.environ.get('SESSION_STATE_CACHE_SIZE', DEFAULT_CACHE_SIZE)),
+            resend_after=float(os.environ.get('SESSION_STATE_RESEND_SECONDS', DEFAULT_RESEND_SECONDS)),
+        )
+    return _manager
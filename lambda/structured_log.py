@@ -0,0 +1,130 @@
+import json
+import logging
+import os
+import random
+import re
+import threading
+
+from instrumentation import emit_metric, on_invocation_end
+
+MAX_FIELD_CHARS = int(os.environ.get('LOG_MAX_FIELD_CHARS', 512))
+MAX_ITEMS = int(os.environ.get('LOG_MAX_ITEMS', 20))
+MAX_DEPTH = 6
+# Fraction of verbose payloads (whole events, model/agent responses) that are logged at all
+SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 1.0))
+
+_lock = threading.Lock()
+log_stats = {"payloads": 0, "sampled_out": 0, "suppressed_bytes": 0}
+
+
+def get_logger(name):
+    """
+    Returns a logger whose level comes from LOG_LEVEL_<NAME> (name upper-cased, every
+    non-alphanumeric character replaced by '_'), falling back to LOG_LEVEL, then INFO.
+    e.g. LOG_LEVEL_LAMBDA_FULFILLMENT_HANDLER=DEBUG
+    """
+    logger = logging.getLogger(name)
+    env_key = 'LOG_LEVEL_' + re.sub(r'[^A-Za-z0-9]', '_', name).upper()
+    logger.setLevel(os.environ.get(env_key, os.environ.get('LOG_LEVEL', 'INFO')).upper())
+    return logger
+
+
+def _count(field, value):
+    with _lock:
+        log_stats[field] += value
+
+
+def approx_size(obj, depth=0):
+    """Cheap size estimate (characters) of a payload, without serializing it."""
+    if isinstance(obj, (str, bytes, bytearray)):
+        return len(obj)
+    if depth >= MAX_DEPTH:
+        return 16
+    if isinstance(obj, dict):
+        return sum(len(str(k)) + approx_size(v, depth + 1) + 4 for k, v in obj.items()) + 2
+    if isinstance(obj, (list, tuple, set)):
+        return sum(approx_size(v, depth + 1) + 2 for v in obj) + 2
+    return 8
+
+
+def cap(obj, depth=0):
+    """
+    Returns a copy of obj with long strings, long lists and deep nesting cut down, and
+    adds the number of characters dropped to the suppressed byte count.
+    """
+    if isinstance(obj, (bytes, bytearray)):
+        if len(obj) > MAX_FIELD_CHARS:
+            _count("suppressed_bytes", len(obj) - MAX_FIELD_CHARS)
+            return f"<{len(obj)} bytes>"
+        return obj.decode('utf-8', errors='replace')
+    if isinstance(obj, str):
+        if len(obj) > MAX_FIELD_CHARS:
+            _count("suppressed_bytes", len(obj) - MAX_FIELD_CHARS)
+            return obj[:MAX_FIELD_CHARS] + f"...(+{len(obj) - MAX_FIELD_CHARS} chars)"
+        return obj
+    if depth >= MAX_DEPTH and isinstance(obj, (dict, list, tuple, set)):
+        _count("suppressed_bytes", approx_size(obj))
+        return f"<{type(obj).__name__} depth>{MAX_DEPTH}>"
+    if isinstance(obj, dict):
+        items = list(obj.items())
+        capped = {str(k): cap(v, depth + 1) for k, v in items[:MAX_ITEMS]}
+        if len(items) > MAX_ITEMS:
+            _count("suppressed_bytes", sum(approx_size(v) for _, v in items[MAX_ITEMS:]))
+            capped["..."] = f"+{len(items) - MAX_ITEMS} keys"
+        return capped
+    if isinstance(obj, (list, tuple, set)):
+        values = list(obj)
+        capped = [cap(v, depth + 1) for v in values[:MAX_ITEMS]]
+        if len(values) > MAX_ITEMS:
+            _count("suppressed_bytes", sum(approx_size(v) for v in values[MAX_ITEMS:]))
+            capped.append(f"...+{len(values) - MAX_ITEMS} items")
+        return capped
+    return obj
+
+
+class LazyPayload:
+    """Defers capping and JSON serialization until a handler actually formats the record."""
+
+    __slots__ = ('payload',)
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def __str__(self):
+        return json.dumps(cap(self.payload), default=str)
+
+
+def log_payload(logger, label, payload, level=logging.INFO, verbose=True):
+    """
+    Logs `label payload` as capped JSON, formatted only if the record is emitted.
+
+    Args:
+        logger (logging.Logger): target logger
+        label (str): message prefix, e.g. 'LEX EVENT'
+        payload: any JSON-like object
+        level (int, optional): log level. Defaults to INFO
+        verbose (bool, optional): subject the payload to LOG_SAMPLE_RATE sampling. Defaults to True
+    """
+    if not logger.isEnabledFor(level):
+        return
+    if verbose and SAMPLE_RATE < 1.0 and random.random() >= SAMPLE_RATE:
+        _count("sampled_out", 1)
+        _count("suppressed_bytes", approx_size(payload))
+        return
+    _count("payloads", 1)
+    logger.log(level, "%s %s", label, LazyPayload(payload))
+
+
+def flush_log_stats():
+    """Emits the suppressed byte count of the invocation as a metric and resets the counters."""
+    with _lock:
+        stats = dict(log_stats)
+        for key in log_stats:
+            log_stats[key] = 0
+    if stats["suppressed_bytes"] or stats["sampled_out"]:
+        emit_metric('log_suppressed_bytes', stats["suppressed_bytes"], unit='Bytes', stage='logging',
+                    sampled_out=stats["sampled_out"], payloads=stats["payloads"])
+    return stats
+
+
+on_invocation_end(flush_log_stats)
@@ -0,0 +1,105 @@
+"""
+Converse request shape of item extraction against a stubbed bedrock-runtime client.
+
+    python -m pytest lambda/tests
+"""
+import importlib.util
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+LAMBDA_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(LAMBDA_DIR))
+
+from model_router import HAIKU, NOVA_MICRO, DEFAULT_ROUTES, ModelRouter, load_routes  # noqa: E402
+from prompt_cache import CACHE_POINT, supports_prompt_caching  # noqa: E402
+
+CATALOG = 'Bath Towel, Toothbrush, Toothpaste, Iron, Laptop Charger'
+# item_extraction on a caching model, opted into through MODEL_ROUTES
+NOVA_ROUTES = json.dumps({'item_extraction': {'models': [NOVA_MICRO], 'fallback': [HAIKU]}})
+
+
+class StubBedrockRuntime:
+    """Records converse calls and answers them like bedrock-runtime would."""
+
+    def __init__(self, answer='[]'):
+        self.answer = answer
+        self.calls = []
+
+    def converse(self, **params):
+        self.calls.append(params)
+        return {
+            'output': {'message': {'role': 'assistant', 'content': [{'text': self.answer}]}},
+            'usage': {'inputTokens': 10, 'outputTokens': 2, 'cacheReadInputTokens': 1200},
+        }
+
+
+@pytest.fixture(scope='module')
+def ticket_handler():
+    spec = importlib.util.spec_from_file_location('ticket_api_call', LAMBDA_DIR / 'lambda-ticket-api-call.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def client(ticket_handler, monkeypatch):
+    monkeypatch.setenv('MODEL_ROUTES', NOVA_ROUTES)
+    stub = StubBedrockRuntime()
+    monkeypatch.setattr(ticket_handler, 'router', ModelRouter(stub, routes=load_routes()))
+    return stub
+
+
+def test_item_extraction_defaults_to_haiku_and_opts_into_caching():
+    assert DEFAULT_ROUTES['item_extraction']['models'] == [HAIKU]
+    assert supports_prompt_caching(NOVA_MICRO)
+
+
+def test_get_item_request_carries_catalog_before_cache_point(ticket_handler, client):
+    ticket_handler.get_item('can I get two towels', CATALOG)
+
+    (request,) = client.calls
+    assert request['modelId'] == NOVA_MICRO
+    assert request['system'] == [
+        {'text': ticket_handler.ITEM_EXTRACTION_PROMPT},
+        {'text': f'Here are the possible category options: {CATALOG}'},
+        CACHE_POINT,
+    ]
+    assert request['messages'] == [{'role': 'user', 'content': [{'text': 'can I get two towels'}]}]
+
+
+def test_system_prefix_is_identical_across_questions(ticket_handler, client):
+    ticket_handler.get_item('can I get two towels', CATALOG)
+    ticket_handler.get_item('my iron is broken', CATALOG)
+
+    first, second = client.calls
+    assert first['system'] == second['system']
+    assert first['messages'] != second['messages']
+
+
+def test_cache_point_is_stripped_for_models_without_caching(ticket_handler, client):
+    ticket_handler.router.converse('item_extraction', model_id=HAIKU,
+                                   messages=[{'role': 'user', 'content': [{'text': 'hi'}]}],
+                                   system=ticket_handler.build_item_system_prompt(CATALOG))
+
+    (request,) = client.calls
+    assert request['modelId'] == HAIKU
+    assert all('cachePoint' not in block for block in request['system'])
+
+
+@pytest.mark.parametrize('answer', [
+    '[{"item": "Bath Towel", "quantity": "2"}]',
+    '```json\n[\n    {"item": "Bath Towel", "quantity": "2"}\n]\n```',
+    '\n```\n[{"item": "Bath Towel", "quantity": "2"}]\n```\n',
+])
+def test_get_item_parses_fenced_and_bare_answers(ticket_handler, client, answer):
+    client.answer = answer
+    assert ticket_handler.get_item('two towels please', CATALOG) == [{'item': 'Bath Towel', 'quantity': '2'}]
+
+
+@pytest.mark.parametrize('answer', ['Sure! Two towels.', '{"item": "Bath Towel"}'])
+def test_get_item_returns_no_items_for_answers_that_are_not_a_json_array(ticket_handler, client, answer):
+    client.answer = answer
+    assert ticket_handler.get_item('two towels please', CATALOG) == []
@@ -0,0 +1,253 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# local fallback when no bucket is configured; /tmp does not outlive the Lambda container
+LOCAL_SINK = "file:///tmp/agent-traces"
+TRACE_PREFIX = "agent-traces"
+DEFAULT_MAX_BYTES = 512 * 1024
+
+
+def should_trace(session_id, hotel_number):
+    """
+    Decides whether agent trace is enabled for this call.
+
+    Hotels listed in AGENT_TRACE_HOTELS are always traced. Otherwise a session is traced
+    with probability AGENT_TRACE_SAMPLE_RATE (default 0). The draw is a hash of the session
+    id, so every turn of a sampled session is traced.
+
+    Args:
+        session_id (str): agent session id
+        hotel_number (str): hotel phone number
+
+    Returns:
+        bool: True if enableTrace should be set
+    """
+    hotels = os.environ.get('AGENT_TRACE_HOTELS', '')
+    if hotel_number and hotel_number in {h.strip() for h in hotels.split(',') if h.strip()}:
+        return True
+    rate = float(os.environ.get('AGENT_TRACE_SAMPLE_RATE', 0))
+    if rate <= 0:
+        return False
+    draw = int(hashlib.sha1(str(session_id).encode('utf-8')).hexdigest()[:8], 16) / 0xFFFFFFFF
+    return draw < rate
+
+
+def step_type(trace):
+    """Short name of the orchestration step a trace event belongs to."""
+    inner = trace.get('trace', {})
+    for part, content in inner.items():
+        if isinstance(content, dict):
+            for key in ('modelInvocationInput', 'modelInvocationOutput', 'rationale', 'invocationInput', 'observation'):
+                if key in content:
+                    return f"{part}.{key}"
+        return part
+    return 'unknown'
+
+
+class TraceRecorder:
+    """
+    Collects the trace events of one agent call with their arrival time, grouped into
+    orchestration steps (a new step starts with every modelInvocationInput).
+    """
+
+    def __init__(self, session_id, hotel_number, agent_alias_id=None):
+        self.session_id = session_id
+        self.hotel_number = hotel_number
+        self.agent_alias_id = agent_alias_id
+        self.started_at = datetime.now(timezone.utc)
+        self.start = time.perf_counter()
+        self.step = 0
+        self.events = []
+
+    def _elapsed_ms(self):
+        return round((time.perf_counter() - self.start) * 1000, 3)
+
+    def add(self, trace):
+        kind = step_type(trace)
+        if kind.endswith('modelInvocationInput'):
+            self.step += 1
+        self.events.append({"t_ms": self._elapsed_ms(), "step": self.step, "kind": kind, "trace": trace})
+
+    def mark(self, kind):
+        """Records a non-trace stream event (chunk, returnControl) as a timing marker."""
+        self.events.append({"t_ms": self._elapsed_ms(), "step": self.step, "kind": kind})
+
+    def steps(self):
+        """Duration of every orchestration step: time from its first event to the next step's first event."""
+        firsts = {}
+        for event in self.events:
+            firsts.setdefault(event["step"], event)
+        ordered = sorted(firsts)
+        end_ms = self.events[-1]["t_ms"] if self.events else 0
+        summary = []
+        for i, step in enumerate(ordered):
+            start_ms = firsts[step]["t_ms"]
+            next_ms = firsts[ordered[i + 1]]["t_ms"] if i + 1 < len(ordered) else end_ms
+            summary.append({"step": step, "kind": firsts[step]["kind"], "start_ms": start_ms,
+                            "duration_ms": round(next_ms - start_ms, 3)})
+        return summary
+
+    def record(self, **extra):
+        return {
+            "session_id": self.session_id,
+            "hotel": self.hotel_number,
+            "agent_alias_id": self.agent_alias_id,
+            "started_at": self.started_at.isoformat(),
+            "total_ms": self._elapsed_ms(),
+            "steps": self.steps(),
+            "events": self.events,
+            "truncated": False,
+            **extra,
+        }
+
+
+def _encode(record):
+    return gzip.compress(json.dumps(record, default=str).encode('utf-8'))
+
+
+def encode_record(record, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Serializes a trace record as gzip'd JSON of at most max_bytes. When it does not fit,
+    trace payloads are dropped, largest first. If the timing events alone are still too
+    large they are dropped as well (counted in events_dropped) and the per-step summary is
+    kept, cut to its first steps if need be (steps_dropped).
+
+    Returns:
+        bytes: gzip-compressed JSON
+    """
+    data = _encode(record)
+    if len(data) <= max_bytes:
+        return data
+
+    record = {**record, "events": [dict(e) for e in record["events"]], "truncated": True}
+    by_size = sorted(
+        (i for i, e in enumerate(record["events"]) if "trace" in e),
+        key=lambda i: len(json.dumps(record["events"][i]["trace"], default=str)),
+        reverse=True,
+    )
+    # drop payloads in growing batches so large traces are not recompressed once per event
+    batch = 1
+    while by_size and len(data) > max_bytes:
+        for i in by_size[:batch]:
+            del record["events"][i]["trace"]
+        by_size = by_size[batch:]
+        batch *= 2
+        data = _encode(record)
+    if len(data) <= max_bytes:
+        return data
+
+    record["events_dropped"] = len(record["events"])
+    record["events"] = []
+    data = _encode(record)
+    steps = record["steps"]
+    keep = len(steps)
+    while len(data) > max_bytes and keep:
+        keep //= 2
+        record["steps"] = steps[:keep]
+        record["steps_dropped"] = len(steps) - keep
+        data = _encode(record)
+    return data
+
+
+class LocalFileSink:
+    """Writes trace records under a local directory, one .json.gz file per record."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    @classmethod
+    def from_uri(cls, uri):
+        return cls(uri[len('file://'):])
+
+    def write(self, key, data):
+        path = self.directory / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        return str(path)
+
+
+class S3Sink:
+    """Writes trace records to s3://bucket/prefix/<key>."""
+
+    def __init__(self, bucket, prefix='', client=None):
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self._client = client
+
+    @classmethod
+    def from_uri(cls, uri):
+        bucket, _, prefix = uri[len('s3://'):].partition('/')
+        return cls(bucket, prefix)
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+            self._client = boto3.client('s3')
+        return self._client
+
+    def write(self, key, data):
+        full_key = f"{self.prefix}/{key}" if self.prefix else key
+        self.client.put_object(Bucket=self.bucket, Key=full_key, Body=data,
+                               ContentType='application/json', ContentEncoding='gzip')
+        return f"s3://{self.bucket}/{full_key}"
+
+
+# uri scheme -> factory; register other backends here
+SINKS = {
+    "file": LocalFileSink.from_uri,
+    "s3": S3Sink.from_uri,
+}
+
+
+def sink_from_uri(uri):
+    scheme = uri.split('://', 1)[0]
+    if scheme not in SINKS:
+        raise ValueError(f"Unsupported trace sink {uri!r}, expected one of {sorted(SINKS)}")
+    return SINKS[scheme](uri)
+
+
+_sink = None
+
+
+def default_sink_uri():
+    """s3://<BUCKET>/agent-traces when the config bucket is set (as deployed), else LOCAL_SINK."""
+    bucket = os.environ.get('BUCKET')
+    return f"s3://{bucket}/{TRACE_PREFIX}" if bucket else LOCAL_SINK
+
+
+def get_sink():
+    """Returns the sink configured by AGENT_TRACE_SINK (file:///path or s3://bucket/prefix)."""
+    global _sink
+    if _sink is None:
+        _sink = sink_from_uri(os.environ.get('AGENT_TRACE_SINK') or default_sink_uri())
+    return _sink
+
+
+def write_trace(recorder, sink=None, **extra):
+    """
+    Encodes the recorder's record and writes it to the sink. Failures are logged, never raised,
+    so tracing cannot fail a guest call.
+
+    Returns:
+        str: location of the written record, or None on failure
+    """
+    try:
+        record = recorder.record(**extra)
+        data = encode_record(record, int(os.environ.get('AGENT_TRACE_MAX_BYTES', DEFAULT_MAX_BYTES)))
+        key = f"{recorder.started_at:%Y/%m/%d}/{recorder.hotel_number}/{recorder.session_id}-{recorder.started_at:%H%M%S%f}.json.gz"
+        location = (sink or get_sink()).write(key, data)
+        logger.info(f"AGENT TRACE written to {location} ({len(data)} bytes, {len(record['steps'])} steps)")
+        return location
+    except Exception as e:
+        logger.error(f"Failed to write agent trace {e = }")
+        return None
@@ -0,0 +1,255 @@
+"""
+Token and cost accounting per call, attributed to hotel, action group and function.
+
+Every `converse` call made through the model router, and every model invocation seen in a
+(sampled) agent trace, is recorded with its input / output / cache tokens, latency and
+estimated cost. Records are emitted as EMF lines (metrics input_tokens, output_tokens,
+cache_read_tokens, cache_write_tokens, cost_usd), optionally appended to a JSONL file
+(USAGE_LOG_PATH), and rolled up per hotel. At the end of every instrumented invocation the
+invocation's per-hotel rollup is flushed the same way (stage usage_rollup). Captured logs
+or JSONL files can be summarized locally:
+
+    python lambda/usage_accounting.py report usage.jsonl captured.log --group_by hotel,function
+"""
+import argparse
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+from instrumentation import emit_metrics, on_invocation_end, set_dimensions
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# USD per 1K tokens: input, output, cache read, cache write (on-demand, us-east-1).
+# Override or extend with the MODEL_PRICES environment variable (same JSON shape).
+DEFAULT_PRICES = {
+    "anthropic.claude-3-haiku-20240307-v1:0": {"input": 0.00025, "output": 0.00125, "cache_read": 0.0, "cache_write": 0.0},
+    "anthropic.claude-3-sonnet-20240229-v1:0": {"input": 0.003, "output": 0.015, "cache_read": 0.0, "cache_write": 0.0},
+    "anthropic.claude-3-5-haiku-20241022-v1:0": {"input": 0.0008, "output": 0.004, "cache_read": 0.00008, "cache_write": 0.001},
+    "anthropic.claude-3-5-sonnet-20241022-v2:0": {"input": 0.003, "output": 0.015, "cache_read": 0.0003, "cache_write": 0.00375},
+    "amazon.nova-micro-v1:0": {"input": 0.000035, "output": 0.00014, "cache_read": 0.00000875, "cache_write": 0.0},
+}
+# Agent traces do not carry the model id; price agent steps as the agent's foundation model
+AGENT_MODEL_ID = os.environ.get('AGENT_MODEL_ID', 'anthropic.claude-3-5-sonnet-20241022-v2:0')
+TOKEN_FIELDS = ("input_tokens", "output_tokens", "cache_read_tokens", "cache_write_tokens")
+
+_attribution = contextvars.ContextVar('usage_attribution', default={})
+_lock = threading.Lock()
+# per hotel since the container started
+rollups = {}
+# per hotel since the last flush_rollups
+_pending = {}
+
+
+def load_prices():
+    prices = dict(DEFAULT_PRICES)
+    raw = os.environ.get('MODEL_PRICES')
+    if raw:
+        try:
+            prices.update(json.loads(raw))
+        except Exception as e:
+            logger.error(f"Ignoring invalid MODEL_PRICES {e = }")
+    return prices
+
+
+PRICES = load_prices()
+
+
+def set_attribution(**attribution):
+    """Attributes every call recorded for the rest of the invocation (hotel, action_group, function)."""
+    _attribution.set({**_attribution.get(), **{k: v for k, v in attribution.items() if v is not None}})
+    set_dimensions(hotel=attribution.get("hotel"))
+
+
+def clear_attribution():
+    _attribution.set({})
+
+
+on_invocation_end(clear_attribution)
+
+
+def estimate_cost(model_id, tokens):
+    price = next((p for m, p in PRICES.items() if m in model_id), None)
+    if price is None:
+        return None
+    return round(
+        tokens["input_tokens"] / 1000 * price.get("input", 0)
+        + tokens["output_tokens"] / 1000 * price.get("output", 0)
+        + tokens["cache_read_tokens"] / 1000 * price.get("cache_read", 0)
+        + tokens["cache_write_tokens"] / 1000 * price.get("cache_write", 0),
+        8,
+    )
+
+
+def _append_jsonl(record):
+    path = os.environ.get('USAGE_LOG_PATH')
+    if not path:
+        return
+    try:
+        with open(path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+    except OSError as e:
+        logger.error(f"Failed to append usage record to {path}: {e}")
+
+
+def record_usage(source, model_id, usage, latency_ms=None):
+    """
+    Records the token usage of one model call.
+
+    Args:
+        source (str): 'converse' or 'agent'
+        model_id (str): model that served the call
+        usage (dict): converse `usage` block or agent trace `metadata.usage`
+        latency_ms (float, optional): call latency
+
+    Returns:
+        dict: the usage record
+    """
+    usage = usage or {}
+    tokens = {
+        "input_tokens": usage.get("inputTokens", 0),
+        "output_tokens": usage.get("outputTokens", 0),
+        "cache_read_tokens": usage.get("cacheReadInputTokens", 0),
+        "cache_write_tokens": usage.get("cacheWriteInputTokens", 0),
+    }
+    attribution = _attribution.get()
+    record = {
+        "ts": time.time(),
+        "source": source,
+        "model_id": model_id,
+        "hotel": attribution.get("hotel", "unknown"),
+        "action_group": attribution.get("action_group", "unknown"),
+        "function": attribution.get("function", "unknown"),
+        **tokens,
+        "latency_ms": round(latency_ms, 3) if latency_ms is not None else None,
+        "cost_usd": estimate_cost(model_id, tokens),
+    }
+
+    with _lock:
+        for totals in (rollups, _pending):
+            rollup = totals.setdefault(record["hotel"], {"calls": 0, "cost_usd": 0.0, **{f: 0 for f in TOKEN_FIELDS}})
+            rollup["calls"] += 1
+            rollup["cost_usd"] += record["cost_usd"] or 0
+            for field in TOKEN_FIELDS:
+                rollup[field] += tokens[field]
+
+    _append_jsonl(record)
+    metrics = {
+        "input_tokens": (tokens["input_tokens"], "Count"),
+        "output_tokens": (tokens["output_tokens"], "Count"),
+        "cache_read_tokens": (tokens["cache_read_tokens"], "Count"),
+        "cache_write_tokens": (tokens["cache_write_tokens"], "Count"),
+    }
+    if record["cost_usd"] is not None:
+        metrics["cost_usd"] = (record["cost_usd"], "None")
+    emit_metrics(metrics, stage="model_usage",
+                 **{k: v for k, v in record.items() if k not in TOKEN_FIELDS and k not in ("cost_usd", "hotel")})
+    return record
+
+
+def flush_rollups():
+    """
+    Emits the per-hotel totals recorded since the last flush, one EMF line per hotel under
+    stage usage_rollup (also appended to USAGE_LOG_PATH), and starts new totals. Runs at
+    the end of every instrumented invocation.
+
+    Returns:
+        dict: hotel -> flushed totals
+    """
+    global _pending
+    with _lock:
+        pending, _pending = _pending, {}
+    for hotel, rollup in pending.items():
+        _append_jsonl({"ts": time.time(), "type": "rollup", "hotel": hotel, **rollup})
+        set_dimensions(hotel=hotel)
+        emit_metrics({
+            "calls": (rollup["calls"], "Count"),
+            **{field: (rollup[field], "Count") for field in TOKEN_FIELDS},
+            "cost_usd": (round(rollup["cost_usd"], 8), "None"),
+        }, stage="usage_rollup")
+    return pending
+
+
+on_invocation_end(flush_rollups)
+
+
+def record_agent_trace_usage(trace):
+    """
+    Records usage from an agent trace event carrying modelInvocationOutput metadata
+    (orchestration, pre/post-processing or knowledge base generation steps).
+
+    Returns:
+        dict: the usage record, or None if the event carries no usage
+    """
+    inner = trace.get('trace', {})
+    for part in inner.values():
+        if not isinstance(part, dict):
+            continue
+        output = part.get('modelInvocationOutput')
+        if output and 'metadata' in output:
+            return record_usage('agent', AGENT_MODEL_ID, output['metadata'].get('usage'))
+    return None
+
+
+def read_usage_records(paths):
+    """Yields usage records from JSONL files and captured EMF logs."""
+    for path in paths:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                brace = line.find('{')
+                if brace < 0 or '"output_tokens"' not in line:
+                    continue
+                try:
+                    record = json.loads(line[brace:])
+                except ValueError:
+                    continue
+                # rollups repeat the per-call records, counting them again would double the totals
+                if (isinstance(record, dict) and "input_tokens" in record
+                        and record.get("type") != "rollup" and record.get("stage") != "usage_rollup"):
+                    yield record
+
+
+def report(paths, group_by=("hotel",), out=sys.stdout):
+    """
+    Prints calls, tokens, cost and p50 latency per group.
+
+    Args:
+        paths (list): JSONL usage files and/or captured EMF log files
+        group_by (tuple, optional): record fields to group by. Defaults to ('hotel',)
+    """
+    groups = {}
+    for record in read_usage_records(paths):
+        key = tuple(str(record.get(field, "unknown")) for field in group_by)
+        group = groups.setdefault(key, {"calls": 0, "cost_usd": 0.0, "latencies": [], **{f: 0 for f in TOKEN_FIELDS}})
+        group["calls"] += 1
+        group["cost_usd"] += record.get("cost_usd") or 0
+        for field in TOKEN_FIELDS:
+            group[field] += record.get(field) or 0
+        if record.get("latency_ms") is not None:
+            group["latencies"].append(record["latency_ms"])
+
+    header = "".join(f"{field:<28}" for field in group_by)
+    print(header + f"{'calls':>8}{'input':>12}{'output':>10}{'cache_rd':>10}{'cache_wr':>10}{'cost_usd':>12}{'p50_ms':>10}", file=out)
+    for key, group in sorted(groups.items(), key=lambda kv: kv[1]["cost_usd"], reverse=True):
+        latencies = sorted(group["latencies"])
+        p50 = latencies[len(latencies) // 2] if latencies else float('nan')
+        print("".join(f"{value:<28}" for value in key)
+              + f"{group['calls']:>8}{group['input_tokens']:>12}{group['output_tokens']:>10}"
+              + f"{group['cache_read_tokens']:>10}{group['cache_write_tokens']:>10}{group['cost_usd']:>12.5f}{p50:>10.1f}",
+              file=out)
+    return groups
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Summarize Bedrock token usage and cost.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    report_parser = subparsers.add_parser('report', help='tokens and cost per group')
+    report_parser.add_argument('files', nargs='+', help='usage JSONL files or captured logs')
+    report_parser.add_argument('--group_by', default='hotel', help='comma separated fields, e.g. hotel,function,model_id')
+    args = parser.parse_args()
+    report(args.files, group_by=tuple(args.group_by.split(',')))
@@ -53,7 +53,7 @@ export class BedrockAgentStack extends cdk.Stack {
       timeout: cdk.Duration.seconds(180),
       handler: 'lambda-create-ticket.lambda_handler',
       code: lambda.Code.fromAsset(path.join(__dirname, '..', 'lambda'), {
-        exclude: ['*', '!lambda-create-ticket.py']
+        exclude: ['*', '!lambda-create-ticket.py', '!instrumentation.py', '!structured_log.py', '!profiling.py']
       }),
       environment: {
         LAMBDA: `${props.applicationName}-${props.environment}-stk-lambda-ticket-api-call`,
@@ -74,7 +74,7 @@ export class BedrockAgentStack extends cdk.Stack {
       timeout: cdk.Duration.seconds(180),
       handler: 'lambda-ticket-api-call.lambda_handler',
       code: lambda.Code.fromAsset(path.join(__dirname, '..', 'lambda'), {
-        exclude: ['*', '!lambda-ticket-api-call.py']
+        exclude: ['*', '!lambda-ticket-api-call.py', '!hotel_config.py', '!service_catalog.py', '!instrumentation.py', '!structured_log.py', '!profiling.py', '!model_router.py', '!rate_limiter.py', '!prompt_cache.py', '!usage_accounting.py']
       }),
       environment: {
         BUCKET: "botconfig205154476688v2",
@@ -95,7 +95,7 @@ export class BedrockAgentStack extends cdk.Stack {
       timeout: cdk.Duration.seconds(180),
       handler: 'lambda-local-area-info.lambda_handler',
       code: lambda.Code.fromAsset(path.join(__dirname, '..', 'lambda'), {
-        exclude: ['*', '!lambda-local-area-info.py']
+        exclude: ['*', '!lambda-local-area-info.py', '!instrumentation.py', '!structured_log.py', '!profiling.py', '!model_router.py', '!rate_limiter.py', '!prompt_cache.py', '!usage_accounting.py']
       }),
       environment: {
         REGION: `${this.region}`
@@ -52,7 +52,7 @@ export class GuestFulfillmentStack extends cdk.Stack {
       timeout: cdk.Duration.seconds(180),
       handler: 'lambda-fulfillment-handler.lambda_handler',
       code: lambda.Code.fromAsset(path.join(__dirname, '..', 'lambda'), {
-        exclude: ['*', '!lambda-fulfillment-handler.py']
+        exclude: ['*', '!lambda-fulfillment-handler.py', '!agent_async.py', '!hotel_config.py', '!service_catalog.py', '!instrumentation.py', '!structured_log.py', '!profiling.py', '!rate_limiter.py', '!session_state.py', '!trace_sink.py', '!usage_accounting.py']
       }),
       environment: props.bedrockAgentStack ? {
         // Add environment variables for the Bedrock agent if available
@@ -60,6 +60,7 @@ export class GuestFulfillmentStack extends cdk.Stack {
         AGENT_ALIAS_ID: props.bedrockAgentStack.agentAliasId,
         REGION: `${this.region}`,
         BUCKET: "botconfig205154476688v2",
+        AGENT_TRACE_SINK: `s3://botconfig${this.account}v2/agent-traces`,
       } : {},
       role: new iam.Role(this, 'FulfillmentLambdaRole', {
         roleName: `${props.applicationName}-${props.environment}-stk-iam-role-fulfillment-lambda`,
@@ -115,7 +116,7 @@ export class GuestFulfillmentStack extends cdk.Stack {
         LOCALE_ID: 'en_US'
       },
       code: lambda.Code.fromAsset(path.join(__dirname, '..', 'lambda'), {
-        exclude: ['*', '!lambda-proxy-api-handler.py']
+        exclude: ['*', '!lambda-proxy-api-handler.py', '!instrumentation.py', '!structured_log.py', '!profiling.py']
       })
     });
 
@@ -155,6 +156,15 @@ export class GuestFulfillmentStack extends cdk.Stack {
       })
     );
 
+    // Sampled agent traces (trace_sink.py) are written under agent-traces/ in the config bucket
+    fulfillmentFunction.addToRolePolicy(
+      new iam.PolicyStatement({
+        effect: iam.Effect.ALLOW,
+        actions: ['s3:PutObject'],
+        resources: [`arn:aws:s3:::botconfig${this.account}v2/agent-traces/*`]
+      })
+    );
+
     // Add Bedrock permissions for the fulfillment Lambda - restrict to specific agents
     fulfillmentFunction.addToRolePolicy(
       new iam.PolicyStatement({